@@ -0,0 +1,206 @@
+# benchmarks/bench_extraction.py
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_TYPES = ["AMEX - Card Statement", "Westpac - Bank Statement", "NAB - Credit Card Statement"]
+TRANSACTIONS_PER_DOCUMENT = 200
+DISTINCT_DOCUMENTS = 25
+BASELINE_PATH = REPO_ROOT / "benchmarks" / "baselines" / "extraction.json"
+
+
+def load_statement_type(config_path, type_name):
+    import yaml
+    with open(config_path, "r") as file:
+        for statement_type in yaml.safe_load(file)["statement_types"]:
+            if statement_type["type_name"] == type_name:
+                return statement_type
+    raise ValueError(f"Statement type '{type_name}' not found in configuration.")
+
+
+def build_documents(statement_type, size, seed):
+    """
+    Builds AnalysisResult-shaped fixtures holding `size` transactions in total.
+
+    A pool of distinct documents is generated and reused, as extraction cost depends on the shape
+    of a document rather than its values.
+    """
+    from synthetic_results import SyntheticResultBuilder, to_analysis_result
+
+    per_document = min(TRANSACTIONS_PER_DOCUMENT, size)
+    document_count = -(-size // per_document)
+    pool = [
+        to_analysis_result(SyntheticResultBuilder(statement_type, "benchmark", seed=seed + i).build(transactions=per_document))
+        for i in range(min(DISTINCT_DOCUMENTS, document_count))
+    ]
+    return [pool[i % len(pool)] for i in range(document_count)]
+
+
+def run_case(config_path, type_name, size, formats, excel_limit, seed):
+    """
+    Runs every stage for one statement type and size, and returns the measurements.
+    Intended to run in its own process so the peak RSS belongs to this case alone.
+    """
+    from csv_utils import CSVUtils
+    from field_index import FieldIndex
+    from row_accumulator import ColumnarAccumulator
+    from utils import get_memory_usage
+
+    statement_type = load_statement_type(config_path, type_name)
+    documents = build_documents(statement_type, size, seed)
+    csv_utils = CSVUtils()
+    stages = {}
+    rows = 0
+
+    def timed(name, func):
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        stages[name] = {"seconds": round(seconds, 4), "rows_per_sec": round(size / seconds, 1) if seconds else None}
+        return result
+
+    names = [f"document_{i + 1}.pdf" for i in range(len(documents))]
+
+    timed("extract_static_info", lambda: [
+        csv_utils.extract_static_info(doc, name, statement_type) for doc, name in zip(documents, names)
+    ])
+    summaries = timed("extract_and_process_summary_info", lambda: [
+        csv_utils.extract_and_process_summary_info(doc, name, statement_type) for doc, name in zip(documents, names)
+    ])
+    timed("process_transactions", lambda: [
+        csv_utils.process_transactions(doc, statement_type) for doc in documents
+    ])
+
+    def accumulate():
+        accumulator = ColumnarAccumulator()
+        for doc, name in zip(documents, names):
+            field_index = FieldIndex.from_result(doc)
+            static_info = csv_utils.extract_static_info(field_index, name, statement_type)
+            accumulator.add_document(static_info, csv_utils.process_transaction_columns(field_index, statement_type, convert_amounts=False))
+        return accumulator
+    accumulator = timed("accumulate_transaction_columns", accumulate)
+    rows = len(accumulator)
+
+    transactions_df = timed("to_frame", accumulator.to_frame)
+    timed("build_output_frames", lambda: csv_utils.build_output_frames(transactions_df, summaries, statement_type))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for output_format in formats:
+            timed(f"write_{output_format}", lambda: csv_utils.write_transactions_and_summaries(
+                transactions_df, summaries, output_dir, f"store-{output_format}", output_format, statement_type
+            ))
+        if size <= excel_limit:
+            timed("write_transactions_and_summaries_to_excel", lambda: csv_utils.write_transactions_and_summaries_to_excel(
+                transactions_df, summaries, output_dir, "extracted-data.xlsx", statement_type=statement_type
+            ))
+
+    _, peak_rss = get_memory_usage()
+    return {"type_name": type_name, "size": size, "rows": rows, "peak_rss": peak_rss, "stages": stages}
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Compares rows/sec for each case and stage against the stored baseline.
+
+    Returns:
+        list: Descriptions of every stage that is slower than the baseline by more than the tolerance.
+    """
+    regressions = []
+    for case in results:
+        key = f"{case['type_name']}|{case['size']}"
+        baseline_case = baseline.get(key)
+        if not baseline_case:
+            continue
+        for stage, measured in case["stages"].items():
+            expected = baseline_case["stages"].get(stage, {}).get("rows_per_sec")
+            if expected and measured["rows_per_sec"] and measured["rows_per_sec"] < expected * (1 - tolerance):
+                regressions.append(
+                    f"{key} {stage}: {measured['rows_per_sec']:.0f} rows/sec vs baseline {expected:.0f} rows/sec"
+                )
+    return regressions
+
+
+def print_report(results):
+    for case in results:
+        peak = case["peak_rss"] / (1024 * 1024) if case["peak_rss"] else float("nan")
+        print(f"\n{case['type_name']} - {case['size']:,} transactions (peak RSS {peak:.1f} MB)")
+        for stage, measured in case["stages"].items():
+            rate = f"{measured['rows_per_sec']:,.0f}" if measured["rows_per_sec"] else "n/a"
+            print(f"  {stage:<40} {measured['seconds']:>10.3f} s {rate:>14} rows/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='''
+        Extraction and Output Benchmark
+
+        Benchmarks CSVUtils static, summary and transaction extraction, bulk normalisation and the Excel and columnar
+        writers on generated AnalysisResult-shaped fixtures. Each statement type and size runs in its own process.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python benchmarks/bench_extraction.py --sizes 1000 10000 --compare'''
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Transaction counts to benchmark.')
+    parser.add_argument('-t', '--types', type=str, nargs='+', default=DEFAULT_TYPES, help='Statement types to benchmark.')
+    parser.add_argument('-c', '--config_type', type=str, default=str(REPO_ROOT / 'config' / 'type_models.yaml'), help='Path to the statement types configuration YAML file.')
+    parser.add_argument('--formats', type=str, nargs='+', default=['parquet'], help='Columnar formats to write.')
+    parser.add_argument('--excel-limit', type=int, default=100000, help='Skip the Excel write above this many transactions.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated fixtures.')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline.')
+    parser.add_argument('--compare', action='store_true', help='Compare with the stored baseline and exit 1 on regressions.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown against the baseline (0.2 = 20%%).')
+    parser.add_argument('--worker', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        type_name, size = args.worker.rsplit('|', 1)
+        case = run_case(args.config_type, type_name, int(size), args.formats, args.excel_limit, args.seed)
+        print(json.dumps(case))
+        return
+
+    results = []
+    for type_name in args.types:
+        for size in args.sizes:
+            print(f"Running {type_name} at {size:,} transactions...", file=sys.stderr)
+            completed = subprocess.run(
+                [sys.executable, __file__, '--worker', f"{type_name}|{size}", '-c', args.config_type,
+                 '--formats', *args.formats, '--excel-limit', str(args.excel_limit), '--seed', str(args.seed)],
+                cwd=REPO_ROOT, stdout=subprocess.PIPE, check=True, text=True
+            )
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_report(results)
+
+    if args.compare:
+        if not BASELINE_PATH.exists():
+            print(f"\nNo baseline at {BASELINE_PATH}. Run with --save-baseline first.")
+        else:
+            with open(BASELINE_PATH, "r") as file:
+                regressions = compare_to_baseline(results, json.load(file), args.tolerance)
+            if regressions:
+                print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+                sys.exit(1)
+            print("\nNo regressions against the baseline.")
+
+    if args.save_baseline:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        baseline = {}
+        if BASELINE_PATH.exists():
+            with open(BASELINE_PATH, "r") as file:
+                baseline = json.load(file)
+        baseline.update({f"{case['type_name']}|{case['size']}": case for case in results})
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(baseline, file, indent=2)
+        print(f"\nBaseline saved to {BASELINE_PATH}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/bench_splitting.py
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+DEFAULT_STATEMENTS = 10
+BASELINE_PATH = REPO_ROOT / "benchmarks" / "baselines" / "splitting.json"
+
+
+class OcrCounter:
+    """
+    Counts calls to pytesseract.image_to_string while active, so the OCR cost of each case can be reported.
+    """
+    def __init__(self):
+        import pytesseract
+        self.module = pytesseract
+        self.original = pytesseract.image_to_string
+        self.calls = 0
+
+    def __enter__(self):
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return self.original(*args, **kwargs)
+        self.module.image_to_string = counted
+        return self
+
+    def __exit__(self, *exc_info):
+        self.module.image_to_string = self.original
+
+
+def split_is_correct(doc_starts, expected, output_dir, page_count):
+    """
+    Checks the detected starts against the generated ones, and that the split PDFs cover every page once.
+    """
+    import fitz  # PyMuPDF
+
+    outputs = sorted(Path(output_dir).glob("*.pdf"))
+    split_pages = 0
+    for output in outputs:
+        with fitz.open(output) as doc:
+            split_pages += len(doc)
+    return doc_starts == expected and len(outputs) == len(expected) and split_pages == page_count
+
+
+def run_case(pdf_processor, statement_type, variant, statement_count, seed):
+    """
+    Generates one PDF for a statement type and variant, then times detection and splitting.
+    """
+    from synthetic_pdfs import StatementPdfGenerator
+
+    type_name = statement_type["type_name"]
+    generator = StatementPdfGenerator(statement_type, seed=seed)
+    data, expected = generator.build(statement_count=statement_count, variant=variant)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pdf_path = os.path.join(work_dir, "synthetic.pdf")
+        output_dir = os.path.join(work_dir, "split")
+        os.makedirs(output_dir)
+        with open(pdf_path, "wb") as file:
+            file.write(data)
+
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+
+        with OcrCounter() as ocr:
+            start = time.perf_counter()
+            is_readable = pdf_processor.is_pdf_machine_readable(pdf_path)
+            doc_starts = pdf_processor.get_doc_starts_by_type(pdf_path, type_name, use_ocr=not is_readable)
+            detect_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pdf_processor.split_pdf(pdf_path, output_dir, doc_starts)
+            split_seconds = time.perf_counter() - start
+
+        correct = split_is_correct(doc_starts, expected, output_dir, page_count)
+
+    return {
+        "type_name": type_name,
+        "variant": variant,
+        "pages": page_count,
+        "detect_seconds": round(detect_seconds, 4),
+        "split_seconds": round(split_seconds, 4),
+        "pages_per_sec": round(page_count / (detect_seconds + split_seconds), 2),
+        "ocr_calls_per_page": round(ocr.calls / page_count, 2),
+        "correct": correct,
+        "expected": expected if correct else str(expected),
+        "detected": doc_starts if correct else str(doc_starts),
+    }
+
+
+def print_report(results):
+    print(f"\n{'Statement type':<40} {'Variant':<8} {'Pages':>6} {'Pages/sec':>10} {'OCR/page':>9}  Split")
+    for case in results:
+        if "error" in case:
+            print(f"{case['type_name']:<40} {case['variant']:<8} {'':>6} {'':>10} {'':>9}  ERROR: {case['error']}")
+            continue
+        outcome = "ok" if case["correct"] else f"WRONG (expected {case['expected']}, detected {case['detected']})"
+        print(f"{case['type_name']:<40} {case['variant']:<8} {case['pages']:>6} {case['pages_per_sec']:>10.1f} {case['ocr_calls_per_page']:>9.2f}  {outcome}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='''
+        PDF Splitting Benchmark
+
+        Generates synthetic multi-statement PDFs for each statement type in type_models.yaml (text layer, rasterised
+        and mixed variants), runs PDFProcessor statement detection and split_pdf on them, and reports pages/sec,
+        OCR calls per page and whether the split matched the generated statements.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python benchmarks/bench_splitting.py --variants text mixed --statements 20'''
+    )
+    from synthetic_pdfs import VARIANTS
+
+    parser.add_argument('-t', '--types', type=str, nargs='+', help='Statement types to benchmark. Defaults to every type with a start_pattern or start_phrase.')
+    parser.add_argument('--variants', type=str, nargs='+', choices=VARIANTS, default=list(VARIANTS), help='PDF variants to generate.')
+    parser.add_argument('--statements', type=int, default=DEFAULT_STATEMENTS, help='Statements per generated PDF.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated PDFs.')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline.')
+    parser.add_argument('--compare', action='store_true', help='Compare with the stored baseline and exit 1 on regressions or wrong splits.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown against the baseline (0.2 = 20%%).')
+    args = parser.parse_args()
+
+    # PDFProcessor reads config/type_models.yaml relative to the working directory
+    os.chdir(REPO_ROOT)
+    from pdf_processor import PDFProcessor
+    from synthetic_pdfs import StatementPdfGenerator
+
+    pdf_processor = PDFProcessor()
+    statement_types = [
+        statement_type for statement_type in pdf_processor.config["statement_types"]
+        if StatementPdfGenerator.supports(statement_type)
+        and (not args.types or statement_type["type_name"] in args.types)
+    ]
+
+    results = []
+    for statement_type in statement_types:
+        for variant in args.variants:
+            print(f"Running {statement_type['type_name']} ({variant})...", file=sys.stderr)
+            try:
+                results.append(run_case(pdf_processor, statement_type, variant, args.statements, args.seed))
+            except Exception as e:
+                # e.g. Tesseract is not installed, which only the raster and mixed variants need
+                results.append({"type_name": statement_type["type_name"], "variant": variant, "error": str(e)})
+
+    print_report(results)
+    failures = [case for case in results if not case.get("correct")]
+
+    if args.compare:
+        regressions = [f"{case['type_name']}|{case['variant']}: split failed" for case in failures]
+        if not BASELINE_PATH.exists():
+            print(f"\nNo baseline at {BASELINE_PATH}. Run with --save-baseline first.")
+        else:
+            with open(BASELINE_PATH, "r") as file:
+                baseline = json.load(file)
+            for case in results:
+                expected = baseline.get(f"{case['type_name']}|{case['variant']}", {}).get("pages_per_sec")
+                if expected and case.get("pages_per_sec") and case["pages_per_sec"] < expected * (1 - args.tolerance):
+                    regressions.append(
+                        f"{case['type_name']}|{case['variant']}: {case['pages_per_sec']:.1f} pages/sec vs baseline {expected:.1f} pages/sec"
+                    )
+        if regressions:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+    if args.save_baseline:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        baseline = {}
+        if BASELINE_PATH.exists():
+            with open(BASELINE_PATH, "r") as file:
+                baseline = json.load(file)
+        baseline.update({f"{case['type_name']}|{case['variant']}": case for case in results if case.get("correct")})
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(baseline, file, indent=2)
+        print(f"\nBaseline saved to {BASELINE_PATH}.")
+
+
+if __name__ == "__main__":
+    main()
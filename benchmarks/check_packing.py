@@ -0,0 +1,139 @@
+# benchmarks/check_packing.py
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+MODEL_ID = "prebuilt-layout"
+LINES_PER_PAGE = 20
+
+
+def write_statements(folder, count, max_pages, seed):
+    """
+    Writes small statement PDFs whose every line names its statement and page, so a line given back to
+    the wrong statement or page shows up in the comparison.
+
+    Returns:
+        list: The paths of the PDFs, in order.
+    """
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"statement_{i + 1:03}.pdf")
+        with fitz.open() as doc:
+            for page_number in range(1, rng.randint(1, max_pages) + 1):
+                page = doc.new_page()
+                for row in range(LINES_PER_PAGE):
+                    text = f"Statement {i + 1} page {page_number} line {row + 1} {rng.randrange(100000, 999999)}"
+                    page.insert_text((50, 60 + row * 18), text, fontsize=10)
+            doc.save(path)
+        paths.append(path)
+    return paths
+
+
+def start_mock_server(config_path):
+    """
+    Starts the mock analysis service on a free local port in a background thread, returning the text
+    layer of each submitted PDF as its page lines.
+
+    Returns:
+        ThreadingHTTPServer: The running server. Call shutdown() when done.
+    """
+    from mock_doc_ai_server import MockAnalysisRequestHandler, MockAnalysisService
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockAnalysisRequestHandler)
+    server.service = MockAnalysisService(config_path, echo_text=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_packing(config_path, statements, max_pages, pack_max_pages, pack_small_pages, seed):
+    """
+    Analyses the statements packed, as raw_process.py --pack does, and one by one, and compares each
+    statement's pages.
+
+    Returns:
+        tuple: The number of packs of several statements, and one message per statement whose pages differ.
+    """
+    from doc_ai_utils import DocAIUtils
+    from prep_env import EnvironmentPrep
+    from statement_packer import StatementPacker
+
+    env_prep = EnvironmentPrep()
+    env_prep.load_statement_config(config_path)
+    statement_type, _ = env_prep.select_statement_type("Raw-extract")
+    server = start_mock_server(config_path)
+    problems = []
+    try:
+        doc_ai_utils = DocAIUtils()
+        client = doc_ai_utils.initialise_analysis_client(
+            f"http://127.0.0.1:{server.server_address[1]}/", "mock-key", MODEL_ID
+        )
+
+        def analyse(document_path, document_bytes=None):
+            return doc_ai_utils.analyse_and_project(
+                client, MODEL_ID, document_path, statement_type, include_text=True, document_bytes=document_bytes
+            )
+
+        with tempfile.TemporaryDirectory() as folder:
+            paths = write_statements(folder, statements, max_pages, seed)
+            packer = StatementPacker(max_pages=pack_max_pages, small_pages=pack_small_pages)
+            packs = [pack for pack in packer.plan(paths) if len(pack.members) > 1]
+            for pack in packs:
+                results = analyse(pack.name, packer.build(pack))
+                if results is None:
+                    problems.append(f"{pack.name}: analysis failed")
+                    continue
+                for document_path, packed in packer.split(pack, results):
+                    single = analyse(document_path)
+                    differences = packer.compare(packed, single) if single else ["not analysed alone"]
+                    if differences:
+                        problems.append(f"{os.path.basename(document_path)} in {pack.name}: {'; '.join(differences)}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return len(packs), problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='''
+        Statement Packing Check
+
+        Writes small statement PDFs, analyses them against the mock analysis service both packed with StatementPacker
+        and one by one, and checks that every statement gets back exactly its own pages and lines from the packed
+        result. The mock returns each PDF's text layer, so the comparison is exact. Needs PyMuPDF and the Azure SDK,
+        but no network access. Run it after changing StatementPacker, and verify against the real layout model with
+        raw_process.py --verify-packing before relying on packing.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python benchmarks/check_packing.py --statements 60 --pack-max-pages 20'''
+    )
+    parser.add_argument('-c', '--config_type', type=str, default=str(REPO_ROOT / 'config' / 'type_models.yaml'), help='Path to the statement types configuration YAML file.')
+    parser.add_argument('--statements', type=int, default=40, help='Statements to write.')
+    parser.add_argument('--max-pages', type=int, default=3, help='Most pages in a written statement.')
+    parser.add_argument('--pack-max-pages', type=int, default=50, help='As for raw_process.py.')
+    parser.add_argument('--pack-small-pages', type=int, default=2, help='As for raw_process.py.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the written statements.')
+    args = parser.parse_args()
+
+    pack_count, problems = check_packing(
+        args.config_type, args.statements, args.max_pages, args.pack_max_pages, args.pack_small_pages, args.seed
+    )
+    if problems:
+        print("\nFAILED:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+    print(f"\nEvery statement in {pack_count} packs split back identically.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/check_pipeline_batches.py
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+DEFAULT_TYPE = "AMEX - Card Statement"
+DEFAULT_TASKS = ["fill_missing_dates"]
+
+
+def make_statement(statement_type, document_name, transactions):
+    """
+    Builds one statement's extracted data, as StatementPipeline yields it, with the given number of transactions.
+
+    Returns:
+        tuple: The static info, summary info and transaction columns.
+    """
+    static_info = {"OriginalFileName": document_name}
+    for field in statement_type["transaction_static_fields"]:
+        static_info[field["field_name"]] = "01-Jan-2024" if field.get("is_date") else "Value"
+    summary_info = {"DocumentName": document_name}
+    for field in statement_type["summary_fields"]:
+        summary_info[field["field_name"]] = {"value": "", "confidence": ""}
+    transaction_columns = {}
+    for field in statement_type["transaction_dynamic_fields"]:
+        name = field["field_name"]
+        if field.get("is_amount"):
+            values = [f"{row + 1}.00" for row in range(transactions)]
+        elif field.get("is_date"):
+            # Every other date is missing, for fill_missing_dates to fill
+            values = ["" if row % 2 else "01 Jan" for row in range(transactions)]
+        else:
+            values = [f"{name} {row + 1}" for row in range(transactions)]
+        transaction_columns[name] = values
+    return static_info, summary_info, transaction_columns
+
+
+def build_batch(csv_utils, statement_type, statements):
+    """
+    Builds a batch of statements into output frames, as pipeline.py's write_batch() does.
+
+    Args:
+        statements (list): The name and number of transactions of each statement.
+
+    Returns:
+        tuple: The transactions DataFrame and the summary DataFrame.
+    """
+    from row_accumulator import ColumnarAccumulator
+
+    transactions = ColumnarAccumulator()
+    summaries = []
+    for document_name, count in statements:
+        static_info, summary_info, transaction_columns = make_statement(statement_type, document_name, count)
+        transactions.add_document(static_info, transaction_columns)
+        summaries.append(summary_info)
+    return csv_utils.build_output_frames(transactions.to_frame(), summaries, statement_type)
+
+
+def check_tasks(csv_utils, statement_type, tasks):
+    """
+    Runs the tasks on a batch whose statements have no transactions, and on one whose statements do.
+
+    Returns:
+        list: One message per problem found.
+    """
+    from postprocess_utils import ExcelHandler
+
+    problems = []
+    transactions_df, summaryinfo_df = build_batch(csv_utils, statement_type, [("empty_1.pdf", 0), ("empty_2.pdf", 0)])
+    try:
+        transactions_df, skipped = ExcelHandler.run_transaction_tasks(transactions_df, tasks)
+    except Exception as e:
+        problems.append(f"empty batch: tasks raised {e!r}")
+    else:
+        if sorted(skipped) != sorted(tasks):
+            problems.append(f"empty batch: skipped {skipped}, expected {tasks}")
+    if len(summaryinfo_df) != 2:
+        problems.append(f"empty batch: {len(summaryinfo_df)} summary rows, expected 2")
+
+    transactions_df, _ = build_batch(csv_utils, statement_type, [("full_1.pdf", 5), ("empty_3.pdf", 0)])
+    transactions_df, skipped = ExcelHandler.run_transaction_tasks(transactions_df, tasks)
+    if skipped:
+        problems.append(f"batch with transactions: skipped {skipped}")
+    if "fill_missing_dates" in tasks and transactions_df["Date_Processed"].isna().any():
+        problems.append("batch with transactions: fill_missing_dates left dates missing")
+    return problems
+
+
+def check_store(csv_utils, statement_type):
+    """
+    Writes two batches to a Parquet store as pipeline.py does, twice over, and checks that the second run
+    replaced the first rather than adding to it.
+
+    Returns:
+        list: One message per problem found.
+    """
+    import pyarrow.parquet as pq
+
+    problems = []
+    batches = [[("batch_1.pdf", 3)], [("batch_2.pdf", 4), ("batch_3.pdf", 0)]]
+    with tempfile.TemporaryDirectory() as output_dir:
+        for run in range(2):
+            store_dir = None
+            for statements in batches:
+                transactions_df, summaryinfo_df = build_batch(csv_utils, statement_type, statements)
+                store_dir = csv_utils.write_frames_to_store(
+                    transactions_df, summaryinfo_df, output_dir, "extracted-data", "parquet", statement_type,
+                    append=store_dir is not None
+                )
+            transaction_rows = pq.read_table(os.path.join(store_dir, "transactions.parquet")).num_rows
+            summary_rows = pq.read_table(os.path.join(store_dir, "summary.parquet")).num_rows
+            if (transaction_rows, summary_rows) != (7, 3):
+                problems.append(f"run {run + 1}: {transaction_rows} transactions and {summary_rows} summaries, expected 7 and 3")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='''
+        Pipeline Batch Check
+
+        Builds batches of extracted statements as pipeline.py does and checks that the Excel postprocessing tasks
+        are skipped on a batch without transactions rather than failing it, and that rerunning a batched Parquet
+        write replaces the store instead of duplicating its rows. Needs pandas and pyarrow, but no network access.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python benchmarks/check_pipeline_batches.py --tasks fill_missing_dates'''
+    )
+    parser.add_argument('-t', '--type', type=str, default=DEFAULT_TYPE, help='Statement type to build batches for.')
+    parser.add_argument('-c', '--config_type', type=str, default=str(REPO_ROOT / 'config' / 'type_models.yaml'), help='Path to the statement types configuration YAML file.')
+    parser.add_argument('--tasks', type=str, nargs='+', default=DEFAULT_TASKS, help='Excel postprocessing tasks to run on each batch.')
+    args = parser.parse_args()
+
+    from csv_utils import CSVUtils
+    from prep_env import EnvironmentPrep
+
+    env_prep = EnvironmentPrep()
+    env_prep.load_statement_config(args.config_type)
+    statement_type, _ = env_prep.select_statement_type(args.type)
+    csv_utils = CSVUtils()
+
+    problems = check_tasks(csv_utils, statement_type, args.tasks) + check_store(csv_utils, statement_type)
+    if problems:
+        print("\nFAILED:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+    print("\nEmpty batches skipped the tasks, and a rerun replaced the store.")
+
+
+if __name__ == "__main__":
+    main()
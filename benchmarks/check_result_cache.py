@@ -0,0 +1,134 @@
+# benchmarks/check_result_cache.py
+
+import argparse
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+DEFAULT_TYPES = ["AMEX - Card Statement", "Westpac - Bank Statement", "NAB - Credit Card Statement"]
+MODEL_ID = "check-result-cache"
+
+
+def start_mock_server(config_path, type_name, transactions, seed):
+    """
+    Starts the mock analysis service on a free local port in a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server. Call shutdown() when done.
+    """
+    from mock_doc_ai_server import MockAnalysisRequestHandler, MockAnalysisService
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockAnalysisRequestHandler)
+    server.service = MockAnalysisService(config_path, type_name=type_name, transactions=transactions, seed=seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def comparable_tables(tables):
+    return [(table.pages, table.header, table.rows.tolist()) for table in tables]
+
+
+def extract(csv_utils, field_index, document_name, statement_type):
+    """
+    Extracts a projection as reextract.reextract_one() does, with tables as plain lists so they can be compared.
+    """
+    return (
+        csv_utils.extract_static_info(field_index, document_name, statement_type),
+        csv_utils.extract_and_process_summary_info(field_index, document_name, statement_type),
+        csv_utils.process_transaction_columns(field_index, statement_type, convert_amounts=False),
+        comparable_tables(field_index.tables),
+    )
+
+
+def check_type(config_path, type_name, documents, transactions, seed):
+    """
+    Analyses documents against the mock server with a result cache, then re-extracts them from the
+    cache as reextract.py does and compares the two extractions.
+
+    Returns:
+        list: One message per document whose re-extraction differs or fails.
+    """
+    import reextract
+    from csv_utils import CSVUtils
+    from doc_ai_utils import DocAIUtils
+    from prep_env import EnvironmentPrep
+    from result_cache import AnalysisResultCache
+
+    statement_types = {
+        stype["type_name"]: stype for stype in EnvironmentPrep().load_statement_config(config_path)["statement_types"]
+    }
+    statement_type = statement_types[type_name]
+    server = start_mock_server(config_path, type_name, transactions, seed)
+    problems = []
+    try:
+        doc_ai_utils = DocAIUtils()
+        endpoint = f"http://127.0.0.1:{server.server_address[1]}/"
+        client = doc_ai_utils.initialise_analysis_client(endpoint, "mock-key", MODEL_ID)
+        csv_utils = CSVUtils()
+        reextract._init_worker(statement_types, True)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = AnalysisResultCache(cache_dir)
+            for i in range(documents):
+                document_name = f"document_{i + 1}.pdf"
+                field_index = doc_ai_utils.analyse_and_project(
+                    client, MODEL_ID, document_name, statement_type,
+                    document_bytes=b"%PDF-1.4\n", include_tables=True, result_cache=cache
+                )
+                if field_index is None:
+                    problems.append(f"{type_name} {document_name}: analysis failed")
+                    continue
+                direct = extract(csv_utils, field_index, document_name, statement_type)
+
+                cached_type, cached_name, cached = reextract.reextract_one(cache.path_for(document_name))
+                if isinstance(cached, str):
+                    problems.append(f"{type_name} {document_name}: re-extraction failed: {cached}")
+                elif (cached_type, cached_name) != (type_name, document_name):
+                    problems.append(f"{type_name} {document_name}: cached as {cached_type} {cached_name}")
+                else:
+                    cached = (*cached[:3], comparable_tables(cached[3]))
+                    for part, expected, actual in zip(("static info", "summary", "transactions", "tables"), direct, cached):
+                        if repr(expected) != repr(actual):
+                            problems.append(f"{type_name} {document_name}: {part} differ after the round trip")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='''
+        Result Cache Round Trip Check
+
+        Analyses synthesised statements against the mock analysis service with a result cache, loads each cached
+        result back the way reextract.py does and checks that re-extracting it gives exactly the static info,
+        summary, transactions and tables extracted from the live result. Needs the Azure SDK, but no network access.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python benchmarks/check_result_cache.py --documents 5'''
+    )
+    parser.add_argument('-t', '--types', type=str, nargs='+', default=DEFAULT_TYPES, help='Statement types to check.')
+    parser.add_argument('-c', '--config_type', type=str, default=str(REPO_ROOT / 'config' / 'type_models.yaml'), help='Path to the statement types configuration YAML file.')
+    parser.add_argument('--documents', type=int, default=3, help='Documents to analyse per statement type.')
+    parser.add_argument('--transactions', type=int, default=50, help='Transactions per synthesised document.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthesised results.')
+    args = parser.parse_args()
+
+    problems = []
+    for type_name in args.types:
+        print(f"Checking {type_name}...", file=sys.stderr)
+        problems.extend(check_type(args.config_type, type_name, args.documents, args.transactions, args.seed))
+
+    if problems:
+        print("\nFAILED:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+    print(f"\nAll cached results re-extracted identically ({len(args.types)} statement types).")
+
+
+if __name__ == "__main__":
+    main()
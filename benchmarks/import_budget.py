@@ -0,0 +1,110 @@
+# benchmarks/import_budget.py
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BUDGET_PATH = REPO_ROOT / "benchmarks" / "import_budget.json"
+
+
+def measure_imports(script, args):
+    """
+    Runs a script under -X importtime and returns the cumulative import time of each top-level import.
+
+    Args:
+        script (str): The script path, relative to the repository root.
+        args (list): The arguments to run it with, e.g. ["-h"].
+
+    Returns:
+        tuple: Microseconds by module name for the imports made directly by the script, every module
+            imported, and the script's exit code.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", script, *args],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    imports = {}
+    all_modules = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|", 2)
+        name = package[1:]
+        all_modules.append(name.strip())
+        if not name.startswith(" "):
+            imports[name] = int(cumulative)
+    return imports, all_modules, completed.returncode
+
+
+def check_script(script, config, runs):
+    """
+    Measures a script over several runs and checks it against its budget.
+
+    Returns:
+        dict: The median total import time, the heaviest imports and any budget violations.
+    """
+    totals = []
+    imports = {}
+    modules = []
+    returncode = 0
+    for _ in range(runs):
+        imports, modules, returncode = measure_imports(script, config.get("args", ["-h"]))
+        totals.append(sum(imports.values()))
+    total_ms = statistics.median(totals) / 1000
+
+    violations = []
+    if returncode != 0:
+        violations.append(f"exited with code {returncode}; are the requirements installed?")
+    if total_ms > config["budget_ms"]:
+        violations.append(f"{total_ms:.0f} ms of imports exceeds the {config['budget_ms']} ms budget")
+    for forbidden in config.get("forbidden", []):
+        if any(module == forbidden or module.startswith(f"{forbidden}.") for module in modules):
+            violations.append(f"imports {forbidden}")
+
+    heaviest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {"total_ms": total_ms, "heaviest": heaviest, "violations": violations}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='''
+        Import Time Budget
+
+        Runs each entry point under python -X importtime (with -h by default) and checks the total import time and the
+        modules imported against benchmarks/import_budget.json. Heavy dependencies such as pandas, PyMuPDF and the Azure
+        SDK must not be imported until they are used.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python benchmarks/import_budget.py --runs 5'''
+    )
+    parser.add_argument('-s', '--scripts', type=str, nargs='+', help='Scripts to check. Defaults to every script in the budget file.')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per script; the median is checked.')
+    parser.add_argument('--budget', type=str, default=str(BUDGET_PATH), help='Path to the budget file.')
+    args = parser.parse_args()
+
+    with open(args.budget, "r") as file:
+        budget = json.load(file)
+
+    failed = False
+    for script, config in budget["scripts"].items():
+        if args.scripts and script not in args.scripts:
+            continue
+        config = {"forbidden": budget.get("forbidden", []), **config}
+        result = check_script(script, config, args.runs)
+        status = "FAIL" if result["violations"] else "ok"
+        print(f"{script:<28} {result['total_ms']:>8.1f} ms  (budget {config['budget_ms']} ms)  {status}")
+        for name, micros in result["heaviest"]:
+            print(f"    {name:<32} {micros / 1000:>8.1f} ms")
+        for violation in result["violations"]:
+            print(f"    ! {violation}")
+        failed = failed or bool(result["violations"])
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/synthetic_pdfs.py
+
+import random
+import re
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+    from re._constants import (
+        ANY, AT, BRANCH, CATEGORY, CATEGORY_DIGIT, CATEGORY_SPACE, CATEGORY_WORD, IN, LITERAL,
+        MAX_REPEAT, MIN_REPEAT, NEGATE, NOT_LITERAL, RANGE, SUBPATTERN,
+    )
+except ImportError:
+    import sre_parse
+    from sre_constants import (
+        ANY, AT, BRANCH, CATEGORY, CATEGORY_DIGIT, CATEGORY_SPACE, CATEGORY_WORD, IN, LITERAL,
+        MAX_REPEAT, MIN_REPEAT, NEGATE, NOT_LITERAL, RANGE, SUBPATTERN,
+    )
+
+import fitz  # PyMuPDF
+
+# Variants of each synthetic PDF
+VARIANTS = ("text", "raster", "mixed")
+
+# Resolution used to rasterise pages, typical of office scanners
+RASTER_DPI = 150
+
+FILLER_DESCRIPTIONS = ["EFTPOS PURCHASE", "DIRECT CREDIT SALARY", "ATM WITHDRAWAL", "BPAY PAYMENT", "CARD FEE", "TRANSFER TO SAVINGS"]
+
+
+def sample_regex(pattern, number=1):
+    """
+    Generates a string that matches a regex, such as a start_pattern from type_models.yaml.
+
+    Repeated digits (e.g. \\d+) are filled with `number`, so a pattern like 'Statement number\\s+(\\d+)'
+    produces 'Statement number 12' for number=12. A single \\d produces '1'.
+
+    Args:
+        pattern (str): The regex.
+        number (int): The number used for repeated digits.
+
+    Returns:
+        str: A string matching the pattern.
+    """
+    def emit_category(category):
+        if category == CATEGORY_DIGIT:
+            return "1"
+        if category == CATEGORY_SPACE:
+            return " "
+        if category == CATEGORY_WORD:
+            return "a"
+        return "a"
+
+    def emit_in(items):
+        if items and items[0][0] == NEGATE:
+            return "a"
+        op, value = items[0]
+        if op == LITERAL:
+            return chr(value)
+        if op == RANGE:
+            return chr(value[0])
+        if op == CATEGORY:
+            return emit_category(value)
+        return "a"
+
+    def emit(parsed):
+        out = []
+        for op, value in parsed:
+            if op == LITERAL:
+                out.append(chr(value))
+            elif op == NOT_LITERAL:
+                out.append("a" if chr(value) != "a" else "b")
+            elif op == ANY:
+                out.append("a")
+            elif op == IN:
+                out.append(emit_in(value))
+            elif op == CATEGORY:
+                out.append(emit_category(value))
+            elif op in (MAX_REPEAT, MIN_REPEAT):
+                low, high, item = value
+                item = list(item)
+                if len(item) == 1 and item[0] == (IN, [(CATEGORY, CATEGORY_DIGIT)]) and (high is None or high > 1):
+                    out.append(str(number))
+                else:
+                    out.append(emit(item) * low)
+            elif op == SUBPATTERN:
+                out.append(emit(value[-1]))
+            elif op == BRANCH:
+                out.append(emit(value[1][0]))
+            elif op == AT:
+                continue
+        return "".join(out)
+
+    return emit(sre_parse.parse(pattern))
+
+
+class StatementPdfGenerator:
+    """
+    Builds synthetic multi-statement PDFs for a statement type from type_models.yaml.
+
+    Each statement's first page matches the type's start_pattern or start_phrase, continuation
+    pages carry "Page k of N" footers that do not, and start_end types (e.g. Bendigo) repeat the
+    statement number on every page with the must_not_contain phrase on all but the last page.
+    The expected split is returned in the same shape as PDFProcessor.find_statement_starts().
+    """
+    def __init__(self, statement_type, seed=0):
+        self.statement_type = statement_type
+        self.random = random.Random(seed)
+        self.start_pattern = statement_type.get("start_pattern")
+        self.start_phrase = statement_type.get("start_phrase")
+        self.must_not_contain = statement_type.get("must_not_contain")
+        self.start_end = statement_type.get("split_type") == "start_end"
+
+    @staticmethod
+    def supports(statement_type):
+        return bool(statement_type.get("start_pattern") or statement_type.get("start_phrase"))
+
+    def build(self, statement_count=5, pages_per_statement=(1, 4), variant="text"):
+        """
+        Builds the PDF.
+
+        Args:
+            statement_count (int): The number of statements in the PDF.
+            pages_per_statement (tuple): The inclusive range of pages per statement.
+            variant (str): "text" for a text layer, "raster" for image-only pages, or "mixed" to
+                rasterise every other page.
+
+        Returns:
+            tuple: The PDF bytes and the expected statement starts.
+        """
+        doc = fitz.open()
+        expected = {} if self.start_end else []
+
+        for statement in range(statement_count):
+            page_total = self.random.randint(*pages_per_statement)
+            statement_id = 100 + statement
+            start_page = len(doc)
+            for page_number in range(1, page_total + 1):
+                self._add_page(doc, statement_id, page_number, page_total)
+            if self.start_end:
+                expected[statement_id] = {"start": start_page, "end": len(doc) - 1}
+            else:
+                expected.append(start_page)
+
+        if variant != "text":
+            doc = self._rasterise(doc, every_other=(variant == "mixed"))
+
+        data = doc.tobytes(garbage=3, deflate=True)
+        doc.close()
+        return data, expected
+
+    def _add_page(self, doc, statement_id, page_number, page_total):
+        page = doc.new_page(width=595, height=842)  # A4 in points
+        lines = []
+
+        if self.start_end:
+            lines.append(sample_regex(self.start_pattern, number=statement_id))
+        elif page_number == 1 and self.start_phrase:
+            lines.append(self.start_phrase)
+
+        for _ in range(25):
+            amount = self.random.uniform(1, 3000)
+            lines.append(f"{self.random.randint(1, 28):02d} JAN  {self.random.choice(FILLER_DESCRIPTIONS):<28} {amount:>10,.2f}")
+
+        if self.start_end and page_number < page_total and self.must_not_contain:
+            lines.append(self.must_not_contain)
+
+        page.insert_text((50, 60), "\n".join(lines), fontsize=10, fontname="helv")
+        page.insert_text((50, 815), self._footer(statement_id, page_number, page_total), fontsize=9, fontname="helv")
+
+    def _footer(self, statement_id, page_number, page_total):
+        continuation = f"Page {page_number} of {page_total}"
+        if self.start_pattern and not self.start_end and page_number == 1:
+            return sample_regex(self.start_pattern, number=page_total)
+        if self.start_pattern and not self.start_end and re.search(self.start_pattern, continuation, flags=re.IGNORECASE):
+            # The continuation footer would look like a start page, so leave it out
+            return ""
+        return continuation
+
+    def _rasterise(self, doc, every_other=False):
+        rasterised = fitz.open()
+        for page_index, page in enumerate(doc):
+            if every_other and page_index % 2 == 0:
+                rasterised.insert_pdf(doc, from_page=page_index, to_page=page_index)
+                continue
+            pix = page.get_pixmap(dpi=RASTER_DPI)
+            new_page = rasterised.new_page(width=page.rect.width, height=page.rect.height)
+            new_page.insert_image(new_page.rect, pixmap=pix)
+        doc.close()
+        return rasterised
@@ -1,14 +1,15 @@
 # Description: This file contains utility functions to interact with Azure Blob Storage.
-from azure.storage.blob import BlobServiceClient, BlobClient
 from dotenv import load_dotenv
 import json
-from utils import Logger
+from utils import Logger, lazy_import
+
+blob = lazy_import("azure.storage.blob")
 
 
 
 # Function to get the Blob Service Client
 def get_blob_service_client(blob_account_url, blob_credential):
-    return BlobServiceClient(account_url=blob_account_url, credential=blob_credential)
+    return blob.BlobServiceClient(account_url=blob_account_url, credential=blob_credential)
 
 # Function to list blobs in a container
 def list_blobs(blob_service_client, blob_container_name, path_prefix=''):
@@ -23,7 +24,7 @@ def read_blob_content(client, container_name, blob_name):
         blob_client = client.get_blob_client(container=container_name, blob=blob_name)
         blob_content = blob_client.download_blob().readall()
         text_content = blob_content.decode('utf-8')
-        logger.info(
+        logger.debug(
             "Decoded text content for %s: %s", 
             blob_name,
             text_content[:100]
@@ -52,7 +53,7 @@ def upload_analysis_results_to_blob(storage_connection_string, container_name, b
     json_content = json.dumps(content, indent=2)
 
     # Initialize a BlobClient
-    blob_client = BlobClient.from_connection_string(conn_str=storage_connection_string, container_name=container_name, blob_name=blob_name)
+    blob_client = blob.BlobClient.from_connection_string(conn_str=storage_connection_string, container_name=container_name, blob_name=blob_name)
 
     # Upload the content
     blob_client.upload_blob(json_content, overwrite=True)
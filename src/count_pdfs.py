@@ -1,10 +1,11 @@
 # src/count_pdfs.py
 
-import pandas as pd
-import fitz  # PyMuPDF
 import os
 from pathlib import Path
-from utils import Logger
+from utils import Logger, lazy_import
+
+pd = lazy_import("pandas")
+fitz = lazy_import("fitz")  # PyMuPDF
 
 
 class PDFCounter:
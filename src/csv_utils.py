@@ -1,22 +1,151 @@
 # src/csv_utils.py
 
 import csv
-import pandas as pd
 import os
 import re
-from utils import Logger
+import shutil
+import uuid
+from datetime import datetime
+from field_index import DEFAULT_TRANSACTION_LIST_FIELD, FieldIndex
+from metrics import metrics
+from normalise_utils import ColumnNormaliser
+from raw_writer import iter_jsonl
+from table_utils import TableMaterialiser
+from utils import Logger, lazy_import
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pa_csv = lazy_import("pyarrow.csv")
+pq = lazy_import("pyarrow.parquet")
+xlsxwriter = lazy_import("xlsxwriter")
+
+# Excel's limits on the characters in a cell and the rows in a worksheet
+EXCEL_CELL_LIMIT = 32767
+EXCEL_MAX_ROWS = 1048576
+
+# Suffix of the folder of Parquet copies written next to each workbook, e.g. extracted-data.parquet/Transactions.parquet
+EXCEL_SIDECAR_SUFFIX = ".parquet"
+
+# Numeric part of an amount such as "$1,234.56 CR" or "-12.00"
+AMOUNT_PATTERN = re.compile(r'[-+]?[\d,]*\.?\d+')
+
+
+def excel_sidecar_dir(excel_file_path):
+    """
+    Returns the folder holding the Parquet copies of a workbook's sheets (see CSVUtils.write_excel_sidecar()).
+    """
+    return os.path.splitext(excel_file_path)[0] + EXCEL_SIDECAR_SUFFIX
+
+
+class TransactionExtractor:
+    """
+    Extracts transactions for one statement type.
+
+    The transaction_dynamic_fields configuration is compiled once into a tuple of
+    (field_name, converter) pairs, and the list field holding the transactions is resolved from
+    transaction_list_field, so the per-transaction path is a single loop with no YAML lookups.
+    """
+    def __init__(self, statement_type, convert_amount):
+        """
+        Args:
+            statement_type (dict): The statement type configuration.
+            convert_amount (callable): Converts an amount string, returning (value, success_flag).
+                If None, raw values are kept and no ConversionSuccess flag is added.
+        """
+        self.list_field = statement_type.get('transaction_list_field') or DEFAULT_TRANSACTION_LIST_FIELD
+        self.flag_conversion = convert_amount is not None
+        self.fields = tuple(
+            (field['field_name'], convert_amount if field.get('is_amount', False) else None)
+            for field in statement_type.get('transaction_dynamic_fields') or []
+        )
+
+    def extract(self, results):
+        """
+        Extracts the transactions from the analysis results.
+
+        Args:
+            results (AnalysisResult or FieldIndex): The analysis results object, or its FieldIndex.
+
+        Returns:
+            list: A list of dictionaries representing the processed transactions.
+        """
+        columns = self.extract_columns(results)
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    def extract_columns(self, results):
+        """
+        Extracts the transactions from the analysis results as columns.
+
+        Args:
+            results (AnalysisResult or FieldIndex): The analysis results object, or its FieldIndex.
+
+        Returns:
+            dict: A dictionary mapping each field name (and ConversionSuccess, if amounts are converted)
+                to the list of its values, one per transaction.
+        """
+        columns = {field_name: [] for field_name, _ in self.fields}
+        appenders = tuple((columns[field_name].append, field_name, converter) for field_name, converter in self.fields)
+        if self.flag_conversion:
+            columns['ConversionSuccess'] = []
+            append_flag = columns['ConversionSuccess'].append
+
+        for transactions_entry in FieldIndex.of(results).entries(self.list_field):
+            for transaction_field in transactions_entry.value or ():
+                get_field = transaction_field.value.get
+                conversion_success = True  # Assumes success unless proven otherwise
+
+                for append, field_name, converter in appenders:
+                    # Missing fields and fields without a 'value' attribute map to None
+                    field_value = getattr(get_field(field_name), 'value', None)
+                    if converter is not None and field_value:
+                        field_value, converted = converter(str(field_value))
+                        conversion_success = conversion_success and converted
+                    append(field_value)
+
+                if self.flag_conversion:
+                    append_flag(conversion_success)
+
+        return columns
 
 
 class CSVUtils:
+    # Registry of columnar output backends
+    # This makes the formats appear for selection when running `python src/process.py -h`
+    output_registry = {
+        'parquet': {
+            'func': '_write_parquet',
+            'suffix': '.parquet',
+            'description': 'Parquet dataset partitioned by statement type and month.'
+        },
+        'arrow': {
+            'func': '_write_arrow',
+            'suffix': '.arrow',
+            'description': 'Arrow IPC (Feather v2) files, zstd compressed.'
+        },
+        'csv': {
+            'func': '_write_csv_gz',
+            'suffix': '.csv.gz',
+            'description': 'Gzip-compressed CSV files.'
+        }
+        # Add more backends here
+    }
+
+    # Columns added to the columnar store to partition the data
+    partition_columns = ('StatementType', 'StatementMonth')
+
     def __init__(self):
         self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        # Compiled transaction extractors, keyed by statement type name
+        self._transaction_extractors = {}
 
+    @metrics.timed("static_field_extraction")
     def extract_static_info(self, results, original_file_name, statement_type):
         """
         Extracts static information from the analysis results.
 
         Args:
-            results (AnalysisResults): The analysis results object.
+            results (AnalysisResults or FieldIndex): The analysis results object, or its FieldIndex.
             original_file_name (str): The original file name.
             statement_type (dict): The statement type dictionary.
 
@@ -24,6 +153,8 @@ class CSVUtils:
             dict: A dictionary containing the extracted static information.
 
         """
+        field_index = FieldIndex.of(results)
+
         def extract_label_value(label):
             """
             Nested helper function to extract concatenated text values for a given label.
@@ -35,16 +166,15 @@ class CSVUtils:
                 str: The concatenated text values for the given label.
 
             """
-            for document in results.documents:
-                for name, field in document.fields.items():
-                    if name == label:
-                        # Use 'or' to select the first non-None value
-                        value = field.content or field.value
-                        if value is not None:
-                            return str(value)
-                        else:
-                            return ''
-            return ""  # Return an empty string if the label is not found
+            entry = field_index.first(label)
+            if entry is None:
+                return ""  # Return an empty string if the label is not found
+            # Use 'or' to select the first non-None value
+            value = entry.content or entry.value
+            if value is not None:
+                return str(value)
+            else:
+                return ''
 
         static_info = {
             'OriginalFileName': original_file_name
@@ -56,59 +186,64 @@ class CSVUtils:
 
         return static_info
 
-    def process_transactions(self, results, statement_type):
+    @metrics.timed("transaction_extraction")
+    def process_transactions(self, results, statement_type, convert_amounts=True):
         """
         Process transactions from the provided results based on the statement type.
 
         Args:
-            results (object): The results object containing the documents.
+            results (object or FieldIndex): The results object containing the documents, or its FieldIndex.
             statement_type (dict): The statement type configuration.
+            convert_amounts (bool): Whether to convert amounts per transaction. When False, raw amounts and no
+                ConversionSuccess flag are returned, and conversion is left to build_output_frames() in bulk.
 
         Returns:
             list: A list of dictionaries representing the processed transactions.
         """
-        
-        transactions = []
-
-        for document in results.documents:
-            if 'Transactions' in document.fields: # TO-DO: This is Transactions for westpac and accountTransactions for amex due to field naming difference - need to fix to be dynamic somehow.
-                account_trans_list = document.fields['Transactions'].value # TO-DO: Transactions for one type and accountTransactions for another - need to fix.
-
-                for transaction_field in account_trans_list:
-                    transaction = {}
-                    conversion_success = True  # Assumes success unless proven otherwise
-                    
-                    for field_config in statement_type['transaction_dynamic_fields']:
-                        field_name = field_config['field_name']
-                        is_amount = field_config.get('is_amount', False)
-                        # Initially assume field_value is None
-                        field_value = None
-                        # Check if the field exists and has a 'value' attribute
-                        if field_name in transaction_field.value and hasattr(transaction_field.value[field_name], 'value'):
-                            field_value = transaction_field.value[field_name].value
-                        
-                        if is_amount and field_value:
-                            # Convert field_value to string in case it's not
-                            field_value_str = str(field_value)
-                            field_value, temp_conversion_success = self.convert_amount(field_value_str)
-                            conversion_success = conversion_success and temp_conversion_success
-
-                        transaction[field_name] = field_value
-
-                    transaction['ConversionSuccess'] = conversion_success
-                    transactions.append(transaction)
-
-        return transactions
+        return self.get_transaction_extractor(statement_type, convert_amounts).extract(results)
+
+    @metrics.timed("transaction_extraction")
+    def process_transaction_columns(self, results, statement_type, convert_amounts=True):
+        """
+        Process transactions from the provided results into columns, for use with ColumnarAccumulator.
+
+        Args:
+            results (object or FieldIndex): The results object containing the documents, or its FieldIndex.
+            statement_type (dict): The statement type configuration.
+            convert_amounts (bool): Whether to convert amounts per transaction (see process_transactions()).
+
+        Returns:
+            dict: A dictionary mapping each field name to the list of its values, one per transaction.
+        """
+        return self.get_transaction_extractor(statement_type, convert_amounts).extract_columns(results)
+
+    def get_transaction_extractor(self, statement_type, convert_amounts=True):
+        """
+        Returns the TransactionExtractor compiled for a statement type, compiling it on first use.
+
+        Args:
+            statement_type (dict): The statement type configuration.
+            convert_amounts (bool): Whether the extractor converts amounts per transaction.
+
+        Returns:
+            TransactionExtractor: The compiled extractor.
+        """
+        key = (statement_type.get('type_name'), convert_amounts)
+        extractor = self._transaction_extractors.get(key)
+        if extractor is None:
+            extractor = TransactionExtractor(statement_type, self.convert_amount if convert_amounts else None)
+            self._transaction_extractors[key] = extractor
+        return extractor
 
     def convert_amount(self, amount_str):
 
         try:
             # Use regex to extract numeric part
-            match = re.search(r'[-+]?[\d,]*\.?\d+', amount_str)
+            match = AMOUNT_PATTERN.search(amount_str)
             if match:
                 amount_cleaned = match.group()
                 amount_cleaned = amount_cleaned.replace(',', '')
-                amount_float = float(amount_cleaned)
+                amount_float = abs(float(amount_cleaned))
                 # Determine the sign
                 if '-' in amount_str:
                     amount_float = -amount_float
@@ -122,13 +257,15 @@ class CSVUtils:
             )
             return amount_str, False
 
+    @metrics.timed("summary_field_extraction")
     def extract_and_process_summary_info(self, document_analysis_results, original_document_name, statement_type):
         """
         Extracts summary information from a document's results, now including CIs,
         and uses the statement_type configuration to determine how to process each field.
 
         Args:
-            document_analysis_results (AnalysisResults): The analysis results object.
+            document_analysis_results (AnalysisResults or FieldIndex): The analysis results object, or its FieldIndex.
+            original_document_name (str): The original document name.
             statement_type (dict): The statement type configuration.
 
         Returns:
@@ -143,6 +280,7 @@ class CSVUtils:
             }
 
         """
+        field_index = FieldIndex.of(document_analysis_results)
 
         def extract_summary_values_and_confidence(label):
             """
@@ -161,16 +299,14 @@ class CSVUtils:
             """
             value_concat = []
             confidence_concat = []
-            for document in document_analysis_results.documents:
-                for name, field in document.fields.items():
-                    if name == label:
-                        # Concatenate content from multiple entries if necessary
-                        content = field.content if field.content else field.value
-                        if content is not None:
-                            value_concat.append(content)
-                        # Aggregate confidence if available; else use placeholder
-                        confidence = field.confidence if field.confidence is not None else 'N/A'
-                        confidence_concat.append(confidence)
+            for entry in field_index.entries(label):
+                # Concatenate content from multiple entries if necessary
+                content = entry.content if entry.content else entry.value
+                if content is not None:
+                    value_concat.append(content)
+                # Aggregate confidence if available; else use placeholder
+                confidence = entry.confidence if entry.confidence is not None else 'N/A'
+                confidence_concat.append(confidence)
             value = ' '.join(value_concat) if value_concat else ''
             confidence = ' '.join(map(str, confidence_concat)) if confidence_concat else ''
             return value, confidence
@@ -245,51 +381,162 @@ class CSVUtils:
             print(f"Was passed a non-dict object: {type(summary_data)}")
         return flattened
 
+    def get_column_types(self, statement_type):
+        """
+        Collects the amount and date columns flagged in the statement type configuration.
+
+        Args:
+            statement_type (dict): The statement type configuration.
+
+        Returns:
+            tuple: A set of amount column names and a dictionary mapping date column names to their date_format (or None).
+        """
+        amount_columns = set()
+        date_columns = {}
+
+        if statement_type:
+            for section in ('transaction_dynamic_fields', 'transaction_static_fields', 'summary_fields'):
+                for field in statement_type.get(section) or []:
+                    field_name = field['field_name']
+                    if field.get('is_amount'):
+                        amount_columns.add(field_name)
+                    if field.get('is_date'):
+                        date_columns[field_name] = field.get('date_format')
+
+        return amount_columns, date_columns
+
+    def get_reference_date_field(self, statement_type):
+        """
+        Returns the static date field used to place a statement in time (e.g. StatementDate or StatementEndDate).
+        The last is_date field in transaction_static_fields is used, as it is the closing date of the statement.
+
+        Args:
+            statement_type (dict): The statement type configuration.
+
+        Returns:
+            str: The field name, or None if the statement type has no static date field.
+        """
+        reference_field = None
+        if statement_type:
+            for field in statement_type.get('transaction_static_fields') or []:
+                if field.get('is_date'):
+                    reference_field = field['field_name']
+        return reference_field
+
+    @metrics.timed("normalisation")
+    def build_output_frames(self, transactions_records, summary_data, statement_type=None):
+        """
+        Builds the Transactions and Summary DataFrames shared by all output backends, with amount and date
+        columns typed according to is_amount and is_date in the statement type configuration.
+
+        Args:
+            transactions_records (list or pd.DataFrame): A list of transaction dictionaries, or a DataFrame
+                such as the one built by ColumnarAccumulator.to_frame().
+            summary_data (list): A list of summary dictionaries from extract_and_process_summary_info().
+            statement_type (dict): The statement type configuration.
+
+        Returns:
+            tuple: The transactions DataFrame and the summary DataFrame.
+        """
+        transactions_df = pd.DataFrame(transactions_records)
+        summaryinfo_df = pd.DataFrame([self.format_summary_for_excel(summary) for summary in summary_data])
+
+        amount_columns, date_columns = self.get_column_types(statement_type)
+        normaliser = ColumnNormaliser()
+
+        # Convert amount and date columns in bulk, inferring missing years from the statement date
+        raw_dates = {col: transactions_df[col] for col in date_columns if col in transactions_df.columns}
+        transactions_df, masks = normaliser.normalise_frame(
+            transactions_df,
+            amount_columns,
+            date_columns,
+            reference_field=self.get_reference_date_field(statement_type)
+        )
+        self._keep_failed_raw_values(transactions_df, raw_dates, masks)
+
+        # A transaction converted successfully if all of its dynamic amount and date fields did
+        dynamic_converted = [
+            field['field_name'] for field in (statement_type or {}).get('transaction_dynamic_fields') or []
+            if (field.get('is_amount') or field.get('is_date')) and field['field_name'] in masks
+        ]
+        if not transactions_df.empty:
+            conversion_success = pd.Series(True, index=transactions_df.index)
+            for col in dynamic_converted:
+                conversion_success &= masks[col]
+            if 'ConversionSuccess' in transactions_df.columns:
+                transactions_df['ConversionSuccess'] = transactions_df['ConversionSuccess'].astype(bool) & conversion_success
+            else:
+                transactions_df['ConversionSuccess'] = conversion_success
+
+        # Summary columns are flattened to <field>_Value
+        summary_dates = {f"{col}_Value": date_format for col, date_format in date_columns.items()}
+        raw_dates = {col: summaryinfo_df[col] for col in summary_dates if col in summaryinfo_df.columns}
+        summaryinfo_df, masks = normaliser.normalise_frame(
+            summaryinfo_df,
+            {f"{col}_Value" for col in amount_columns},
+            summary_dates
+        )
+        self._keep_failed_raw_values(summaryinfo_df, raw_dates, masks)
+
+        return transactions_df, summaryinfo_df
+
+    def _keep_failed_raw_values(self, df, raw_columns, masks):
+        """
+        Adds a <column>_Raw column after each normalised column, holding the raw text of the values that
+        could not be converted, which the typed column only holds as NaT. The column is empty when every
+        value converted, and is always added so batches written to the same store share one schema.
+
+        Args:
+            df (pd.DataFrame): The normalised DataFrame, modified in place.
+            raw_columns (dict): The raw values of each column before normalisation.
+            masks (dict): The success masks from ColumnNormaliser.normalise_frame().
+        """
+        for col, raw in raw_columns.items():
+            if col in masks:
+                df.insert(df.columns.get_loc(col) + 1, f"{col}_Raw", raw.astype('string').where(~masks[col]))
+
     def write_transactions_and_summaries_to_excel(
         self, transactions_records, summary_data, output_dir, excel_filename, table_data=None, statement_type=None, static_info=None
     ):
-        # Create DataFrames from records
-        transactions_df = pd.DataFrame(transactions_records)
-
-        # Process summary data
-        summary_rows = []
-        for summary in summary_data:
-            flattened_summary = self.format_summary_for_excel(summary)
-            summary_rows.append(flattened_summary)
+        transactions_df, summaryinfo_df = self.build_output_frames(transactions_records, summary_data, statement_type)
+        amount_columns, _ = self.get_column_types(statement_type)
+
+        self.write_frames_to_excel(
+            transactions_df,
+            summaryinfo_df,
+            os.path.join(output_dir, excel_filename),
+            amount_columns,
+            tables=table_data
+        )
 
-        summaryinfo_df = pd.DataFrame(summary_rows)
+        self.logger.info(
+            "Data written to file %s in %s.", 
+            os.path.basename(excel_filename), 
+            os.path.basename(output_dir)
+        )
 
-        # Initialise set for amount columns
-        amount_columns = set()
+    @metrics.timed("excel_write")
+    def write_frames_to_excel(self, transactions_df, summaryinfo_df, output_file_path, amount_columns, tables=None):
+        """
+        Writes the Transactions and Summary DataFrames to an Excel workbook with money and date formatting.
 
-        # Extract field information from statement_type
-        if statement_type:
-            # Transaction Dynamic Fields
-            for field in statement_type.get('transaction_dynamic_fields', []):
-                field_name = field['field_name']
-                if field.get('is_amount'):
-                    amount_columns.add(field_name)
-
-            # Transaction Static Fields
-            for field in statement_type.get('transaction_static_fields', []):
-                field_name = field['field_name']
-                if field.get('is_amount'):
-                    amount_columns.add(field_name)
-
-        # Convert amount columns to numeric
-        for col in amount_columns:
-            if col in transactions_df.columns:
-                transactions_df[col] = pd.to_numeric(transactions_df[col], errors='coerce')
-            if col in summaryinfo_df.columns:
-                summaryinfo_df[col] = pd.to_numeric(summaryinfo_df[col], errors='coerce')
-
-        # Define the output file path
-        output_file_path = os.path.join(output_dir, excel_filename)
+        Args:
+            transactions_df (pd.DataFrame): The transactions data.
+            summaryinfo_df (pd.DataFrame): The summary data.
+            output_file_path (str): The path of the workbook to write.
+            amount_columns (set): The columns to format as money.
+            tables (list): (document name, list of MaterialisedTable) pairs to write to a Tables sheet.
+        """
+        # Partition columns are only meaningful in the columnar store
+        transactions_df = transactions_df.drop(columns=list(self.partition_columns), errors='ignore')
+        summaryinfo_df = summaryinfo_df.drop(columns=list(self.partition_columns), errors='ignore')
 
         # Write DataFrames to Excel with formatting
         with pd.ExcelWriter(
             output_file_path,
             engine='xlsxwriter',
+            datetime_format="DD/MM/YYYY",
+            date_format="DD/MM/YYYY",
         ) as writer:
             transactions_df.to_excel(writer, sheet_name='Transactions', index=False)
             summaryinfo_df.to_excel(writer, sheet_name='Summary', index=False)
@@ -306,42 +553,418 @@ class CSVUtils:
             for idx, col in enumerate(transactions_df.columns):
                 if col in amount_columns:
                     transactions_sheet.set_column(idx, idx, None, money_fmt)
-                # No date formatting applied
 
-            # Apply formats to Summary sheet (similar if there are amounts)
+            # Apply formats to Summary sheet (summary columns are flattened to <field>_Value)
             for idx, col in enumerate(summaryinfo_df.columns):
-                if col in amount_columns:
+                if col.endswith('_Value') and col[:-len('_Value')] in amount_columns:
                     summary_sheet.set_column(idx, idx, None, money_fmt)
-                # No date formatting applied
+
+            if tables:
+                self._write_tables_sheet(workbook, tables)
+
+        self.write_excel_sidecar({'Transactions': transactions_df, 'Summary': summaryinfo_df}, output_file_path)
+
+    def write_excel_sidecar(self, frames, excel_file_path):
+        """
+        Writes a Parquet copy of each sheet next to a workbook, for ExcelHandler to read instead of the workbook.
+
+        The copies are written after the workbook, so a sidecar older than its workbook means the workbook was
+        edited since, and ExcelHandler ignores it.
+
+        Args:
+            frames (dict): The DataFrame written to each sheet, by sheet name.
+            excel_file_path (str): The path of the workbook.
+        """
+        sidecar_dir = excel_sidecar_dir(excel_file_path)
+        try:
+            os.makedirs(sidecar_dir, exist_ok=True)
+            for sheet_name, df in frames.items():
+                # Blank cells are read back from a workbook as NaN, not "", so they are stored as nulls
+                df = df.copy()
+                for col in df.columns:
+                    # The static columns from ColumnarAccumulator are categorical, and keep "" as a category
+                    if isinstance(df[col].dtype, pd.CategoricalDtype):
+                        df[col] = df[col].astype(object)
+                    if df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+                        df[col] = df[col].astype(object).where(df[col].notna() & df[col].ne(""), None)
+                try:
+                    # Keeps date columns as dates, as the workbook does
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    table = self._to_arrow_table(df)
+                pq.write_table(table, os.path.join(sidecar_dir, f"{sheet_name}.parquet"))
+        except Exception as e:
+            # The workbook is complete without it; postprocessing then reads the workbook itself
+            self.logger.warning("Could not write the Parquet sidecar of %s: %s", os.path.basename(excel_file_path), e)
+
+    def _write_tables_sheet(self, workbook, document_tables):
+        """
+        Writes each table to a Tables sheet as a titled block of its header and rows, one block under another.
+        """
+        sheet = workbook.add_worksheet('Tables')
+        title_fmt = workbook.add_format({'bold': True})
+        header_fmt = workbook.add_format({'bold': True, 'bottom': 1})
+        row = 0
+        for document_name, tables in document_tables:
+            for number, table in enumerate(tables, start=1):
+                if row + len(table.rows) + 3 > EXCEL_MAX_ROWS:
+                    self.logger.warning("The Tables sheet is full; the remaining tables are only written to a columnar store.")
+                    return
+                sheet.write(row, 0, f"{document_name} - Table {number} (page {table.page_label})", title_fmt)
+                sheet.write_row(row + 1, 0, table.header, header_fmt)
+                for offset, values in enumerate(table.rows.tolist(), start=row + 2):
+                    sheet.write_row(offset, 0, values)
+                row += len(table.rows) + 3
+
+    def write_transactions_and_summaries(
+        self, transactions_records, summary_data, output_dir, store_name, output_format, statement_type=None
+    ):
+        """
+        Writes transactions and summaries to a columnar store using one of the backends in output_registry.
+
+        The store is a folder named after store_name inside output_dir, holding one table per dataset:
+            extracted-data/transactions.parquet/StatementType=.../StatementMonth=.../part-*.parquet
+            extracted-data/summary.parquet/StatementType=.../part-*.parquet
+        Arrow and CSV backends write a single transactions.arrow / transactions.csv.gz file (and so on) instead.
+
+        Args:
+            transactions_records (list or pd.DataFrame): A list of transaction dictionaries, or a DataFrame.
+            summary_data (list): A list of summary dictionaries from extract_and_process_summary_info().
+            output_dir (str): The folder to create the store in.
+            store_name (str): The name of the store folder, e.g. "extracted-data".
+            output_format (str): A key of output_registry, e.g. "parquet".
+            statement_type (dict): The statement type configuration.
+
+        Returns:
+            str: The path to the store folder.
+        """
+        if output_format not in self.output_registry:
+            raise ValueError(f"Output format '{output_format}' not recognised. Options are: {', '.join(self.output_registry)}.")
+
+        transactions_df, summaryinfo_df = self.build_output_frames(transactions_records, summary_data, statement_type)
+        return self.write_frames_to_store(transactions_df, summaryinfo_df, output_dir, store_name, output_format, statement_type)
+
+    @metrics.timed("store_write")
+    def write_frames_to_store(self, transactions_df, summaryinfo_df, output_dir, store_name, output_format, statement_type=None, append=False):
+        """
+        Writes the Transactions and Summary DataFrames from build_output_frames() to a columnar store.
+        See write_transactions_and_summaries() for the layout. The store's tables are replaced, as for every
+        backend, unless append is set: pipeline.py and distributed.py merge write the first batch of a run
+        without it and add the later batches to it as new Parquet parts.
+
+        Args:
+            transactions_df (pd.DataFrame): The transactions data.
+            summaryinfo_df (pd.DataFrame): The summary data.
+            output_dir (str): The folder to create the store in.
+            store_name (str): The name of the store folder, e.g. "extracted-data".
+            output_format (str): A key of output_registry, e.g. "parquet".
+            statement_type (dict): The statement type configuration.
+            append (bool): Add the frames to the store's tables instead of replacing them. Parquet only.
+
+        Returns:
+            str: The path to the store folder.
+        """
+        if output_format not in self.output_registry:
+            raise ValueError(f"Output format '{output_format}' not recognised. Options are: {', '.join(self.output_registry)}.")
+
+        # Add the partition columns
+        type_name = statement_type['type_name'] if statement_type else 'Unknown'
+        reference_field = self.get_reference_date_field(statement_type)
+        transactions_df['StatementType'] = type_name
+        if reference_field in transactions_df.columns and pd.api.types.is_datetime64_any_dtype(transactions_df[reference_field]):
+            transactions_df['StatementMonth'] = transactions_df[reference_field].dt.strftime('%Y-%m').fillna('Unknown')
+        else:
+            transactions_df['StatementMonth'] = 'Unknown'
+        summaryinfo_df['StatementType'] = type_name
+
+        store_dir = os.path.join(output_dir, store_name)
+        os.makedirs(store_dir, exist_ok=True)
+
+        writer = getattr(self, self.output_registry[output_format]['func'])
+        writer(transactions_df, os.path.join(store_dir, 'transactions'), ['StatementType', 'StatementMonth'], append=append)
+        writer(summaryinfo_df, os.path.join(store_dir, 'summary'), ['StatementType'], append=append)
 
         self.logger.info(
-            "Data written to file %s in %s.", 
-            os.path.basename(excel_filename), 
+            "Data written to %s store %s in %s.",
+            output_format,
+            store_name,
             os.path.basename(output_dir)
         )
-        
-    def write_raw_data_to_excel(self, texts_records, output_dir, excel_filename):
+        return store_dir
+
+    @metrics.timed("store_write")
+    def write_tables_to_store(self, document_tables, output_dir, store_name, output_format):
         """
-        Used by raw_process.py to write extracted text data to an Excel file.
+        Writes the tables of many documents to the 'tables' table of a columnar store in one write, with a
+        row per cell (see TableMaterialiser.to_long_frame()), so tables with different columns share one schema.
+
+        Args:
+            document_tables (list): (document name, list of MaterialisedTable) pairs.
+            output_dir (str): The folder to create the store in.
+            store_name (str): The name of the store folder, e.g. "extracted-data".
+            output_format (str): A key of output_registry, e.g. "parquet".
+
+        Returns:
+            str: The path to the store folder.
         """
-        # Create DataFrame from texts_records
-        texts_df = pd.DataFrame(texts_records)
+        if output_format not in self.output_registry:
+            raise ValueError(f"Output format '{output_format}' not recognised. Options are: {', '.join(self.output_registry)}.")
 
-        # Define the output file path
-        output_file_path = os.path.join(output_dir, excel_filename)
+        store_dir = os.path.join(output_dir, store_name)
+        os.makedirs(store_dir, exist_ok=True)
+        tables_df = TableMaterialiser().to_long_frame(document_tables)
+        writer = getattr(self, self.output_registry[output_format]['func'])
+        writer(tables_df, os.path.join(store_dir, 'tables'))
+
+        self.logger.info(
+            "%s table cells written to %s store %s in %s.",
+            len(tables_df),
+            output_format,
+            store_name,
+            os.path.basename(output_dir)
+        )
+        return store_dir
+
+    def read_columnar_table(self, table_path, output_format):
+        """
+        Reads one table of a columnar store back into a DataFrame.
 
-        # Write DataFrame to Excel
-        with pd.ExcelWriter(output_file_path, engine='xlsxwriter') as writer:
-            texts_df.to_excel(writer, sheet_name='ExtractedText', index=False)
+        Args:
+            table_path (str): The table path without its suffix, e.g. "<store>/transactions".
+            output_format (str): A key of output_registry.
+
+        Returns:
+            pd.DataFrame: The table data.
+        """
+        path = table_path + self.output_registry[output_format]['suffix']
+        if output_format == 'parquet':
+            table = pq.read_table(path, use_threads=True)
+        elif output_format == 'arrow':
+            with pa.memory_map(path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+        else:
+            table = pa_csv.read_csv(path)
+        df = table.to_pandas()
+
+        # Hive partition columns come back as categoricals
+        for col in self.partition_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        return df
+
+    def export_store_to_excel(self, store_dir, output_format, output_dir, excel_filename, statement_type=None):
+        """
+        Generates the Excel workbook from a columnar store written by write_transactions_and_summaries().
+
+        Args:
+            store_dir (str): The path to the store folder.
+            output_format (str): The backend the store was written with.
+            output_dir (str): The folder to write the workbook to.
+            excel_filename (str): The name of the workbook.
+            statement_type (dict): The statement type configuration, used for money formatting.
+        """
+        transactions_df = self.read_columnar_table(os.path.join(store_dir, 'transactions'), output_format)
+        summaryinfo_df = self.read_columnar_table(os.path.join(store_dir, 'summary'), output_format)
+        amount_columns, _ = self.get_column_types(statement_type)
+
+        self.write_frames_to_excel(
+            transactions_df,
+            summaryinfo_df,
+            os.path.join(output_dir, excel_filename),
+            amount_columns
+        )
+
+        self.logger.info(
+            "Excel export %s generated from %s.",
+            os.path.basename(excel_filename),
+            os.path.basename(store_dir)
+        )
+
+    def _to_arrow_table(self, df):
+        """
+        Converts a DataFrame to an Arrow table, storing untyped (object) columns as strings so that mixed
+        values returned by the analysis service do not break schema inference.
+        """
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].map(
+                    lambda value: None if value is None or (isinstance(value, float) and value != value) else str(value)
+                )
+        return pa.Table.from_pandas(df, preserve_index=False, nthreads=os.cpu_count())
+
+    def _write_parquet(self, df, table_path, partition_cols=None, append=False):
+        """
+        Writes a Parquet dataset, partitioned by the given columns, using multithreaded writes.
+        An existing dataset is replaced, unless append is set, in which case the rows are added as new parts.
+        """
+        table = self._to_arrow_table(df)
+        partition_cols = [col for col in partition_cols or [] if col in df.columns]
+        root_path = table_path + self.output_registry['parquet']['suffix']
+        if not append:
+            # A rerun must not add its rows to those of the last run
+            shutil.rmtree(root_path, ignore_errors=True)
+        # Unique per call, so appended writes add parts rather than replace them
+        timestamp = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        pq.write_to_dataset(
+            table,
+            root_path=root_path,
+            partition_cols=partition_cols or None,
+            basename_template=f"part-{timestamp}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            use_threads=True,
+        )
+
+    def _write_arrow(self, df, table_path, partition_cols=None, append=False):
+        """Writes an Arrow IPC file, replacing any earlier one. Partition columns are kept as ordinary columns."""
+        if append:
+            raise ValueError("Only Parquet stores can be appended to.")
+        table = self._to_arrow_table(df)
+        options = pa.ipc.IpcWriteOptions(compression='zstd', use_threads=True)
+        with pa.OSFile(table_path + self.output_registry['arrow']['suffix'], 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+    def _write_csv_gz(self, df, table_path, partition_cols=None, append=False):
+        """Writes a gzip-compressed CSV file, replacing any earlier one. Partition columns are kept as ordinary columns."""
+        if append:
+            raise ValueError("Only Parquet stores can be appended to.")
+        table = self._to_arrow_table(df)
+        with pa.CompressedOutputStream(table_path + self.output_registry['csv']['suffix'], 'gzip') as sink:
+            pa_csv.write_csv(table, sink)
+
+    def split_for_excel(self, text, limit=EXCEL_CELL_LIMIT):
+        """
+        Splits text into parts that fit in an Excel cell, breaking at a line end where one falls in the
+        second half of a part.
+
+        Args:
+            text (str): The text to split.
+            limit (int): The maximum characters in a part.
+
+        Returns:
+            list: The parts, in order. Empty text gives one empty part.
+        """
+        parts = []
+        while len(text) > limit:
+            cut = text.rfind("\n", limit // 2, limit)
+            cut = cut + 1 if cut != -1 else limit
+            parts.append(text[:cut])
+            text = text[cut:]
+        parts.append(text)
+        return parts
+
+    @metrics.timed("excel_write")
+    def write_raw_jsonl_to_excel(self, jsonl_path, output_dir, excel_filename):
+        """
+        Used by raw_process.py to derive an Excel view from the JSONL written by RawTextWriter.
+
+        Records are streamed into the workbook in xlsxwriter's constant memory mode. Text longer than an
+        Excel cell allows is continued on the following rows, numbered by the Part column, and a new
+        ExtractedText sheet is started when a sheet reaches Excel's row limit.
 
-            # Adjust the column width and wrap text
-            worksheet = writer.sheets['ExtractedText']
-            worksheet.set_column('B:B', 100)  # Set column B width (ExtractedText)
-            text_wrap_format = writer.book.add_format({'text_wrap': True})
-            worksheet.set_column('B:B', None, text_wrap_format)
+        Args:
+            jsonl_path (str): The JSONL file, e.g. extracted-text.jsonl.
+            output_dir (str): The folder to write the workbook to.
+            excel_filename (str): The name of the workbook.
+        """
+        output_file_path = os.path.join(output_dir, excel_filename)
+        workbook = xlsxwriter.Workbook(output_file_path, {'constant_memory': True})
+        text_wrap_format = workbook.add_format({'text_wrap': True})
+        worksheet = None
+        sheets = 0
+        row = EXCEL_MAX_ROWS
+        key_columns = None
+
+        for record in iter_jsonl(jsonl_path):
+            if key_columns is None:
+                key_columns = [name for name in record if name != "Extracted Text"]
+            for part, text in enumerate(self.split_for_excel(record.get("Extracted Text") or ""), start=1):
+                if row >= EXCEL_MAX_ROWS:
+                    sheets += 1
+                    worksheet = workbook.add_worksheet('ExtractedText' if sheets == 1 else f'ExtractedText ({sheets})')
+                    worksheet.write_row(0, 0, [*key_columns, "Part", "Extracted Text"])
+                    worksheet.set_column(len(key_columns) + 1, len(key_columns) + 1, 100, text_wrap_format)
+                    row = 1
+                worksheet.write_row(row, 0, [record.get(name) for name in key_columns])
+                worksheet.write_number(row, len(key_columns), part)
+                worksheet.write_string(row, len(key_columns) + 1, text, text_wrap_format)
+                row += 1
+
+        if worksheet is None:
+            workbook.add_worksheet('ExtractedText')
+        workbook.close()
 
         self.logger.info(
             "Data written to file %s in %s.", 
             os.path.basename(excel_filename), 
             os.path.basename(output_dir)
-        )
\ No newline at end of file
+        )
+
+    @metrics.timed("store_write")
+    def write_raw_jsonl_to_store(self, jsonl_path, output_dir, store_name, output_format, table_name='extracted_text', batch_size=1000):
+        """
+        Used by raw_process.py to derive a columnar table from the JSONL written by RawTextWriter, reading
+        and writing batch_size records at a time. The table is replaced, as the JSONL holds every record.
+
+        Args:
+            jsonl_path (str): The JSONL file, e.g. extracted-text.jsonl.
+            output_dir (str): The folder to create the store in.
+            store_name (str): The name of the store folder, e.g. "extracted-data".
+            output_format (str): A key of output_registry, e.g. "parquet".
+            table_name (str): The name of the table in the store.
+            batch_size (int): The records written at a time.
+
+        Returns:
+            str: The path to the store folder.
+        """
+        if output_format not in self.output_registry:
+            raise ValueError(f"Output format '{output_format}' not recognised. Options are: {', '.join(self.output_registry)}.")
+
+        store_dir = os.path.join(output_dir, store_name)
+        os.makedirs(store_dir, exist_ok=True)
+        table_path = os.path.join(store_dir, table_name) + self.output_registry[output_format]['suffix']
+
+        writer = None
+        sink = None
+        schema = None
+        batch = []
+
+        def write_batch():
+            nonlocal writer, sink, schema
+            table = pa.Table.from_pylist(batch, schema=schema)
+            if writer is None:
+                schema = table.schema
+                if output_format == 'parquet':
+                    shutil.rmtree(table_path, ignore_errors=True)
+                    os.makedirs(table_path)
+                    writer = pq.ParquetWriter(os.path.join(table_path, "part-0.parquet"), schema)
+                elif output_format == 'arrow':
+                    sink = pa.OSFile(table_path, 'wb')
+                    writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+                else:
+                    sink = pa.CompressedOutputStream(table_path, 'gzip')
+                    writer = pa_csv.CSVWriter(sink, schema)
+            writer.write_table(table)
+            batch.clear()
+
+        try:
+            for record in iter_jsonl(jsonl_path):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    write_batch()
+            if batch:
+                write_batch()
+        finally:
+            if writer is not None:
+                writer.close()
+            if sink is not None:
+                sink.close()
+
+        self.logger.info(
+            "Data written to %s store %s in %s.",
+            output_format,
+            store_name,
+            os.path.basename(output_dir)
+        )
+        return store_dir
@@ -0,0 +1,206 @@
+# src/dedup_utils.py
+
+import csv
+import hashlib
+import os
+import re
+import unicodedata
+from metrics import metrics
+from utils import Logger, lazy_import
+
+np = lazy_import("numpy")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+# Modulus of the MinHash permutations, a Mersenne prime larger than any 32-bit shingle hash
+MINHASH_PRIME = (1 << 61) - 1
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class DocumentFingerprint:
+    """
+    The byte hash, page count and MinHash signature of one PDF.
+    """
+    __slots__ = ('path', 'sha256', 'pages', 'signature')
+
+    def __init__(self, path, sha256, pages, signature):
+        self.path = path
+        self.sha256 = sha256
+        self.pages = pages
+        self.signature = signature
+
+
+class DuplicateDetector:
+    """
+    Finds duplicate PDFs before they are sent for analysis.
+
+    Exact duplicates are found by the SHA-256 of the file. Near duplicates, such as a statement that
+    was re-exported or re-scanned, are found by MinHash: the text of each page (from the text layer,
+    or OCR when use_ocr is set) is normalised to lower-case word tokens, split into shingles of
+    shingle_size tokens, and summarised by num_perm minimum hashes. The signatures are indexed by
+    locality-sensitive hashing in bands of band_rows values, so each document is only compared with
+    the documents sharing a band with it, rather than with every other document. A candidate is a
+    duplicate if it has the same page count and its estimated Jaccard similarity is at least threshold.
+
+    The first document seen of each group is the canonical copy, and is the only one analysed.
+    """
+    def __init__(self, pdf_processor=None, use_ocr=False, threshold=0.9, shingle_size=5, num_perm=128, band_rows=8, seed=1):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.pdf_processor = pdf_processor
+        self.use_ocr = use_ocr
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.band_rows = band_rows
+        self.bands = num_perm // band_rows
+        self.num_perm = self.bands * band_rows
+        rng = np.random.default_rng(seed)
+        self.perm_a = rng.integers(1, 1 << 31, size=self.num_perm, dtype=np.uint64)
+        self.perm_b = rng.integers(0, 1 << 31, size=self.num_perm, dtype=np.uint64)
+
+        # Index of the canonical documents seen so far
+        self.by_sha256 = {}
+        self.band_buckets = [{} for _ in range(self.bands)]
+
+    def file_hash(self, pdf_path):
+        """
+        Returns the SHA-256 of a file, read in 1 MB chunks.
+        """
+        digest = hashlib.sha256()
+        with open(pdf_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def page_texts(self, pdf_path):
+        """
+        Returns the text of each page, from the text layer, or OCR for pages without one when use_ocr is set.
+        """
+        texts = []
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                if self.use_ocr and self.pdf_processor is not None:
+                    texts.append(self.pdf_processor.extract_text_from_page(page))
+                else:
+                    texts.append(page.get_text())
+        return texts
+
+    def signature(self, text):
+        """
+        Returns the MinHash signature of a text, or None if it has fewer tokens than one shingle.
+        """
+        tokens = TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower())
+        if len(tokens) < self.shingle_size:
+            return None
+        shingles = {" ".join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "little") for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # (a * h + b) mod p for every permutation and shingle, then the minimum per permutation
+        return ((self.perm_a[:, None] * hashes[None, :] + self.perm_b[:, None]) % np.uint64(MINHASH_PRIME)).min(axis=1)
+
+    def fingerprint(self, pdf_path):
+        """
+        Fingerprints one PDF.
+
+        Returns:
+            DocumentFingerprint: The file's hash, page count and text signature (None without enough text).
+        """
+        texts = self.page_texts(pdf_path)
+        return DocumentFingerprint(pdf_path, self.file_hash(pdf_path), len(texts), self.signature("\n".join(texts)))
+
+    def _band_keys(self, signature):
+        return [signature[i * self.band_rows:(i + 1) * self.band_rows].tobytes() for i in range(self.bands)]
+
+    def match(self, fingerprint):
+        """
+        Looks a document up in the index, adding it as a canonical copy if it is not a duplicate.
+
+        Returns:
+            tuple: The canonical DocumentFingerprint, 'exact' or 'near', and the similarity, or None if the
+                document is not a duplicate.
+        """
+        canonical = self.by_sha256.get(fingerprint.sha256)
+        if canonical is not None:
+            return canonical, "exact", 1.0
+
+        band_keys = None
+        if fingerprint.signature is not None:
+            band_keys = self._band_keys(fingerprint.signature)
+            best = None
+            checked = set()
+            for buckets, key in zip(self.band_buckets, band_keys):
+                for candidate in buckets.get(key, ()):
+                    if candidate.path in checked or candidate.pages != fingerprint.pages:
+                        continue
+                    checked.add(candidate.path)
+                    similarity = float((candidate.signature == fingerprint.signature).mean())
+                    if similarity >= self.threshold and (best is None or similarity > best[1]):
+                        best = (candidate, similarity)
+            if best is not None:
+                return best[0], "near", best[1]
+
+        self.by_sha256[fingerprint.sha256] = fingerprint
+        if band_keys is not None:
+            for buckets, key in zip(self.band_buckets, band_keys):
+                buckets.setdefault(key, []).append(fingerprint)
+        return None
+
+    def find_duplicates(self, pdf_paths):
+        """
+        Fingerprints each PDF and groups the duplicates under their canonical copy.
+
+        Args:
+            pdf_paths (list): The PDFs, in the order they should be considered; the first of each group is canonical.
+
+        Returns:
+            tuple: The canonical paths in order, and a dictionary from each canonical path to a list of
+                (duplicate path, 'exact' or 'near', similarity) tuples.
+        """
+        canonical_paths = []
+        duplicates = {}
+        for pdf_path in pdf_paths:
+            try:
+                with metrics.stage("dedup_fingerprint"):
+                    fingerprint = self.fingerprint(pdf_path)
+            except Exception as e:
+                # An unreadable PDF is still sent for analysis, which reports its own error
+                self.logger.error("Error fingerprinting %s: %s", os.path.basename(pdf_path), e)
+                canonical_paths.append(pdf_path)
+                continue
+
+            found = self.match(fingerprint)
+            if found is None:
+                canonical_paths.append(pdf_path)
+                continue
+            canonical, kind, similarity = found
+            duplicates.setdefault(canonical.path, []).append((pdf_path, kind, similarity))
+            self.logger.info(
+                "%s is a duplicate (%s, %.2f) of %s.",
+                os.path.basename(pdf_path), kind, similarity, os.path.basename(canonical.path)
+            )
+
+        duplicate_count = sum(len(group) for group in duplicates.values())
+        self.logger.info(
+            "%s of %s documents are duplicates and will not be sent for analysis.",
+            duplicate_count, len(pdf_paths)
+        )
+        return canonical_paths, duplicates
+
+    def write_report(self, duplicates, output_path):
+        """
+        Writes a CSV listing each duplicate with its canonical copy, match type and similarity.
+
+        Args:
+            duplicates (dict): The duplicates from find_duplicates().
+            output_path (str): The path of the CSV to write.
+        """
+        with open(output_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Duplicate", "Canonical", "Match", "Similarity"])
+            for canonical_path, group in duplicates.items():
+                for duplicate_path, kind, similarity in group:
+                    writer.writerow([
+                        os.path.basename(duplicate_path), os.path.basename(canonical_path), kind, f"{similarity:.3f}"
+                    ])
+        self.logger.info("Duplicate report written to %s.", os.path.basename(output_path))
@@ -0,0 +1,348 @@
+# distributed.py
+
+import os
+import argparse
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+from prep_env import EnvironmentPrep
+from pdf_processor import PDFProcessor
+from doc_ai_utils import DocAIUtils
+from csv_utils import CSVUtils
+from job_queue import Heartbeat, default_worker_id, open_job_queue, LEASED, PENDING
+from metrics import metrics
+from row_accumulator import ColumnarAccumulator
+from utils import Logger
+
+# Job kinds, in pipeline order
+SPLIT = "split"
+ANALYSE = "analyse"
+
+
+class DistributedWorker:
+    """
+    Leases split and analysis jobs from a shared job queue and runs them.
+
+    A split job finds the statements in one input PDF, writes each to the shared statements folder and
+    enqueues an analysis job for it. An analysis job analyses one statement, then projects and extracts
+    it, and returns the extracted data as the job's result for the merge step. Statement types and their
+    analysis clients are resolved from the configuration the first time a job needs them.
+    """
+    def __init__(self, job_queue, config_path, worker_id=None, kinds=None):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.job_queue = job_queue
+        self.worker_id = worker_id or default_worker_id()
+        self.kinds = kinds or [SPLIT, ANALYSE]
+        self.env_prep = EnvironmentPrep()
+        self.env_prep.load_statement_config(config_path)
+        self.pdf_processor = None
+        self.doc_ai_utils = DocAIUtils()
+        self.csv_utils = CSVUtils()
+        self.clients = {}
+        self.job_handlers = {SPLIT: self.run_split_job, ANALYSE: self.run_analyse_job}
+
+    def run(self, poll_interval=5, exit_when_idle=True):
+        """
+        Runs jobs until the queue has no pending or leased jobs left, or forever if exit_when_idle is False.
+
+        Returns:
+            dict: The number of jobs completed and failed by this worker.
+        """
+        totals = {"completed": 0, "failed": 0}
+        while True:
+            job = self.job_queue.lease(self.worker_id, self.kinds)
+            if job is None:
+                if exit_when_idle and not self._has_outstanding_jobs():
+                    return totals
+                time.sleep(poll_interval)
+                continue
+
+            with Heartbeat(self.job_queue, job, self.worker_id) as heartbeat:
+                try:
+                    result = self.job_handlers[job.kind](job.payload)
+                    error = None
+                except Exception as e:
+                    result = None
+                    error = e
+
+            if error is not None:
+                status = self.job_queue.fail(job, self.worker_id, error)
+                totals["failed"] += 1
+                self.logger.error("%s job %s failed (attempt %s, now %s): %s", job.kind, job.id, job.attempts, status, error)
+            elif heartbeat.lost or not self.job_queue.complete(job, self.worker_id, result):
+                # The lease expired and the job was requeued, so another worker will redo it
+                self.logger.warning("Lost the lease on %s job %s; its result was discarded.", job.kind, job.id)
+            else:
+                totals["completed"] += 1
+
+    def _has_outstanding_jobs(self):
+        counts = self.job_queue.counts()
+        return any(
+            kind_counts.get(PENDING, 0) or kind_counts.get(LEASED, 0)
+            for kind, kind_counts in counts.items() if kind in self.kinds
+        )
+
+    def _statement_type(self, type_name):
+        if type_name not in self.clients:
+            statement_type, selected_env_var = self.env_prep.select_statement_type(type_name)
+            model_id = self.env_prep.set_model_id(selected_env_var)
+            client = self.doc_ai_utils.initialise_analysis_client(
+                os.getenv("MODEL_ENDPOINT"), os.getenv("MODEL_API_KEY"), model_id
+            )
+            self.clients[type_name] = (statement_type, model_id, client)
+        return self.clients[type_name]
+
+    def run_split_job(self, payload):
+        """
+        Splits one input PDF into the shared statements folder and enqueues an analysis job per statement.
+
+        Args:
+            payload (dict): 'pdf_path', 'type', 'statements_folder' and 'manual_processing_folder'.
+
+        Returns:
+            dict: The number of statements found.
+        """
+        if self.pdf_processor is None:
+            self.pdf_processor = PDFProcessor()
+        pdf_path = payload["pdf_path"]
+        with metrics.document(os.path.basename(pdf_path)):
+            doc_starts = self.pdf_processor.detect_doc_starts(pdf_path, payload["type"])
+            if not doc_starts:
+                self.pdf_processor.copy_to_manual_processing(pdf_path, payload["manual_processing_folder"])
+                return {"statements": 0}
+
+            for file_name, document_bytes in self.pdf_processor.iter_split_documents(pdf_path, doc_starts):
+                statement_path = os.path.join(payload["statements_folder"], file_name)
+                # Written under a temporary name so a worker on another node never reads a partial file
+                temporary_path = f"{statement_path}.{self.worker_id}.tmp"
+                with open(temporary_path, "wb") as file:
+                    file.write(document_bytes)
+                os.replace(temporary_path, statement_path)
+                self.job_queue.enqueue(ANALYSE, {"statement_path": statement_path, "type": payload["type"]}, key=statement_path)
+
+        self.logger.info("%s has been split into %s statements.", os.path.basename(pdf_path), len(doc_starts))
+        return {"statements": len(doc_starts)}
+
+    def run_analyse_job(self, payload):
+        """
+        Analyses and extracts one statement.
+
+        Args:
+            payload (dict): 'statement_path' and 'type'.
+
+        Returns:
+            dict: The statement's static info, summary info and transaction columns.
+        """
+        statement_type, model_id, client = self._statement_type(payload["type"])
+        statement_path = payload["statement_path"]
+        file_name = os.path.basename(statement_path)
+        with metrics.document(file_name):
+            field_index = self.doc_ai_utils.analyse_and_project(client, model_id, statement_path, statement_type)
+            if field_index is None:
+                raise RuntimeError(f"No results found for {file_name}.")
+            return {
+                "static": self.csv_utils.extract_static_info(field_index, file_name, statement_type),
+                "summary": self.csv_utils.extract_and_process_summary_info(field_index, file_name, statement_type),
+                # Amounts are converted in bulk when the results are merged
+                "columns": self.csv_utils.process_transaction_columns(field_index, statement_type, convert_amounts=False),
+            }
+
+
+def enqueue(args, logger):
+    """
+    Enqueues a split job for every PDF in the input folder. The input folder and output folder must be
+    on storage every worker can read.
+    """
+    job_queue = open_job_queue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    # Fails early on an unknown statement type, rather than in every split job
+    env_prep = EnvironmentPrep()
+    env_prep.load_statement_config(args.config_type)
+    env_prep.select_statement_type(args.type)
+
+    output_folder = os.path.abspath(args.output or args.input)
+    statements_folder = os.path.join(output_folder, 'split-files')
+    manual_processing_folder = os.path.join(output_folder, 'manual-splitting required')
+    os.makedirs(statements_folder, exist_ok=True)
+    os.makedirs(manual_processing_folder, exist_ok=True)
+
+    added = 0
+    pdf_files = sorted(Path(args.input).glob("*.pdf"))
+    for pdf_file in pdf_files:
+        pdf_path = str(pdf_file.resolve())
+        payload = {
+            "pdf_path": pdf_path,
+            "type": args.type,
+            "statements_folder": statements_folder,
+            "manual_processing_folder": manual_processing_folder,
+        }
+        added += job_queue.enqueue(SPLIT, payload, key=pdf_path)
+    logger.info("Enqueued %s of %s PDFs for splitting (the rest were already queued).", added, len(pdf_files))
+
+
+def work(args, logger):
+    """
+    Runs a worker until the queue is drained.
+    """
+    job_queue = open_job_queue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    if ANALYSE in args.kinds and (not os.getenv("MODEL_ENDPOINT") or not os.getenv("MODEL_API_KEY")):
+        logger.error("Error: MODEL_ENDPOINT and MODEL_API_KEY must be set in the .env file.")
+        exit(1)
+
+    worker = DistributedWorker(job_queue, args.config_type, worker_id=args.worker_id, kinds=args.kinds)
+    logger.info("Worker %s started for %s jobs.", worker.worker_id, ", ".join(worker.kinds))
+    totals = worker.run(poll_interval=args.poll_interval, exit_when_idle=not args.keep_running)
+    logger.info("Worker %s finished. Jobs completed: %s. Jobs failed: %s.", worker.worker_id, totals["completed"], totals["failed"])
+
+
+def status(args, logger):
+    """
+    Requeues expired leases and logs the number of jobs in each state.
+    """
+    job_queue = open_job_queue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    job_queue.requeue_expired()
+    for kind, kind_counts in sorted(job_queue.counts().items()):
+        logger.info("%s jobs: %s.", kind, ", ".join(f"{state} {count}" for state, count in sorted(kind_counts.items())))
+    for kind, payload, error in job_queue.failures():
+        logger.error("Failed %s job for %s: %s", kind, payload.get("pdf_path") or payload.get("statement_path"), error)
+
+
+def merge(args, logger):
+    """
+    Merges the results of every completed analysis job into one output, as process.py writes it.
+    """
+    job_queue = open_job_queue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    env_prep = EnvironmentPrep()
+    env_prep.load_statement_config(args.config_type)
+    statement_type, _ = env_prep.select_statement_type(args.type)
+
+    counts = job_queue.counts()
+    outstanding = sum(counts.get(kind, {}).get(state, 0) for kind in (SPLIT, ANALYSE) for state in (PENDING, LEASED))
+    if outstanding:
+        logger.warning("%s jobs are still pending or leased; their statements will be missing from the output.", outstanding)
+
+    output_folder = args.output
+    output_format = args.format
+    csv_utils = CSVUtils()
+    amount_columns, _ = csv_utils.get_column_types(statement_type)
+    transactions = ColumnarAccumulator()
+    summaries = []
+    totals = {"statements": 0, "transactions": 0}
+    store_dir = None
+
+    def write_batch():
+        nonlocal transactions, summaries, store_dir
+        transactions_df, summaryinfo_df = csv_utils.build_output_frames(transactions.to_frame(), summaries, statement_type)
+        if output_format == 'excel':
+            csv_utils.write_frames_to_excel(
+                transactions_df, summaryinfo_df, os.path.join(output_folder, "extracted-data.xlsx"), amount_columns
+            )
+        else:
+            # The first batch replaces the store left by an earlier merge; later batches add to it
+            store_dir = csv_utils.write_frames_to_store(
+                transactions_df, summaryinfo_df, output_folder, "extracted-data", output_format, statement_type,
+                append=store_dir is not None
+            )
+        transactions = ColumnarAccumulator()
+        summaries = []
+
+    for payload, result in job_queue.results(ANALYSE):
+        if payload["type"] != args.type:
+            continue
+        transactions.add_document(result["static"], result["columns"])
+        summaries.append(result["summary"])
+        totals["statements"] += 1
+        # Parquet stores can be appended to, so large runs are merged in batches
+        if output_format == 'parquet' and len(summaries) >= args.flush_every:
+            totals["transactions"] += len(transactions)
+            write_batch()
+
+    totals["transactions"] += len(transactions)
+    if summaries:
+        write_batch()
+    if store_dir and args.excel:
+        csv_utils.export_store_to_excel(store_dir, output_format, output_folder, "extracted-data.xlsx", statement_type=statement_type)
+
+    failed = sum(1 for _ in job_queue.failures())
+    logger.info(
+        "Statements merged: %s. Transactions merged: %s. Failed jobs: %s.",
+        totals["statements"], totals["transactions"], failed
+    )
+
+
+def main():
+    # Start time
+    start_time = time.time()
+    # Load environment variables
+    load_dotenv()
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description='''
+        Distributed Processing Script
+
+        Spreads preprocessing and processing over several processes or nodes through a shared job queue: a SQLite
+        database on storage every node can reach, or a Redis server. The coordinator enqueues a split job per input
+        PDF; workers lease jobs, split PDFs into the shared split-files folder, enqueue and run an analysis job per
+        statement, and heartbeat while they work. Jobs whose lease expires (e.g. the worker's node died) are requeued.
+        Once the queue is drained, merge writes every extracted statement to one output.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example:
+    python src/distributed.py enqueue -q /mnt/shared/run-1/jobs.sqlite -i /mnt/shared/run-1 -t "AMEX - Card Statement"
+    python src/distributed.py work -q /mnt/shared/run-1/jobs.sqlite            (on each node)
+    python src/distributed.py merge -q /mnt/shared/run-1/jobs.sqlite -o /mnt/shared/run-1 -t "AMEX - Card Statement" -f parquet --excel'''
+    )
+
+    parent = argparse.ArgumentParser(add_help=False)
+    parent.add_argument('-q', '--queue', type=str, required=True, help='Job queue: a SQLite database path on shared storage, or a redis:// URL.')
+    parent.add_argument('-c', '--config_type', type=str, default='config/type_models.yaml', help='Path to the statement types configuration YAML file')
+    parent.add_argument('--lease-seconds', type=int, default=300, help='How long a worker holds a job without a heartbeat before it is requeued.')
+    parent.add_argument('--max-attempts', type=int, default=3, help='How many times a job is tried before it is marked failed.')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', parents=[parent], help='Enqueue the PDFs in a folder for splitting.')
+    enqueue_parser.add_argument('-i', '--input', type=str, required=True, help='Path to the input folder containing the original PDFs')
+    enqueue_parser.add_argument('-o', '--output', type=str, help='Shared folder for the split statements. Defaults to the input folder.')
+    enqueue_parser.add_argument('-t', '--type', type=str, required=True, help='Name of the statement type to use')
+
+    work_parser = subparsers.add_parser('work', parents=[parent], help='Run jobs until the queue is drained.')
+    work_parser.add_argument('--kinds', type=str, nargs='+', choices=[SPLIT, ANALYSE], default=[SPLIT, ANALYSE], help='Kinds of job this worker runs.')
+    work_parser.add_argument('--worker-id', type=str, help='Name of the worker in the queue. Defaults to HOSTNAME-PID.')
+    work_parser.add_argument('--poll-interval', type=float, default=5, help='Seconds to wait when no job is pending.')
+    work_parser.add_argument('--keep-running', action='store_true', help='Keep polling for jobs after the queue is drained.')
+    work_parser.add_argument('--metrics', type=str, help='Write this worker\'s stage timings to this file when it finishes.')
+
+    subparsers.add_parser('status', parents=[parent], help='Requeue expired leases and show the number of jobs in each state.')
+
+    merge_parser = subparsers.add_parser('merge', parents=[parent], help='Merge the extracted data of every analysed statement.')
+    merge_parser.add_argument('-o', '--output', type=str, required=True, help='Folder to write the merged output to')
+    merge_parser.add_argument('-t', '--type', type=str, required=True, help='Name of the statement type to merge')
+    merge_parser.add_argument('-f', '--format', type=str, default='excel', choices=['excel', *CSVUtils.output_registry], help='Output format, as for process.py.')
+    merge_parser.add_argument('--excel', action='store_true', help='When writing a columnar store, also export extracted-data.xlsx from it.')
+    merge_parser.add_argument('--flush-every', type=int, default=500, help='With --format parquet, write to the store after this many statements.')
+
+    args = parser.parse_args()
+
+    if getattr(args, 'metrics', None):
+        metrics.enable()
+
+    # Set up logger
+    logger = Logger.get_logger("Distributed", log_to_file=True)
+
+    commands = {'enqueue': enqueue, 'work': work, 'status': status, 'merge': merge}
+    commands[args.command](args, logger)
+
+    # end time
+    end_time = time.time()
+    # Calculate time taken and print as hh:mm:ss
+    logger.info(
+        "Time taken: %s",
+        time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))
+    )
+
+    if getattr(args, 'metrics', None):
+        metrics.write(args.metrics)
+        logger.info("Stage timings written to %s.", args.metrics)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 # src/doc_ai_utils.py
 
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
-from utils import Logger
+from field_index import FieldIndex
+from metrics import metrics
+from table_utils import TableMaterialiser
+from utils import Logger, format_megabytes, get_memory_usage
 import os
 
 
@@ -22,6 +23,9 @@ class DocAIUtils:
         Returns:
             DocumentAnalysisClient: The initialized Document Intelligence Client.
         """
+        from azure.ai.formrecognizer import DocumentAnalysisClient
+        from azure.core.credentials import AzureKeyCredential
+
         self.logger.info("Initializing Document Intelligence Client...\n")
         credential = AzureKeyCredential(api_key)
         client = DocumentAnalysisClient(endpoint=endpoint, credential=credential)
@@ -32,7 +36,7 @@ class DocAIUtils:
         )
         return client
 
-    def analyse_document(self, client, model_id, document_path):
+    def analyse_document(self, client, model_id, document_path, document_bytes=None):
         """
         Analyzes a document using the specified client and model ID.
 
@@ -40,6 +44,7 @@ class DocAIUtils:
             client (DocumentAnalysisClient): The client object used to interact with the document analysis service.
             model_id (str): The ID of the model to be used for document analysis.
             document_path (str): The path to the document file to be analyzed.
+            document_bytes (bytes): The document itself, if it is held in memory. document_path is then only used as its name.
 
         Returns:
             AnalysisResult: The result of the document analysis.
@@ -49,8 +54,14 @@ class DocAIUtils:
             os.path.basename(document_path)
         )
         try:
-            with open(document_path, "rb") as document:
-                poller = client.begin_analyze_document(model_id=model_id, document=document)
+            with metrics.stage("analysis_submit"):
+                if document_bytes is None:
+                    # The client streams an open file, so the PDF is not read into memory first
+                    with open(document_path, "rb") as document:
+                        poller = client.begin_analyze_document(model_id=model_id, document=document)
+                else:
+                    poller = client.begin_analyze_document(model_id=model_id, document=document_bytes)
+            with metrics.stage("analysis_poll"):
                 result = poller.result()
             self.logger.info(
                 "Analyzed:\n%s.\n",
@@ -65,6 +76,53 @@ class DocAIUtils:
             result = None
         return result
 
+    def analyse_and_project(self, client, model_id, document_path, statement_type, include_text=False, document_bytes=None, include_tables=False, result_cache=None):
+        """
+        Analyzes a document and projects the result down to the fields the statement type references.
+
+        The full AnalysisResult is released as soon as the projection is built, so only the compact
+        FieldIndex is held while the document waits for extraction. The process's RSS while the full
+        result was held, and its peak RSS so far, are logged. With several documents in flight at once
+        these are process-wide figures, not the document's own.
+
+        Args:
+            client (DocumentAnalysisClient): The client object used to interact with the document analysis service.
+            model_id (str): The ID of the model to be used for document analysis.
+            document_path (str): The path to the document file to be analyzed.
+            statement_type (dict): The statement type configuration.
+            include_text (bool): Whether to keep the text lines of each page, as used by raw_process.py.
+            document_bytes (bytes): The document itself, if it is held in memory (see analyse_document()).
+            include_tables (bool): Whether to keep the tables the model found, as dense grids.
+            result_cache (AnalysisResultCache): Stores the full result before it is projected, for reextract.py.
+
+        Returns:
+            FieldIndex: The projected result, or None if the analysis failed.
+        """
+        result = self.analyse_document(client, model_id, document_path, document_bytes=document_bytes)
+        if result is None:
+            return None
+
+        rss, peak_rss = get_memory_usage()
+        if result_cache is not None:
+            try:
+                with metrics.stage("result_cache_write"):
+                    result_cache.store(os.path.basename(document_path), result, model_id, statement_type.get('type_name'))
+            except Exception as e:
+                # A failed cache write only costs a later re-analysis, so the run carries on
+                self.logger.error("Error caching the result of %s: %s", os.path.basename(document_path), e)
+        with metrics.stage("projection"):
+            projection = FieldIndex.project(result, statement_type, include_text=include_text, include_tables=include_tables)
+        del result
+
+        if rss is not None:
+            self.logger.info(
+                "Process memory with the result of %s held: RSS %s MB, peak RSS %s MB.",
+                os.path.basename(document_path),
+                format_megabytes(rss),
+                format_megabytes(peak_rss)
+            )
+        return projection
+
     def analyse_layout_document(self, client, document_path):
         """
         Analyzes a document using a pre-built layout model.
@@ -82,8 +140,10 @@ class DocAIUtils:
         )
         try:
             with open(document_path, "rb") as document:
-                poller = client.begin_analyze_document("prebuilt-layout", document=document)
-                result = poller.result()
+                with metrics.stage("analysis_submit"):
+                    poller = client.begin_analyze_document("prebuilt-layout", document=document)
+                with metrics.stage("analysis_poll"):
+                    result = poller.result()
             self.logger.info(
                 "Analyzed: %s.\n",
                 os.path.basename(document_path)
@@ -101,30 +161,20 @@ class DocAIUtils:
         """
         Extracts table data from the layout model results and structures them into rows.
 
+        Each table is built as a dense grid from its cells' row and column indexes (see TableMaterialiser),
+        so spanning cells fill every position they cover and missing cells are empty strings.
+
         Parameters:
         - results (AnalysisResult): The layout model results containing table data.
 
         Returns:
         - tables: A list of tuples, where each tuple contains the table index and the structured table data.
         """
-        tables = []
-
-        for table_idx, table in enumerate(results.tables):
-            table_data = []
-            current_row_index = -1
-            row = []
-            for cell in sorted(table.cells, key=lambda c: (c.row_index, c.column_index)):
-                if cell.row_index > current_row_index:
-                    if row:
-                        table_data.append(row)
-                    row = []
-                    current_row_index = cell.row_index
-                row.append(cell.content)
-            if row:
-                table_data.append(row)
-            tables.append((table_idx, table_data))
-
-        return tables
+        materialiser = TableMaterialiser()
+        return [
+            (table_idx, materialiser.to_grid(table)[0].tolist())
+            for table_idx, table in enumerate(results.tables or [])
+        ]
 
     def extract_all_text(self, results):
             """
@@ -133,11 +183,14 @@ class DocAIUtils:
             Extracts all text content from the analysis results.
 
             Args:
-                results (AnalysisResult): The analysis results containing text content.
+                results (AnalysisResult or FieldIndex): The analysis results containing text content,
+                    or a projection of them built with include_text=True.
 
             Returns:
                 str: A string containing all the text content from the document.
             """
+            if isinstance(results, FieldIndex):
+                return results.all_text()
             all_text = []
             for page in results.pages:
                 for line in page.lines:
@@ -0,0 +1,169 @@
+# src/field_index.py
+
+from table_utils import TableMaterialiser
+
+# List field holding the transactions, unless the statement type sets transaction_list_field
+DEFAULT_TRANSACTION_LIST_FIELD = 'Transactions'
+
+
+class FieldEntry:
+    """
+    A single occurrence of a labelled field in an AnalysisResult.
+    """
+    __slots__ = ('content', 'value', 'confidence')
+
+    def __init__(self, content, value, confidence):
+        self.content = content
+        self.value = value
+        self.confidence = confidence
+
+
+class FieldIndex:
+    """
+    A one-pass index over the documents of an AnalysisResult, mapping each field name to its
+    entries in document order.
+
+    The index is built once per result and shared by the CSVUtils extractors, so looking up a
+    label is a dictionary access rather than a walk over every document and field. It holds no
+    reference to the result and is never mutated after it is built, so indexes for different
+    results can be used from several threads at once.
+
+    Built with project(), the index is also a compact stand-in for the result: it keeps only the
+    fields a statement type references (and optionally the text of each page), so the full
+    AnalysisResult, with its words, spans and polygons, can be released straight away.
+    """
+    __slots__ = ('fields', 'pages', 'tables')
+
+    def __init__(self, fields=None, pages=None, tables=None):
+        self.fields = fields if fields is not None else {}
+        # Tuple of (page_number, lines) pairs, populated by project(include_text=True)
+        self.pages = pages if pages is not None else ()
+        # Tuple of MaterialisedTable objects, populated by project(include_tables=True)
+        self.tables = tables if tables is not None else ()
+
+    @classmethod
+    def from_result(cls, results):
+        """
+        Builds the index from an AnalysisResult.
+
+        Args:
+            results (AnalysisResult): The analysis results object.
+
+        Returns:
+            FieldIndex: The index of the result's fields.
+        """
+        fields = {}
+        for document in results.documents:
+            for name, field in document.fields.items():
+                entry = FieldEntry(field.content, field.value, field.confidence)
+                fields.setdefault(name, []).append(entry)
+        return cls(fields)
+
+    @classmethod
+    def project(cls, results, statement_type, include_text=False, include_tables=False):
+        """
+        Builds the index from an AnalysisResult, keeping only what the statement type references.
+
+        Static and summary fields are kept as entries. The transaction list field is kept with each
+        transaction reduced to its transaction_dynamic_fields, in the same shape as the service's
+        fields, so the CSVUtils extractors read a projection exactly as they read a result.
+
+        Args:
+            results (AnalysisResult): The analysis results object.
+            statement_type (dict): The statement type configuration.
+            include_text (bool): Whether to keep the text lines of each page, as used by raw_process.py.
+            include_tables (bool): Whether to keep the result's tables as dense grids (see TableMaterialiser).
+
+        Returns:
+            FieldIndex: The projected index of the result.
+        """
+        wanted = {
+            field['field_name']
+            for section in ('transaction_static_fields', 'summary_fields')
+            for field in statement_type.get(section) or []
+        }
+        list_field = statement_type.get('transaction_list_field') or DEFAULT_TRANSACTION_LIST_FIELD
+        dynamic_names = {field['field_name'] for field in statement_type.get('transaction_dynamic_fields') or []}
+
+        fields = {}
+        for document in results.documents or ():
+            for name, field in document.fields.items():
+                if name == list_field and dynamic_names:
+                    value = tuple(
+                        FieldEntry(
+                            None,
+                            {
+                                item_name: FieldEntry(item_field.content, item_field.value, item_field.confidence)
+                                for item_name, item_field in (item.value or {}).items()
+                                if item_name in dynamic_names
+                            },
+                            item.confidence
+                        )
+                        for item in field.value or ()
+                    )
+                    fields.setdefault(name, []).append(FieldEntry(None, value, field.confidence))
+                elif name in wanted:
+                    entry = FieldEntry(field.content, field.value, field.confidence)
+                    fields.setdefault(name, []).append(entry)
+
+        pages = ()
+        if include_text:
+            pages = tuple(
+                (page.page_number, tuple(line.content for line in page.lines or ()))
+                for page in results.pages or ()
+            )
+
+        tables = ()
+        if include_tables:
+            tables = tuple(TableMaterialiser().materialise(results))
+
+        return cls(fields, pages, tables)
+
+    @classmethod
+    def of(cls, results):
+        """
+        Returns the index for results, building it only if results is not already a FieldIndex.
+
+        Args:
+            results (AnalysisResult or FieldIndex): The analysis results object or its index.
+
+        Returns:
+            FieldIndex: The index of the result's fields.
+        """
+        if isinstance(results, cls):
+            return results
+        return cls.from_result(results)
+
+    def entries(self, name):
+        """
+        Returns every entry for a field name, in document order.
+
+        Args:
+            name (str): The field name.
+
+        Returns:
+            list: The FieldEntry objects for the field, or an empty tuple if it was not found.
+        """
+        return self.fields.get(name, ())
+
+    def first(self, name):
+        """
+        Returns the first entry for a field name.
+
+        Args:
+            name (str): The field name.
+
+        Returns:
+            FieldEntry: The first entry for the field, or None if it was not found.
+        """
+        entries = self.fields.get(name)
+        return entries[0] if entries else None
+
+    def all_text(self):
+        """
+        Returns the text of every projected page joined by newlines, as DocAIUtils.extract_all_text() does.
+
+        Returns:
+            str: The text content of the document.
+        """
+        return '\n'.join(line for _, lines in self.pages for line in lines)
@@ -0,0 +1,443 @@
+# src/job_queue.py
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from utils import Logger, lazy_import
+
+redis = lazy_import("redis")
+
+# Job states
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def _encode(value):
+    # Dates returned by the analysis service survive the round trip through JSON
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    return str(value)
+
+
+def _decode(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def dumps(value):
+    return json.dumps(value, default=_encode)
+
+
+def loads(text):
+    return None if text is None else json.loads(text, object_hook=_decode)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Job:
+    """
+    A leased unit of work.
+    """
+    __slots__ = ('id', 'kind', 'payload', 'attempts')
+
+    def __init__(self, job_id, kind, payload, attempts):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+
+class SQLiteJobQueue:
+    """
+    A job queue in a SQLite database, for several processes or nodes sharing one file.
+
+    Workers lease a pending job for lease_seconds and must heartbeat to keep it. A job whose lease
+    expires, e.g. because its worker died, returns to pending when any worker next leases. Every state
+    change runs in a BEGIN IMMEDIATE transaction, so two workers never lease the same job. The database
+    uses the rollback journal rather than WAL, as WAL needs shared memory that network file systems
+    do not provide; the file system must still support POSIX locks (e.g. NFSv4 or SMB, not NFSv3 without lockd).
+    """
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.local = threading.local()
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    job_key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    updated REAL NOT NULL,
+                    UNIQUE (kind, job_key)
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, kind, id)")
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, so the heartbeat thread gets its own
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=DELETE")
+            self.local.connection = connection
+        return connection
+
+    def _transaction(self):
+        queue = self
+
+        class Transaction:
+            def __enter__(self):
+                self.connection = queue._connection()
+                self.connection.execute("BEGIN IMMEDIATE")
+                return self.connection
+
+            def __exit__(self, exc_type, exc, traceback):
+                self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+                return False
+
+        return Transaction()
+
+    def enqueue(self, kind, payload, key=None):
+        """
+        Adds a job unless a job of the same kind and key already exists, so a coordinator can be rerun safely.
+
+        Args:
+            kind (str): The kind of job, e.g. 'split' or 'analyse'.
+            payload (dict): The job's parameters.
+            key (str): Identifies the job within its kind. Defaults to the payload itself.
+
+        Returns:
+            bool: True if the job was added.
+        """
+        key = key if key is not None else dumps(payload)
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO jobs (kind, job_key, payload, status, updated) VALUES (?, ?, ?, ?, ?)",
+                (kind, key, dumps(payload), PENDING, time.time())
+            )
+            return cursor.rowcount == 1
+
+    def lease(self, worker_id, kinds=None):
+        """
+        Leases the oldest pending job, first returning expired leases to pending.
+
+        Args:
+            worker_id (str): Identifies the worker holding the lease.
+            kinds (list): The kinds of job the worker accepts. Defaults to any.
+
+        Returns:
+            Job: The leased job, or None if no job is pending.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            self._requeue_expired(connection, now)
+            query = "SELECT id, kind, payload, attempts FROM jobs WHERE status = ?"
+            params = [PENDING]
+            if kinds:
+                query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+                params.extend(kinds)
+            row = connection.execute(query + " ORDER BY id LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            job_id, kind, payload, attempts = row
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (LEASED, worker_id, now + self.lease_seconds, now, job_id)
+            )
+        return Job(job_id, kind, loads(payload), attempts + 1)
+
+    def heartbeat(self, job, worker_id):
+        """
+        Extends the lease on a job.
+
+        Returns:
+            bool: False if the worker no longer holds the lease, in which case it should abandon the job.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND status = ? AND worker = ?",
+                (now + self.lease_seconds, now, job.id, LEASED, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job, worker_id, result=None):
+        """
+        Marks a leased job as done and stores its result.
+
+        Returns:
+            bool: False if the lease had expired and the job was given to another worker.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_expires = NULL, updated = ? WHERE id = ? AND status = ? AND worker = ?",
+                (DONE, dumps(result), time.time(), job.id, LEASED, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job, worker_id, error):
+        """
+        Returns a leased job to pending, or marks it failed once it has used max_attempts.
+        """
+        status = FAILED if job.attempts >= self.max_attempts else PENDING
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker = NULL, lease_expires = NULL, updated = ? WHERE id = ? AND status = ? AND worker = ?",
+                (status, str(error), time.time(), job.id, LEASED, worker_id)
+            )
+        return status
+
+    def requeue_expired(self):
+        """
+        Returns every job whose lease has expired to pending, or marks it failed once it has used max_attempts.
+
+        Returns:
+            int: The number of expired leases released.
+        """
+        with self._transaction() as connection:
+            return self._requeue_expired(connection, time.time())
+
+    def _requeue_expired(self, connection, now):
+        # A job that keeps outliving its lease (e.g. it crashes its worker) is failed after max_attempts
+        cursor = connection.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, lease_expires = NULL, "
+            "error = 'Lease expired', updated = ? WHERE status = ? AND lease_expires < ?",
+            (self.max_attempts, FAILED, PENDING, now, LEASED, now)
+        )
+        if cursor.rowcount:
+            self.logger.warning("Requeued %s jobs whose leases expired (failed once they reach max_attempts).", cursor.rowcount)
+        return cursor.rowcount
+
+    def counts(self):
+        """
+        Returns the number of jobs by kind and status, e.g. {'analyse': {'done': 10, 'pending': 2}}.
+        """
+        counts = {}
+        for kind, status, count in self._connection().execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status"):
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def results(self, kind):
+        """
+        Yields the payload and result of every done job of a kind, in the order they were enqueued.
+        """
+        rows = self._connection().execute(
+            "SELECT payload, result FROM jobs WHERE kind = ? AND status = ? ORDER BY id", (kind, DONE)
+        )
+        for payload, result in rows:
+            yield loads(payload), loads(result)
+
+    def failures(self, kind=None):
+        """
+        Yields the kind, payload and error of every failed job.
+        """
+        query = "SELECT kind, payload, error FROM jobs WHERE status = ?"
+        params = [FAILED]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        for job_kind, payload, error in self._connection().execute(query + " ORDER BY id", params):
+            yield job_kind, loads(payload), error
+
+
+class RedisJobQueue:
+    """
+    The same job queue in Redis, or any server speaking its protocol (e.g. Valkey, KeyDB), for when
+    there is no shared file system. Requires the optional redis package.
+
+    Each job is a hash; pending job IDs are kept in one list per kind and leases in a sorted set scored
+    by expiry. Leasing, requeueing and completion run as Lua scripts so they are atomic on the server.
+    """
+    _LEASE_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now)
+    for _, id in ipairs(expired) do
+        redis.call('ZREM', KEYS[1], id)
+        local job = KEYS[2] .. id
+        redis.call('HDEL', job, 'worker')
+        if tonumber(redis.call('HGET', job, 'attempts')) >= tonumber(ARGV[4]) then
+            redis.call('HSET', job, 'status', 'failed', 'error', 'Lease expired')
+        else
+            redis.call('HSET', job, 'status', 'pending', 'error', 'Lease expired')
+            redis.call('LPUSH', KEYS[3] .. redis.call('HGET', job, 'kind'), id)
+        end
+    end
+    for i = 5, #ARGV do
+        local id = redis.call('RPOP', KEYS[3] .. ARGV[i])
+        if id then
+            local job = KEYS[2] .. id
+            redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), id)
+            redis.call('HSET', job, 'status', 'leased', 'worker', ARGV[3])
+            redis.call('HINCRBY', job, 'attempts', 1)
+            return {id, #expired}
+        end
+    end
+    return {false, #expired}
+    """
+
+    _OWNED_SCRIPT = """
+    local job = KEYS[2] .. ARGV[1]
+    if redis.call('HGET', job, 'status') ~= 'leased' or redis.call('HGET', job, 'worker') ~= ARGV[2] then
+        return 0
+    end
+    if ARGV[3] == 'heartbeat' then
+        redis.call('ZADD', KEYS[1], tonumber(ARGV[4]), ARGV[1])
+    else
+        redis.call('ZREM', KEYS[1], ARGV[1])
+        redis.call('HDEL', job, 'worker')
+        redis.call('HSET', job, 'status', ARGV[3], ARGV[5], ARGV[4])
+        if ARGV[3] == 'pending' then
+            redis.call('LPUSH', KEYS[3] .. redis.call('HGET', job, 'kind'), ARGV[1])
+        end
+    end
+    return 1
+    """
+
+    def __init__(self, url, name="pdf-processor", lease_seconds=300, max_attempts=3):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.leases_key = f"{name}:leases"
+        self.job_prefix = f"{name}:job:"
+        self.pending_prefix = f"{name}:pending:"
+        self.lease_script = self.client.register_script(self._LEASE_SCRIPT)
+        self.owned_script = self.client.register_script(self._OWNED_SCRIPT)
+
+    def _keys(self):
+        return [self.leases_key, self.job_prefix, self.pending_prefix]
+
+    def enqueue(self, kind, payload, key=None):
+        key = key if key is not None else dumps(payload)
+        if not self.client.hsetnx(f"{self.name}:keys:{kind}", key, 1):
+            return False
+        job_id = self.client.incr(f"{self.name}:next_id")
+        pipe = self.client.pipeline()
+        pipe.hset(f"{self.job_prefix}{job_id}", mapping={"kind": kind, "payload": dumps(payload), "status": PENDING, "attempts": 0})
+        pipe.sadd(f"{self.name}:kinds", kind)
+        pipe.lpush(f"{self.pending_prefix}{kind}", job_id)
+        pipe.execute()
+        return True
+
+    def lease(self, worker_id, kinds=None):
+        kinds = kinds or sorted(self.client.smembers(f"{self.name}:kinds"))
+        job_id, requeued = self.lease_script(keys=self._keys(), args=[time.time(), self.lease_seconds, worker_id, self.max_attempts, *kinds])
+        if requeued:
+            self.logger.warning("Requeued %s jobs whose leases expired (failed once they reach max_attempts).", requeued)
+        if not job_id:
+            return None
+        job = self.client.hgetall(f"{self.job_prefix}{job_id}")
+        return Job(int(job_id), job["kind"], loads(job["payload"]), int(job["attempts"]))
+
+    def heartbeat(self, job, worker_id):
+        return bool(self.owned_script(keys=self._keys(), args=[job.id, worker_id, "heartbeat", time.time() + self.lease_seconds]))
+
+    def complete(self, job, worker_id, result=None):
+        return bool(self.owned_script(keys=self._keys(), args=[job.id, worker_id, DONE, dumps(result), "result"]))
+
+    def fail(self, job, worker_id, error):
+        status = FAILED if job.attempts >= self.max_attempts else PENDING
+        self.owned_script(keys=self._keys(), args=[job.id, worker_id, status, str(error), "error"])
+        return status
+
+    def requeue_expired(self):
+        # Leasing a kind that has no jobs requeues expired leases without taking a job
+        _, requeued = self.lease_script(keys=self._keys(), args=[time.time(), self.lease_seconds, "", self.max_attempts, ""])
+        return requeued
+
+    def _jobs(self):
+        for job_id in range(1, int(self.client.get(f"{self.name}:next_id") or 0) + 1):
+            job = self.client.hgetall(f"{self.job_prefix}{job_id}")
+            if job:
+                yield job
+
+    def counts(self):
+        counts = {}
+        for job in self._jobs():
+            kind_counts = counts.setdefault(job["kind"], {})
+            kind_counts[job["status"]] = kind_counts.get(job["status"], 0) + 1
+        return counts
+
+    def results(self, kind):
+        for job in self._jobs():
+            if job["kind"] == kind and job["status"] == DONE:
+                yield loads(job["payload"]), loads(job.get("result"))
+
+    def failures(self, kind=None):
+        for job in self._jobs():
+            if job["status"] == FAILED and (kind is None or job["kind"] == kind):
+                yield job["kind"], loads(job["payload"]), job.get("error")
+
+
+def open_job_queue(url, lease_seconds=300, max_attempts=3):
+    """
+    Opens a job queue: redis:// and rediss:// URLs use RedisJobQueue, anything else is a SQLite database path.
+
+    Args:
+        url (str): The queue location, e.g. '/mnt/shared/run-1/jobs.sqlite' or 'redis://queue-host:6379/0'.
+        lease_seconds (int): How long a worker holds a job without a heartbeat.
+        max_attempts (int): How many times a job is tried before it is marked failed.
+    """
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    return SQLiteJobQueue(url, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+
+class Heartbeat:
+    """
+    Keeps a job's lease alive from a background thread while the job runs.
+
+    Use as a context manager around the work. lost is set if the lease could not be renewed.
+    """
+    def __init__(self, job_queue, job, worker_id, interval=None):
+        self.job_queue = job_queue
+        self.job = job
+        self.worker_id = worker_id
+        self.interval = interval or max(1.0, job_queue.lease_seconds / 3)
+        self.stopped = threading.Event()
+        self.lost = False
+        self.thread = threading.Thread(target=self._run, name=f"heartbeat-{job.id}", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                if not self.job_queue.heartbeat(self.job, self.worker_id):
+                    self.lost = True
+                    return
+            except Exception:
+                # A failed heartbeat is retried at the next interval; the lease only lapses if they all fail
+                continue
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        return False
@@ -0,0 +1,264 @@
+# src/metrics.py
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# Upper bounds, in seconds, of the histogram buckets shared by every stage
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Prefix of every metric name in the Prometheus textfile
+PROMETHEUS_PREFIX = "pdf_processor"
+
+
+class _NullStage:
+    """
+    The context manager handed out while metrics are disabled. It is shared and does nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Histogram:
+    """
+    A cumulative latency histogram over BUCKETS, with the count, sum, min and max of the observations.
+    """
+    __slots__ = ('counts', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.minimum = seconds if self.minimum is None else min(self.minimum, seconds)
+        self.maximum = seconds if self.maximum is None else max(self.maximum, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        """
+        Returns (upper bound, observations at or below it) pairs, ending with +Inf.
+        """
+        running = 0
+        pairs = []
+        for bound, count in zip(BUCKETS, self.counts):
+            running += count
+            pairs.append((bound, running))
+        pairs.append((float("inf"), self.count))
+        return pairs
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "min": None if self.minimum is None else round(self.minimum, 6),
+            "max": None if self.maximum is None else round(self.maximum, 6),
+            "mean": round(self.total / self.count, 6) if self.count else None,
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count for bound, count in self.cumulative()},
+        }
+
+
+class Metrics:
+    """
+    Collects per-stage and per-document timings for a run.
+
+    Metrics are disabled by default. While disabled, stage() returns a shared no-op context manager and
+    timed() functions make one attribute check per call, so the instrumentation can stay in place in
+    production code. Once enabled with enable(), each stage is timed with time.perf_counter() and recorded
+    in a histogram, and attributed to the document opened with document() on the same thread.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all recorded timings.
+        """
+        with self.lock:
+            self.stages = {}
+            self.documents = {}
+            self.started = datetime.now()
+            self.start_time = time.perf_counter()
+
+    def enable(self):
+        """
+        Turns timing on and starts a new run.
+        """
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def stage(self, name):
+        """
+        Returns a context manager timing a stage.
+
+        Args:
+            name (str): The stage name, e.g. 'ocr' or 'analysis_poll'.
+
+        Returns:
+            A context manager. It does nothing while metrics are disabled.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed_stage(name)
+
+    @contextmanager
+    def _timed_stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """
+        Decorator timing every call of a function as a stage.
+
+        Args:
+            name (str): The stage name.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timed_stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def document(self, name):
+        """
+        Returns a context manager timing one document as the 'document' stage. Stages timed on the same
+        thread while it is open are also attributed to the document.
+
+        Args:
+            name (str): The document name, e.g. the PDF file name.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed_document(name)
+
+    @contextmanager
+    def _timed_document(self, name):
+        previous = getattr(self.local, "document", None)
+        self.local.document = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.local.document = previous
+            self.observe("document", time.perf_counter() - start, document=name)
+
+    def observe(self, name, seconds, document=None):
+        """
+        Records one timing for a stage.
+
+        Args:
+            name (str): The stage name.
+            seconds (float): The time taken.
+            document (str): The document to attribute the time to. Defaults to the document open on this thread.
+        """
+        if not self.enabled:
+            return
+        document = document or getattr(self.local, "document", None)
+        with self.lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram()
+            histogram.observe(seconds)
+            if document is not None:
+                stages = self.documents.setdefault(document, {})
+                stages[name] = stages.get(name, 0.0) + seconds
+
+    def to_dict(self):
+        """
+        Returns the recorded timings as a JSON-serialisable dictionary.
+        """
+        with self.lock:
+            return {
+                "started": self.started.isoformat(timespec="seconds"),
+                "seconds": round(time.perf_counter() - self.start_time, 6),
+                "stages": {name: histogram.to_dict() for name, histogram in sorted(self.stages.items())},
+                "documents": {
+                    document: {stage: round(seconds, 6) for stage, seconds in sorted(stages.items())}
+                    for document, stages in self.documents.items()
+                },
+            }
+
+    def to_prometheus(self):
+        """
+        Returns the recorded timings in the Prometheus text exposition format, for the node_exporter
+        textfile collector. Documents are reported by their total time only, to keep the label cardinality low.
+        """
+        name = f"{PROMETHEUS_PREFIX}_stage_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each pipeline stage.",
+            f"# TYPE {name} histogram",
+        ]
+        with self.lock:
+            for stage, histogram in sorted(self.stages.items()):
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+            document_name = f"{PROMETHEUS_PREFIX}_document_seconds"
+            lines.append(f"# HELP {document_name} Total time spent on each document.")
+            lines.append(f"# TYPE {document_name} gauge")
+            for document, stages in self.documents.items():
+                label = document.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{document_name}{{document="{label}"}} {stages.get("document", 0.0):.6f}')
+
+            run_name = f"{PROMETHEUS_PREFIX}_run_seconds"
+            lines.append(f"# HELP {run_name} Wall-clock time of the run.")
+            lines.append(f"# TYPE {run_name} gauge")
+            lines.append(f"{run_name} {time.perf_counter() - self.start_time:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes the recorded timings to a file: the Prometheus textfile format if the path ends in .prom,
+        otherwise JSON. The file is written to a temporary name and renamed, so a collector never reads
+        a partial file.
+
+        Args:
+            path (str): The output file path.
+        """
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_dict(), indent=2)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+
+
+# Shared by every module, and enabled by the entry points with --metrics
+metrics = Metrics()
@@ -0,0 +1,282 @@
+# mock_doc_ai_server.py
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+import yaml
+from synthetic_results import API_VERSION, SyntheticResultBuilder
+from utils import Logger
+
+# POST {endpoint}/formrecognizer/documentModels/{modelId}:analyze
+ANALYZE_PATH = re.compile(r"^/formrecognizer/documentModels/(?P<model_id>[^/:]+):analyze$")
+# GET {endpoint}/formrecognizer/documentModels/{modelId}/analyzeResults/{resultId}
+RESULT_PATH = re.compile(r"^/formrecognizer/documentModels/(?P<model_id>[^/]+)/analyzeResults/(?P<result_id>[^/]+)$")
+
+
+class MockAnalysisService:
+    """
+    A local stand-in for the Document Intelligence analysis service.
+
+    It implements the two calls made by DocumentAnalysisClient.begin_analyze_document: the analyze
+    request, which returns 202 with an Operation-Location header, and the result poll. Results are
+    replayed from recorded fixtures or synthesised from type_models.yaml, and latency, throttling
+    (429) and failed operations can be injected.
+    """
+    def __init__(self, config_path, fixtures_dir=None, type_name=None, transactions=50,
+                 latency=0.0, jitter=0.0, throttle_rate=0.0, failure_rate=0.0, seed=None, echo_text=False):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.transactions = transactions
+        self.echo_text = echo_text
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.counts = {"submitted": 0, "throttled": 0, "failed": 0, "succeeded": 0}
+
+        with open(config_path, "r") as file:
+            self.statement_types = yaml.safe_load(file)["statement_types"]
+        self.forced_type = self._find_type(type_name) if type_name else None
+
+        self.fixtures = []
+        if fixtures_dir:
+            self.fixtures = sorted(Path(fixtures_dir).glob("*.json"))
+            self.logger.info("Replaying %s recorded results from %s.", len(self.fixtures), fixtures_dir)
+
+    def _find_type(self, type_name):
+        for statement_type in self.statement_types:
+            if statement_type["type_name"] == type_name:
+                return statement_type
+        raise ValueError(f"Statement type '{type_name}' not found in configuration.")
+
+    def statement_type_for_model(self, model_id):
+        """
+        Resolves the statement type for a model ID through the env_var of each type, so the
+        server synthesises the same fields the model would return.
+        """
+        if self.forced_type:
+            return self.forced_type
+        for statement_type in self.statement_types:
+            if os.getenv(statement_type.get("env_var") or "") == model_id:
+                return statement_type
+        # Unknown models (e.g. prebuilt-read) get plain text lines only
+        return {"type_name": model_id, "summary_fields": [], "transaction_static_fields": [], "transaction_dynamic_fields": []}
+
+    def submit(self, model_id, document_bytes):
+        """
+        Registers an analyze operation.
+
+        Returns:
+            tuple: The result ID, or None if the request was throttled.
+        """
+        with self.lock:
+            self.counts["submitted"] += 1
+            if self.random.random() < self.throttle_rate:
+                self.counts["throttled"] += 1
+                return None
+
+            result_id = str(uuid.uuid4())
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            self.operations[result_id] = {
+                "model_id": model_id,
+                "created": datetime.now(timezone.utc),
+                "ready_at": time.monotonic() + delay,
+                "fail": self.random.random() < self.failure_rate,
+                "pages": self._count_pages(document_bytes),
+                "page_lines": self._read_page_lines(document_bytes) if self.echo_text else None,
+                "seq": self.counts["submitted"],
+            }
+            return result_id
+
+    def poll(self, result_id):
+        """
+        Returns the operation status payload, building the result when the operation completes.
+
+        Returns:
+            dict: The operation payload, or None if the result ID is unknown.
+        """
+        with self.lock:
+            operation = self.operations.get(result_id)
+        if operation is None:
+            return None
+
+        payload = {
+            "createdDateTime": operation["created"].isoformat(),
+            "lastUpdatedDateTime": datetime.now(timezone.utc).isoformat(),
+        }
+        if time.monotonic() < operation["ready_at"]:
+            payload["status"] = "running"
+            return payload
+
+        with self.lock:
+            self.operations.pop(result_id, None)
+            self.counts["failed" if operation["fail"] else "succeeded"] += 1
+
+        if operation["fail"]:
+            payload["status"] = "failed"
+            payload["error"] = {"code": "InternalServerError", "message": "Injected failure from the mock analysis service."}
+        else:
+            payload["status"] = "succeeded"
+            payload["analyzeResult"] = self._build_result(operation)
+        return payload
+
+    def _build_result(self, operation):
+        if self.fixtures:
+            fixture_path = self.fixtures[(operation["seq"] - 1) % len(self.fixtures)]
+            with open(fixture_path, "r") as fixture:
+                recorded = json.load(fixture)
+            # Fixtures may hold the whole operation response or just the analyzeResult
+            result = recorded.get("analyzeResult", recorded)
+            result["modelId"] = operation["model_id"]
+            return result
+
+        statement_type = self.statement_type_for_model(operation["model_id"])
+        seed = None if self.seed is None else self.seed + operation["seq"]
+        builder = SyntheticResultBuilder(statement_type, operation["model_id"], seed=seed)
+        return builder.build(transactions=self.transactions, pages=operation["pages"], page_lines=operation["page_lines"])
+
+    def _read_page_lines(self, document_bytes):
+        """
+        Returns the text layer lines of each page of the submitted PDF, or None if it cannot be read.
+        """
+        try:
+            import fitz  # PyMuPDF
+            with fitz.open(stream=document_bytes, filetype="pdf") as doc:
+                return [[line for line in page.get_text().splitlines() if line.strip()] for page in doc]
+        except Exception:
+            return None
+
+    def _count_pages(self, document_bytes):
+        try:
+            import fitz  # PyMuPDF
+            with fitz.open(stream=document_bytes, filetype="pdf") as doc:
+                return len(doc)
+        except Exception:
+            return 1
+
+
+class MockAnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes the analyze and poll requests to the MockAnalysisService held by the server.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        match = ANALYZE_PATH.match(url.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if not match:
+            return self._send_json(404, {"error": {"code": "NotFound", "message": f"Unknown path {url.path}"}})
+
+        model_id = match.group("model_id")
+        result_id = service.submit(model_id, body)
+        if result_id is None:
+            return self._send_json(
+                429,
+                {"error": {"code": "429", "message": "Requests to the Analyze Document API have exceeded the rate limit."}},
+                {"Retry-After": "1"}
+            )
+
+        host = self.headers.get("Host")
+        operation_location = (
+            f"http://{host}/formrecognizer/documentModels/{model_id}/analyzeResults/{result_id}?api-version={API_VERSION}"
+        )
+        self._send_json(202, None, {"Operation-Location": operation_location, "apim-request-id": result_id})
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        match = RESULT_PATH.match(url.path)
+        payload = service.poll(match.group("result_id")) if match else None
+        if payload is None:
+            return self._send_json(404, {"error": {"code": "NotFound", "message": f"Unknown path {url.path}"}})
+        headers = {"Retry-After": "0"} if payload["status"] == "running" else {}
+        self._send_json(200, payload, headers)
+
+    def _send_json(self, status, payload, headers=None):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.service.logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description='''
+        Mock Document Intelligence Server
+
+        This script runs a local stand-in for the analysis service so process.py and raw_process.py can be
+        load tested offline. Point MODEL_ENDPOINT at the server (any MODEL_API_KEY is accepted).
+        Results are replayed from --fixtures (recorded analyzeResult JSON files) or synthesised for the statement
+        type whose env_var holds the requested model ID.''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python src/mock_doc_ai_server.py --port 5050 --transactions 200 --latency 2 --throttle-rate 0.1'''
+    )
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on.')
+    parser.add_argument('--port', type=int, default=5050, help='Port to listen on.')
+    parser.add_argument('-c', '--config_type', type=str, default='config/type_models.yaml', help='Path to the statement types configuration YAML file.')
+    parser.add_argument('--fixtures', type=str, help='Folder of recorded analyzeResult JSON files to replay in turn.')
+    parser.add_argument('-t', '--type', type=str, help='Synthesise this statement type for every model ID.')
+    parser.add_argument('--transactions', type=int, default=50, help='Transactions per synthesised document.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds each analysis stays running.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds added to the latency.')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of analyze requests answered with 429.')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of analyses that end with status "failed".')
+    parser.add_argument('--seed', type=int, help='Seed for reproducible results and fault injection.')
+    parser.add_argument('--echo-text', action='store_true', help='Return the text layer of the submitted PDF as the page lines of models without fields (read and layout), instead of synthetic lines.')
+    args = parser.parse_args()
+
+    logger = Logger.get_logger("MockServer", log_to_file=True)
+
+    service = MockAnalysisService(
+        args.config_type,
+        fixtures_dir=args.fixtures,
+        type_name=args.type,
+        transactions=args.transactions,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+        echo_text=args.echo_text,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), MockAnalysisRequestHandler)
+    server.service = service
+
+    logger.info("Mock analysis service listening on http://%s:%s/", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Mock analysis service stopped. Requests: %s", service.counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# src/normalise_utils.py
+
+from datetime import date, datetime
+from utils import Logger, lazy_import
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+
+# Same pattern as csv_utils.AMOUNT_PATTERN, with a named group as required by pyarrow's extract_regex
+AMOUNT_REGEX = r'(?P<amount>[-+]?[\d,]*\.?\d+)'
+
+
+class ColumnNormaliser:
+    """
+    Converts whole columns of raw extracted values to typed columns in one pass.
+
+    Each method returns the typed column together with a boolean success mask. A row is
+    successful if it was converted, or if it was blank and so had nothing to convert.
+    """
+    def __init__(self):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        # Columns already reported as having no year to infer, so the warning is logged once per column
+        self.unresolved_year_columns = set()
+
+    def normalise_amounts(self, column):
+        """
+        Converts a column of raw amounts (e.g. "$1,234.56", "12.00 CR", "45.10-") to floats.
+
+        The first numeric run is extracted, thousands separators are removed, and the value is
+        made negative if a '-' appears anywhere in the raw text.
+
+        Args:
+            column (pd.Series): The raw amount values.
+
+        Returns:
+            tuple: The float column (NaN where conversion failed) and the success mask.
+        """
+        text = pa.array(column.astype('string'), type=pa.string())
+        present = pc.fill_null(pc.not_equal(pc.utf8_trim_whitespace(text), ''), False)
+
+        matched = pc.struct_field(pc.extract_regex(text, AMOUNT_REGEX), [0])
+        magnitude = pc.abs(pc.cast(pc.replace_substring(matched, ',', ''), pa.float64()))
+        negative = pc.fill_null(pc.match_substring(text, '-'), False)
+        values = pc.if_else(negative, pc.negate(magnitude), magnitude)
+
+        success = pc.or_(pc.invert(present), pc.is_valid(values))
+        return (
+            pd.Series(values.to_numpy(zero_copy_only=False), index=column.index, name=column.name),
+            pd.Series(success.to_numpy(zero_copy_only=False), index=column.index, name=column.name),
+        )
+
+    def normalise_dates(self, column, date_format=None, reference_dates=None):
+        """
+        Converts a column of raw dates to datetimes using the configured date_format.
+
+        Formats without a year (e.g. "%d %b") take the year from reference_dates, normally the
+        statement's closing date. Dates that would then fall after the reference date belong to the
+        previous year, e.g. "28 Dec" on a statement dated 05 Jan 2023 becomes 28 Dec 2022. Dates that
+        do not exist in the reference year, such as "29 Feb", are tried in the previous year instead.
+
+        Args:
+            column (pd.Series): The raw date values.
+            date_format (str): The strptime format from the YAML, or None to let pandas infer it.
+            reference_dates (pd.Series): Datetimes aligned with column, used for formats without a year.
+
+        Returns:
+            tuple: The datetime column and the success mask. If the format has no year and no
+                reference dates are given, the raw column is returned unchanged and counted as
+                successful, as nothing failed to convert.
+        """
+        if pd.api.types.is_datetime64_any_dtype(column):
+            return column, pd.Series(True, index=column.index, name=column.name)
+
+        text = column.astype('string').str.strip()
+        present = text.notna() & (text != '')
+
+        # Values the service already returned as dates do not need parsing
+        typed = column.map(lambda value: isinstance(value, (date, datetime))) if column.dtype == object else None
+
+        has_year = date_format is None or '%Y' in date_format or '%y' in date_format
+        if has_year:
+            values = pd.to_datetime(text, format=date_format, errors='coerce', dayfirst=True)
+        elif reference_dates is not None:
+            years = reference_dates.dt.year.astype('Int64')
+            values = pd.to_datetime(text + ' ' + years.astype('string'), format=f"{date_format} %Y", errors='coerce')
+            later = values > reference_dates
+            values = values.where(~later, values - pd.DateOffset(years=1))
+            # "29 Feb" only exists in a leap year, which may be the one before the reference year
+            retry = present & values.isna() & years.notna()
+            if retry.any():
+                earlier = pd.to_datetime(
+                    text[retry] + ' ' + (years[retry] - 1).astype('string'), format=f"{date_format} %Y", errors='coerce'
+                )
+                values = values.where(~retry, earlier)
+        else:
+            if column.name not in self.unresolved_year_columns:
+                self.unresolved_year_columns.add(column.name)
+                self.logger.warning(
+                    "No reference date to infer the year for %s with format %s. Leaving raw values.",
+                    column.name,
+                    date_format
+                )
+            return column, pd.Series(True, index=column.index, name=column.name)
+
+        if typed is not None and typed.any():
+            values = values.where(~typed, pd.to_datetime(column.where(typed), errors='coerce'))
+
+        success = ~present | values.notna()
+        return values, success
+
+    def normalise_frame(self, df, amount_columns, date_columns, reference_field=None):
+        """
+        Normalises every configured amount and date column of a DataFrame.
+
+        Args:
+            df (pd.DataFrame): The extracted data.
+            amount_columns (set): The columns flagged is_amount.
+            date_columns (dict): The columns flagged is_date, mapped to their date_format.
+            reference_field (str): The column holding each row's statement date, used to infer
+                the year for formats without one.
+
+        Returns:
+            tuple: The normalised DataFrame and a dictionary of success masks keyed by column name.
+        """
+        masks = {}
+
+        # The reference dates must be typed before they can be used for year inference
+        ordered_dates = sorted(date_columns.items(), key=lambda item: item[0] != reference_field)
+        reference_dates = None
+        for col, date_format in ordered_dates:
+            if col not in df.columns:
+                continue
+            df[col], masks[col] = self.normalise_dates(
+                df[col],
+                date_format,
+                reference_dates if col != reference_field else None
+            )
+            if col == reference_field and pd.api.types.is_datetime64_any_dtype(df[col]):
+                reference_dates = df[col]
+
+        for col in amount_columns:
+            if col in df.columns:
+                df[col], masks[col] = self.normalise_amounts(df[col])
+
+        failed = {col: int((~mask).sum()) for col, mask in masks.items() if not mask.all()}
+        if failed:
+            self.logger.warning(
+                "Values that could not be converted: %s",
+                failed
+            )
+
+        return df, masks
@@ -3,15 +3,20 @@
 import re
 from pathlib import Path
 import shutil
-import fitz  # PyMuPDF
 import os
-import pytesseract
-from PIL import Image
 import io
+import threading
 import yaml
-from utils import Logger
+import csv
+from metrics import metrics
+from type_resolver import SPLIT_MANIFEST_COLUMNS, SPLIT_MANIFEST_FILENAME
+from utils import Logger, lazy_import
 import unicodedata
 
+fitz = lazy_import("fitz")  # PyMuPDF
+pytesseract = lazy_import("pytesseract")
+Image = lazy_import("PIL.Image")
+
 class PDFProcessor:
     def __init__(self):
         with open("config/type_models.yaml", "r") as file:
@@ -25,8 +30,13 @@ class PDFProcessor:
         
         # Set up logger
         self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        # Serialises manifest writes when PDFs are split in parallel
+        self.manifest_lock = threading.Lock()
+        # PyMuPDF is not thread safe, so when PDFs are split in parallel every call into it holds this lock
+        # and only Tesseract, which runs outside it, works on several pages at once
+        self.fitz_lock = threading.RLock()
         
-    def process_all_pdfs(self, input_folder, output_folder, manual_processing_folder, type_name):
+    def process_all_pdfs(self, input_folder, output_folder, manual_processing_folder, type_name, governor=None):
         """
         Processes all PDF files in a given folder, splitting them into separate documents based on identified patterns.
         Identified paterns are defined in the YAML configuration file, which is loaded with the argument `type_name`.
@@ -36,42 +46,87 @@ class PDFProcessor:
             output_folder (str): The folder where the split PDFs will be saved.
             manual_processing_folder (str): The folder where the PDF files without a known pattern will be moved.
             type_name (str): The type of document to process.
+            governor (ResourceGovernor): Splits several PDFs at once, as many as the governor allows.
+                Defaults to one at a time.
         """
         self.logger.info(
             "Splitting files in %s and saving individual documents to %s...", 
             input_folder, 
             output_folder
         )
-        for pdf_file in Path(input_folder).glob("*.pdf"):
-            pdf_path = str(pdf_file)
-            is_machine_readable = self.is_pdf_machine_readable(pdf_path)
+        pdf_files = list(Path(input_folder).glob("*.pdf"))
+        if governor is None:
+            for pdf_file in pdf_files:
+                self.split_one_pdf(pdf_file, output_folder, manual_processing_folder, type_name)
+        else:
+            split = lambda pdf_file: self.split_one_pdf(pdf_file, output_folder, manual_processing_folder, type_name)
+            for pdf_file, future in governor.map(split, pdf_files):
+                if future.exception() is not None:
+                    self.logger.error("Error splitting %s: %s", pdf_file.name, future.exception())
+            governor.log_summary()
 
-            if is_machine_readable:
-                doc_starts = self.get_doc_starts_by_type(pdf_path, type_name)
-            else:
-                self.logger.info(
-                    "%s is scanned. Performing OCR to extract text.", 
-                    os.path.basename(pdf_file)
-                )
-                doc_starts = self.get_doc_starts_by_type(pdf_path, type_name, use_ocr=True)
+        self.logger.info("Splitting complete.")
+
+    def split_one_pdf(self, pdf_file, output_folder, manual_processing_folder, type_name):
+        """
+        Splits one PDF into the output folder, or copies it to the manual processing folder if no statements are found.
+
+        Args:
+            pdf_file (Path): The PDF to split.
+            output_folder (str): The folder where the split PDFs will be saved.
+            manual_processing_folder (str): The folder where the PDF files without a known pattern will be moved.
+            type_name (str): The type of document to process.
+        """
+        with metrics.document(pdf_file.name):
+            pdf_path = str(pdf_file)
+            doc_starts = self.detect_doc_starts(pdf_path, type_name)
 
             if doc_starts:
-                self.split_pdf(pdf_path, output_folder, doc_starts)
+                self.split_pdf(pdf_path, output_folder, doc_starts, type_name=type_name)
                 self.logger.info(
                     "%s has been processed and split accordingly.", 
                     os.path.basename(pdf_file)
                 )
             else:
-                self.logger.warning(
-                    "Could not identify document pattern for %s, moving to manual processing folder.", 
-                    os.path.basename(pdf_file)
-                )
-                shutil.copy(pdf_path, manual_processing_folder)
-                manifest_path = os.path.join(manual_processing_folder, "manifest-of-unsplit-files.txt")
-                with open(manifest_path, "a") as manifest_file:
-                    manifest_file.write(f"{pdf_file.stem}\n")
+                self.copy_to_manual_processing(pdf_path, manual_processing_folder)
 
-        self.logger.info("Splitting complete.")
+    def detect_doc_starts(self, pdf_path, type_name):
+        """
+        Finds the statements in a PDF, using OCR if the PDF is scanned.
+
+        Args:
+            pdf_path (str): The file path of the PDF.
+            type_name (str): The type of document to process.
+
+        Returns:
+            list or dict: The statement starts (see find_statement_starts()), or None if the type is unknown.
+        """
+        if self.is_pdf_machine_readable(pdf_path):
+            return self.get_doc_starts_by_type(pdf_path, type_name)
+
+        self.logger.info(
+            "%s is scanned. Performing OCR to extract text.", 
+            os.path.basename(pdf_path)
+        )
+        return self.get_doc_starts_by_type(pdf_path, type_name, use_ocr=True)
+
+    def copy_to_manual_processing(self, pdf_path, manual_processing_folder):
+        """
+        Copies a PDF whose statements could not be identified to the manual processing folder and records it
+        in the folder's manifest.
+
+        Args:
+            pdf_path (str): The file path of the PDF.
+            manual_processing_folder (str): The folder for PDFs that need to be split by hand.
+        """
+        self.logger.warning(
+            "Could not identify document pattern for %s, moving to manual processing folder.", 
+            os.path.basename(pdf_path)
+        )
+        shutil.copy(pdf_path, manual_processing_folder)
+        manifest_path = os.path.join(manual_processing_folder, "manifest-of-unsplit-files.txt")
+        with self.manifest_lock, open(manifest_path, "a") as manifest_file:
+            manifest_file.write(f"{Path(pdf_path).stem}\n")
 
     def get_config_for_type(self, statement_type):
         """
@@ -105,31 +160,64 @@ class PDFProcessor:
     
     def _extract_footer_text(self, page, prefer_ocr: bool = False) -> str:
         # Bottom strip (8–10% of page height)
-        rect = page.rect
-        footer_h = max(80, int((rect.y1 - rect.y0) * 0.10))
-        clip = fitz.Rect(rect.x0, rect.y1 - footer_h, rect.x1, rect.y1)
+        with self.fitz_lock:
+            rect = page.rect
+            footer_h = max(80, int((rect.y1 - rect.y0) * 0.10))
+            clip = fitz.Rect(rect.x0, rect.y1 - footer_h, rect.x1, rect.y1)
+        return self._extract_clip_text(page, clip, prefer_ocr)
+
+    def _extract_header_text(self, page, prefer_ocr: bool = False) -> str:
+        # Top strip (15% of page height), where the issuer's name and logo are printed
+        with self.fitz_lock:
+            rect = page.rect
+            header_h = max(100, int((rect.y1 - rect.y0) * 0.15))
+            clip = fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + header_h)
+        return self._extract_clip_text(page, clip, prefer_ocr)
+
+    def extract_issuer_text(self, page):
+        """
+        Extracts the header and footer text of a page, where statements print the issuer's name, legal entity
+        and ABN, leaving out the transactions in between. Each strip falls back to OCR if it has no text layer.
 
+        Args:
+            page (fitz.Page): The PDF page object.
+
+        Returns:
+            str: The header text and the footer text, separated by a newline.
+        """
+        return self._extract_header_text(page) + "\n" + self._extract_footer_text(page)
+
+    def _extract_clip_text(self, page, clip, prefer_ocr: bool = False) -> str:
         if not prefer_ocr:
-            # Try vector text first in the footer region
-            try:
-                t = page.get_text("text", clip=clip).strip()
-            except TypeError:
-                # Older PyMuPDF: fallback without "text" arg
-                t = page.get_text(clip=clip).strip()
+            # Try vector text first in the clipped region
+            with metrics.stage("footer_text"), self.fitz_lock:
+                try:
+                    t = page.get_text("text", clip=clip).strip()
+                except TypeError:
+                    # Older PyMuPDF: fallback without "text" arg
+                    t = page.get_text(clip=clip).strip()
             if t:
                 return t
 
-        # OCR the footer at ~300 DPI for better accuracy
-        mat = fitz.Matrix(4, 4)  # ~288 DPI; good enough
-        pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
-        img = Image.open(io.BytesIO(pix.tobytes("png")))
-        # Try a layout-capable PSM, then single-line if needed
-        text = pytesseract.image_to_string(img, lang="eng", config="--oem 1 --psm 6").strip()
-        if not text:
-            text = pytesseract.image_to_string(img, lang="eng", config="--oem 1 --psm 7").strip()
+        # OCR the clipped region at ~300 DPI for better accuracy
+        with metrics.stage("ocr"):
+            with self.fitz_lock:
+                mat = fitz.Matrix(4, 4)  # ~288 DPI; good enough
+                pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
+                img_data = pix.tobytes("png")
+                del pix
+            img = Image.open(io.BytesIO(img_data))
+            # Try a layout-capable PSM, then single-line if needed
+            text = pytesseract.image_to_string(img, lang="eng", config="--oem 1 --psm 6").strip()
+            if not text:
+                text = pytesseract.image_to_string(img, lang="eng", config="--oem 1 --psm 7").strip()
         return text
 
-        
+    @metrics.timed("regex_match")
+    def _search_start_pattern(self, start_pattern, text):
+        return re.search(start_pattern, text, flags=re.IGNORECASE | re.UNICODE)
+
+    @metrics.timed("find_statement_starts")
     def find_statement_starts(self, pdf_path, config, use_ocr=False):
         """
         Identifies the starting pages of statements within a PDF file based on a regex pattern or a specific phrase.
@@ -142,7 +230,9 @@ class PDFProcessor:
         Returns:
             list or dict: A list of page numbers where new documents start or a dictionary with start/end pages.
         """
-        doc = fitz.open(pdf_path)
+        with self.fitz_lock:
+            doc = fitz.open(pdf_path)
+            page_count = len(doc)
         # Determine whether we're working with start/end pairs or simple start pages
         statement_starts = {} if config.get('split_type') == 'start_end' else []
         current_statement = None
@@ -152,27 +242,27 @@ class PDFProcessor:
         start_phrase = config.get('start_phrase')
         must_not_contain = config.get('must_not_contain')
 
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
+        for page_num in range(page_count):
+            with self.fitz_lock:
+                page = doc.load_page(page_num)
             page_text = self.extract_text_from_page(page, use_ocr)
 
             if start_pattern:
                 # 1) Try full-page text
-                page_text = self.extract_text_from_page(page, use_ocr)  # as you had
                 page_text_norm = self._normalise_for_footer(page_text)
-                match = re.search(start_pattern, page_text_norm, flags=re.IGNORECASE | re.UNICODE)
+                match = self._search_start_pattern(start_pattern, page_text_norm)
 
                 # 2) If not found, try footer (text layer)
                 if not match:
                     footer_text = self._extract_footer_text(page, prefer_ocr=False)
                     footer_norm = self._normalise_for_footer(footer_text)
-                    match = re.search(start_pattern, footer_norm, flags=re.IGNORECASE | re.UNICODE)
+                    match = self._search_start_pattern(start_pattern, footer_norm)
 
                 # 3) If still not found, OCR just the footer
                 if not match:
                     footer_text_ocr = self._extract_footer_text(page, prefer_ocr=True)
                     footer_norm_ocr = self._normalise_for_footer(footer_text_ocr)
-                    match = re.search(start_pattern, footer_norm_ocr, flags=re.IGNORECASE | re.UNICODE)
+                    match = self._search_start_pattern(start_pattern, footer_norm_ocr)
 
                 if match:
                     if isinstance(statement_starts, dict):
@@ -213,12 +303,15 @@ class PDFProcessor:
 
         # Ensure the last statement is closed if it doesn't end explicitly
         if isinstance(statement_starts, dict) and current_statement is not None and "end" not in statement_starts[current_statement]:
-            statement_starts[current_statement]["end"] = len(doc) - 1
+            statement_starts[current_statement]["end"] = page_count - 1
 
-        doc.close()
+        with self.fitz_lock:
+            # The last page is released under the lock too
+            page = None
+            doc.close()
         return statement_starts
 
-    def split_pdf(self, pdf_path, output_folder, doc_starts):
+    def split_pdf(self, pdf_path, output_folder, doc_starts, type_name=None):
         """
         Splits a PDF into multiple documents based on the starting pages of each document.
 
@@ -226,33 +319,82 @@ class PDFProcessor:
             pdf_path (str): The file path of the PDF to be split.
             output_folder (str): The folder where the split PDFs will be saved.
             doc_starts (list or dict): A list or dictionary of page numbers where new documents start.
+            type_name (str): The statement type of the documents. If given, each document is recorded in the
+                folder's split manifest, so process.py can take its type from there.
+        """
+        file_names = []
+        for file_name, document_bytes in self.iter_split_documents(pdf_path, doc_starts):
+            output_path = f"{output_folder}/{file_name}"
+            with metrics.stage("split_write"):
+                with open(output_path, "wb") as output_file:
+                    output_file.write(document_bytes)
+            file_names.append(file_name)
+
+        if type_name and file_names:
+            self.record_split(output_folder, file_names, type_name, os.path.basename(pdf_path))
+
+    def record_split(self, output_folder, file_names, type_name, source_name):
+        """
+        Appends split documents to the split manifest of the output folder, creating it if needed.
+
+        Args:
+            output_folder (str): The folder holding the split documents.
+            file_names (list): The file names of the split documents.
+            type_name (str): Their statement type.
+            source_name (str): The file name of the PDF they were split from.
+        """
+        manifest_path = os.path.join(output_folder, SPLIT_MANIFEST_FILENAME)
+        with self.manifest_lock:
+            is_new = not os.path.isfile(manifest_path)
+            with open(manifest_path, "a", newline="") as manifest_file:
+                writer = csv.writer(manifest_file)
+                if is_new:
+                    writer.writerow(SPLIT_MANIFEST_COLUMNS)
+                writer.writerows([file_name, type_name, source_name] for file_name in file_names)
+
+    def iter_split_documents(self, pdf_path, doc_starts):
+        """
+        Splits a PDF in memory, yielding each document as PDF bytes as soon as it is built.
+        Used by split_pdf() and by pipeline.py, which hands the bytes straight to the analysis service.
+
+        Args:
+            pdf_path (str): The file path of the PDF to be split.
+            doc_starts (list or dict): A list or dictionary of page numbers where new documents start.
+
+        Yields:
+            tuple: The file name of the document (e.g. "<pdf>_document_1.pdf") and its PDF bytes.
         """
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
+        with self.fitz_lock:
+            doc = fitz.open(pdf_path)
+            total_pages = len(doc)
         pdf_name = Path(pdf_path).stem
 
         if isinstance(doc_starts, list):
             # Handle list of starts (standard document starts)
-            for i, start_page in enumerate(doc_starts):
-                end_page = doc_starts[i + 1] if i + 1 < len(doc_starts) else total_pages
-                output_path = f"{output_folder}/{pdf_name}_document_{i + 1}.pdf"
-                new_doc = fitz.open()
-                new_doc.insert_pdf(doc, from_page=start_page, to_page=end_page - 1)
-                new_doc.save(output_path)
-                new_doc.close()
-
+            ranges = [
+                (f"{pdf_name}_document_{i + 1}.pdf", start_page, (doc_starts[i + 1] if i + 1 < len(doc_starts) else total_pages) - 1)
+                for i, start_page in enumerate(doc_starts)
+            ]
         elif isinstance(doc_starts, dict):
             # Handle dictionary of starts and ends (statement numbers starts)
-            for statement, pages in doc_starts.items():
-                start_page = pages["start"]
-                end_page = pages["end"]
-                output_path = f"{output_folder}/{pdf_name}_statement_{statement}.pdf"
-                new_doc = fitz.open()
-                new_doc.insert_pdf(doc, from_page=start_page, to_page=end_page)
-                new_doc.save(output_path)
-                new_doc.close()
-
-        doc.close()
+            ranges = [
+                (f"{pdf_name}_statement_{statement}.pdf", pages["start"], pages["end"])
+                for statement, pages in doc_starts.items()
+            ]
+        else:
+            ranges = []
+
+        try:
+            for file_name, start_page, end_page in ranges:
+                with metrics.stage("split_render"), self.fitz_lock:
+                    new_doc = fitz.open()
+                    new_doc.insert_pdf(doc, from_page=start_page, to_page=end_page)
+                    document_bytes = new_doc.tobytes()
+                    new_doc.close()
+                yield file_name, document_bytes
+        finally:
+            with self.fitz_lock:
+                doc.close()
 
     def is_pdf_machine_readable(self, pdf_path):
         """
@@ -264,13 +406,52 @@ class PDFProcessor:
         Returns:
             bool: True if the PDF is machine-readable, False if it is scanned (image-based).
         """
-        doc = fitz.open(pdf_path)
-        first_page = doc.load_page(0)
-        text = first_page.get_text().strip()
-        doc.close()
+        with self.fitz_lock, fitz.open(pdf_path) as doc:
+            text = doc.load_page(0).get_text().strip()
         # If text is empty or very short, assume it's scanned
         return len(text) > 20  # Adjust threshold as needed
       
+    def read_text_layer(self, pdf_path, min_chars=20):
+        """
+        Reads the text layer of every page, applying the check of is_pdf_machine_readable() to each page.
+
+        Args:
+            pdf_path (str): The path to the PDF file.
+            min_chars (int): Pages with this many characters of text or fewer are treated as scanned.
+
+        Returns:
+            list: A (page_number, lines) pair per page, numbered from 1. lines is None for scanned pages.
+        """
+        pages = []
+        with self.fitz_lock, fitz.open(pdf_path) as doc:
+            for page in doc:
+                with metrics.stage("page_text"):
+                    # sort=True orders the blocks top to bottom, left to right, as the analysis service reads them
+                    text = page.get_text("text", sort=True)
+                lines = [line.strip() for line in text.splitlines() if line.strip()]
+                readable = len(text.strip()) > min_chars
+                pages.append((page.number + 1, lines if readable else None))
+        return pages
+
+    def extract_pages(self, pdf_path, page_numbers):
+        """
+        Builds a PDF in memory holding only some of the pages of a PDF.
+
+        Args:
+            pdf_path (str): The path to the PDF file.
+            page_numbers (list): The pages to keep, numbered from 1, in the order they should appear.
+
+        Returns:
+            bytes: The new PDF.
+        """
+        with self.fitz_lock, fitz.open(pdf_path) as doc, metrics.stage("split_render"):
+            new_doc = fitz.open()
+            for page_number in page_numbers:
+                new_doc.insert_pdf(doc, from_page=page_number - 1, to_page=page_number - 1)
+            document_bytes = new_doc.tobytes()
+            new_doc.close()
+        return document_bytes
+
     def extract_text_from_page(self, page, use_ocr=False):
         """
         Extracts text from a PDF page, using OCR if specified or if no text is found.
@@ -282,12 +463,16 @@ class PDFProcessor:
         Returns:
             str: The extracted text from the page.
         """
-        text = page.get_text().strip()
+        with metrics.stage("page_text"), self.fitz_lock:
+            text = page.get_text().strip()
         if not text or use_ocr:
             # Perform OCR
-            pix = page.get_pixmap()
-            img_data = pix.tobytes("png")
-            image = Image.open(io.BytesIO(img_data))
-            text = pytesseract.image_to_string(image, lang='eng', config='--psm 6')
+            with metrics.stage("ocr"):
+                with self.fitz_lock:
+                    pix = page.get_pixmap()
+                    img_data = pix.tobytes("png")
+                    del pix
+                image = Image.open(io.BytesIO(img_data))
+                text = pytesseract.image_to_string(image, lang='eng', config='--psm 6')
 
         return text
\ No newline at end of file
@@ -0,0 +1,378 @@
+# pipeline.py
+
+import os
+import argparse
+import queue
+import threading
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+from prep_env import EnvironmentPrep
+from pdf_processor import PDFProcessor
+from doc_ai_utils import DocAIUtils
+from csv_utils import CSVUtils
+from postprocess_utils import ExcelHandler
+from metrics import metrics
+from row_accumulator import ColumnarAccumulator
+from utils import Logger
+
+# Marks the end of the statements queue for each worker, and the end of each worker's results
+_DONE = object()
+
+
+class StatementPipeline:
+    """
+    Runs splitting, analysis and extraction as one streaming pipeline.
+
+    A splitter thread finds the statements in each input PDF and puts each one on a bounded queue as
+    in-memory PDF bytes, as soon as it is split. Analysis workers take statements off the queue, submit
+    them to the model, project and extract the result, and hand the extracted data back to the thread
+    iterating run(), so the first rows are available while later PDFs are still being split. Split
+    statements are only written to disk when an audit folder is given.
+    """
+    def __init__(self, pdf_processor, doc_ai_utils, csv_utils, client, model_id, statement_type,
+                 workers=4, queue_size=8, audit_folder=None, manual_processing_folder=None):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.pdf_processor = pdf_processor
+        self.doc_ai_utils = doc_ai_utils
+        self.csv_utils = csv_utils
+        self.client = client
+        self.model_id = model_id
+        self.statement_type = statement_type
+        self.workers = workers
+        self.queue_size = queue_size
+        self.audit_folder = audit_folder
+        self.manual_processing_folder = manual_processing_folder
+        # Updated by the splitter thread only
+        self.counts = {"input_pdfs": 0, "statements": 0, "unsplit": 0}
+
+    def run(self, input_folder):
+        """
+        Splits, analyses and extracts every PDF in a folder.
+
+        Args:
+            input_folder (str): The folder containing the PDFs to process.
+
+        Yields:
+            tuple: The document name, static info, summary info and transaction columns of each statement,
+                in the order they finish. The last three are None if the statement could not be analysed.
+        """
+        statements = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+
+        threads = [threading.Thread(target=self._split, args=(input_folder, statements), name="splitter", daemon=True)]
+        threads.extend(
+            threading.Thread(target=self._analyse, args=(statements, results), name=f"analysis-{i + 1}", daemon=True)
+            for i in range(self.workers)
+        )
+        for thread in threads:
+            thread.start()
+
+        running = self.workers
+        while running:
+            item = results.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            yield item
+
+        for thread in threads:
+            thread.join()
+
+    def _split(self, input_folder, statements):
+        try:
+            for pdf_file in sorted(Path(input_folder).glob("*.pdf")):
+                self.counts["input_pdfs"] += 1
+                pdf_path = str(pdf_file)
+                try:
+                    with metrics.document(pdf_file.name):
+                        doc_starts = self.pdf_processor.detect_doc_starts(pdf_path, self.statement_type['type_name'])
+
+                    if not doc_starts:
+                        self.counts["unsplit"] += 1
+                        if self.manual_processing_folder:
+                            self.pdf_processor.copy_to_manual_processing(pdf_path, self.manual_processing_folder)
+                        continue
+
+                    for file_name, document_bytes in self.pdf_processor.iter_split_documents(pdf_path, doc_starts):
+                        if self.audit_folder:
+                            with open(os.path.join(self.audit_folder, file_name), "wb") as audit_file:
+                                audit_file.write(document_bytes)
+                        # Blocks while the analysis workers are busy, so at most queue_size statements are held
+                        statements.put((file_name, document_bytes))
+                        self.counts["statements"] += 1
+
+                    self.logger.info("%s has been split into %s statements.", pdf_file.name, len(doc_starts))
+                except Exception as e:
+                    self.logger.error("Error splitting %s: %s", pdf_file.name, e)
+        finally:
+            for _ in range(self.workers):
+                statements.put(_DONE)
+
+    def _analyse(self, statements, results):
+        while True:
+            item = statements.get()
+            if item is _DONE:
+                results.put(_DONE)
+                return
+
+            file_name, document_bytes = item
+            try:
+                with metrics.document(file_name):
+                    field_index = self.doc_ai_utils.analyse_and_project(
+                        self.client, self.model_id, file_name, self.statement_type, document_bytes=document_bytes
+                    )
+                    del document_bytes
+                    if field_index is None:
+                        results.put((file_name, None, None, None))
+                        continue
+
+                    static_info = self.csv_utils.extract_static_info(field_index, file_name, self.statement_type)
+                    summary_info = self.csv_utils.extract_and_process_summary_info(field_index, file_name, self.statement_type)
+                    # Amounts are converted in bulk when the output is written
+                    transaction_columns = self.csv_utils.process_transaction_columns(
+                        field_index, self.statement_type, convert_amounts=False
+                    )
+                results.put((file_name, static_info, summary_info, transaction_columns))
+            except Exception as e:
+                self.logger.error("Error extracting %s: %s", file_name, e)
+                results.put((file_name, None, None, None))
+
+
+def available_excel_tasks():
+    """
+    Returns the ExcelHandler tasks that are implemented and can run on the extracted transactions.
+    """
+    return [task for task, details in ExcelHandler.task_registry.items() if hasattr(ExcelHandler, details['func'])]
+
+
+def main():
+    # Start time
+    start_time = time.time()
+    # Load environment variables
+    load_dotenv()
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description='''
+        PDF Pipeline Script
+
+        This script runs preprocessing, processing and Excel postprocessing in one pass, without prompts.
+        Each PDF in --input is split in memory and every statement is sent for analysis as soon as it is split,
+        so extraction runs while later PDFs are still being split. Only the extracted data is written, plus the
+        split statements if --audit is given. PDFs that cannot be split are copied to "manual-splitting required".''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''Example: python src/pipeline.py -i PATH/TO/PDFS -t "AMEX - Card Statement" -f parquet --tasks fill_missing_dates'''
+    )
+
+    parser.add_argument(
+        '-i', '--input',
+        type=str,
+        required=True,
+        help='Path to the input folder containing the original PDFs'
+    )
+
+    parser.add_argument(
+        '-c', '--config_type',
+        type=str,
+        default='config/type_models.yaml',
+        help='Path to the statement types configuration YAML file'
+    )
+
+    parser.add_argument(
+        '-t', '--type',
+        type=str,
+        required=True,
+        help='Name of the statement type to use'
+    )
+
+    parser.add_argument(
+        '-f', '--format',
+        type=str,
+        default='excel',
+        choices=['excel', *CSVUtils.output_registry],
+        help='Output format. "excel" writes extracted-data.xlsx; the other formats write a columnar store to the extracted-data folder.'
+    )
+
+    parser.add_argument(
+        '--excel',
+        action='store_true',
+        help='When writing a columnar store, also export extracted-data.xlsx from it.'
+    )
+
+    parser.add_argument(
+        '--tasks',
+        type=str,
+        nargs='+',
+        default=[],
+        choices=available_excel_tasks(),
+        help='Excel postprocessing tasks to apply to the transactions before they are written.'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of statements analysed at once.'
+    )
+
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=8,
+        help='Number of split statements held in memory waiting for analysis.'
+    )
+
+    parser.add_argument(
+        '--flush-every',
+        type=int,
+        default=50,
+        help='With --format parquet, write the extracted data to the store after this many statements.'
+    )
+
+    parser.add_argument(
+        '--audit',
+        action='store_true',
+        help='Also write each split statement to the split-files folder.'
+    )
+
+    parser.add_argument(
+        '--metrics',
+        type=str,
+        help='Write per-stage and per-document timings to this file at the end of the run (Prometheus textfile format if it ends in .prom, otherwise JSON).'
+    )
+
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+
+    # Set up logger
+    logger = Logger.get_logger("Pipeline", log_to_file=True)
+    logger.info("Starting pipeline...")
+
+    input_dir = args.input
+    output_folder = args.input # Outputs are created inside the given input folder
+    output_format = args.format
+
+    # Load configuration and select the statement type
+    env_prep = EnvironmentPrep()
+    env_prep.load_statement_config(args.config_type)
+    statement_type, selected_env_var = env_prep.select_statement_type(args.type)
+    model_id = env_prep.set_model_id(selected_env_var)
+
+    # Read model endpoint and API key from environment variables
+    model_endpoint = os.getenv("MODEL_ENDPOINT")
+    model_api_key = os.getenv("MODEL_API_KEY")
+
+    if not model_endpoint or not model_api_key:
+        logger.error("Error: MODEL_ENDPOINT and MODEL_API_KEY must be set in the .env file.")
+        exit(1)
+
+    manual_processing_folder = os.path.join(output_folder, 'manual-splitting required')
+    os.makedirs(manual_processing_folder, exist_ok=True)
+    audit_folder = None
+    if args.audit:
+        audit_folder = os.path.join(output_folder, 'split-files')
+        os.makedirs(audit_folder, exist_ok=True)
+
+    doc_ai_utils = DocAIUtils()
+    doc_ai_client = doc_ai_utils.initialise_analysis_client(model_endpoint, model_api_key, model_id)
+    csv_utils = CSVUtils()
+    amount_columns, _ = csv_utils.get_column_types(statement_type)
+
+    pipeline = StatementPipeline(
+        PDFProcessor(),
+        doc_ai_utils,
+        csv_utils,
+        doc_ai_client,
+        model_id,
+        statement_type,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        audit_folder=audit_folder,
+        manual_processing_folder=manual_processing_folder,
+    )
+
+    # Parquet stores can be appended to, so rows are written in batches as they are extracted
+    stream_output = output_format == 'parquet'
+    transactions = ColumnarAccumulator()
+    summaries = []
+    totals = {"analysed": 0, "failed": 0, "transactions": 0}
+    store_dir = None
+
+    def write_batch():
+        nonlocal transactions, summaries, store_dir
+        transactions_df, summaryinfo_df = csv_utils.build_output_frames(transactions.to_frame(), summaries, statement_type)
+        transactions_df, skipped = ExcelHandler.run_transaction_tasks(transactions_df, args.tasks)
+        if skipped:
+            logger.warning("Skipped %s on a batch without the transaction columns they need.", ", ".join(skipped))
+
+        if output_format == 'excel':
+            csv_utils.write_frames_to_excel(
+                transactions_df, summaryinfo_df, os.path.join(output_folder, "extracted-data.xlsx"), amount_columns
+            )
+            logger.info("Data written to file extracted-data.xlsx in %s.", os.path.basename(output_folder))
+        else:
+            # The first batch replaces the store left by an earlier run; later batches add to it
+            store_dir = csv_utils.write_frames_to_store(
+                transactions_df, summaryinfo_df, output_folder, "extracted-data", output_format, statement_type,
+                append=store_dir is not None
+            )
+        transactions = ColumnarAccumulator()
+        summaries = []
+
+    for document_name, static_info, summary_info, transaction_columns in pipeline.run(input_dir):
+        if static_info is None:
+            totals["failed"] += 1
+            logger.error("Error: No results found for %s.", document_name)
+            continue
+
+        transactions.add_document(static_info, transaction_columns)
+        summaries.append(summary_info)
+        totals["analysed"] += 1
+        if totals["analysed"] == 1:
+            logger.info(
+                "First statement extracted after %s: %s.",
+                time.strftime('%H:%M:%S', time.gmtime(time.time() - start_time)),
+                document_name
+            )
+        logger.info("Data aggregated for: \n%s.\n", document_name)
+
+        if stream_output and len(summaries) >= args.flush_every:
+            totals["transactions"] += len(transactions)
+            write_batch()
+
+    totals["transactions"] += len(transactions)
+    if summaries:
+        write_batch()
+    elif not totals["analysed"]:
+        logger.info("No data extracted from the documents.")
+
+    if store_dir and args.excel:
+        csv_utils.export_store_to_excel(store_dir, output_format, output_folder, "extracted-data.xlsx", statement_type=statement_type)
+
+    logger.info(
+        "Input PDFs: %s. Statements split: %s. Unsplit PDFs: %s. Statements analysed: %s. Failed: %s. Transactions extracted: %s.",
+        pipeline.counts["input_pdfs"],
+        pipeline.counts["statements"],
+        pipeline.counts["unsplit"],
+        totals["analysed"],
+        totals["failed"],
+        totals["transactions"]
+    )
+
+    # end time
+    end_time = time.time()
+    # Calculate time taken and print as hh:mm:ss
+    logger.info(
+        "Time taken: %s",
+        time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))
+    )
+
+    if args.metrics:
+        metrics.write(args.metrics)
+        logger.info("Stage timings written to %s.", args.metrics)
+
+if __name__ == "__main__":
+    main()
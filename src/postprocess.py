@@ -41,7 +41,7 @@ def main():
     if os.path.isfile(input_path) and input_path.lower().endswith('.xlsx'):
         # Excel processing
         output_file = f"{os.path.splitext(input_path)[0]}_processed{os.path.splitext(input_path)[1]}"
-        excel_handler = ExcelHandler(input_path)
+        excel_handler = ExcelHandler(input_path, tasks=args.tasks)
 
         if args.tasks:
             for task_name in args.tasks:
@@ -1,24 +1,37 @@
-import pandas as pd
-import fitz # PyMuPDF
 import re
 import os
 import shutil
 from pathlib import Path
 from datetime import datetime
-from utils import Logger
+from csv_utils import excel_sidecar_dir
+from utils import Logger, lazy_import
+import importlib.util
 import string
 import math
-import dateutil.parser
+
+pd = lazy_import("pandas")
+pq = lazy_import("pyarrow.parquet")
+fitz = lazy_import("fitz") # PyMuPDF
+dateutil_parser = lazy_import("dateutil.parser")
 
 class ExcelHandler:
     """
     A class to handle reading and writing of Excel files.
+
+    Sheets are read from the Parquet sidecar process.py writes next to the workbook (see
+    CSVUtils.write_excel_sidecar()) when it is at least as new as the workbook, and otherwise from the
+    workbook with the Rust-based calamine engine if python-calamine is installed, falling back to openpyxl.
+    Only the sheets the requested tasks declare in task_registry are loaded up front, and from them only
+    their declared columns. The other sheets and columns are read when the result is saved, so the
+    saved workbook is still complete.
     """
-    # Registry of tasks list
+    # Registry of tasks list. 'sheets' and 'columns' name what each task reads; a task without them gets every sheet and column.
     task_registry = {
         'fill_missing_dates': {
             'func': 'fill_missing_dates',
-            'description': 'Fill missing dates in the "Date" column by propagating the last known date downward.'
+            'description': 'Fill missing dates in the "Date" column by propagating the last known date downward.',
+            'sheets': ['Transactions'],
+            'columns': {'Transactions': ['OriginalFileName', 'Date']}
         },
         'another_task': {
             'func': 'another_task',
@@ -31,22 +44,149 @@ class ExcelHandler:
         # Add more tasks here
     }
 
-    def __init__(self, file_path):
+    # Attribute holding each sheet
+    sheet_attributes = {'Summary': 'summary_df', 'Transactions': 'transactions_df'}
+
+    def __init__(self, file_path, tasks=None):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
         self.file_path = file_path
         self.summary_df = None
         self.transactions_df = None
-        self._load_excel_file()
-        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        # Columns loaded from each sheet, None meaning all of them
+        self.loaded_columns = {}
+        self.sidecar_dir = self._find_sidecar()
+        self._load_excel_file(tasks)
+
+    def _find_sidecar(self):
+        sidecar_dir = excel_sidecar_dir(self.file_path)
+        paths = [os.path.join(sidecar_dir, f"{sheet_name}.parquet") for sheet_name in self.sheet_attributes]
+        if all(os.path.isfile(path) for path in paths):
+            if min(os.path.getmtime(path) for path in paths) >= os.path.getmtime(self.file_path):
+                return sidecar_dir
+            self.logger.info("Ignoring the Parquet sidecar of %s, as the workbook is newer.", os.path.basename(self.file_path))
+        return None
+
+    def required_columns(self, tasks=None):
+        """
+        Works out what the tasks read.
+
+        Args:
+            tasks (list): The task names. None means every sheet and column.
+
+        Returns:
+            dict: The columns each required sheet needs, or None for every column.
+        """
+        if not tasks:
+            return {sheet_name: None for sheet_name in self.sheet_attributes}
+        required = {}
+        for task_name in tasks:
+            details = self.task_registry.get(task_name)
+            if details is None:
+                continue
+            for sheet_name in details.get('sheets') or self.sheet_attributes:
+                columns = (details.get('columns') or {}).get(sheet_name)
+                if sheet_name in required and required[sheet_name] is None:
+                    continue
+                if columns is None:
+                    required[sheet_name] = None
+                else:
+                    required[sheet_name] = list(dict.fromkeys([*(required.get(sheet_name) or []), *columns]))
+        return required
 
-    def _load_excel_file(self):
-        """Loads the Excel file into DataFrames."""
+    @classmethod
+    def run_transaction_tasks(cls, transactions_df, tasks):
+        """
+        Runs tasks on a Transactions DataFrame outside a workbook, as pipeline.py does on each batch it writes.
+        A task is skipped when the DataFrame has no rows, or lacks a Transactions column the task declares in
+        task_registry.
+
+        Args:
+            transactions_df (pd.DataFrame): The transactions, as built by CSVUtils.build_output_frames().
+            tasks (list): The task names.
+
+        Returns:
+            tuple: The updated DataFrame, and the names of the tasks that were skipped.
+        """
+        skipped = []
+        for task_name in tasks or []:
+            details = cls.task_registry[task_name]
+            columns = (details.get('columns') or {}).get('Transactions') or []
+            if transactions_df.empty or any(col not in transactions_df.columns for col in columns):
+                skipped.append(task_name)
+                continue
+            transactions_df = getattr(cls, details['func'])(transactions_df)
+        return transactions_df, skipped
+
+    def _read_sheet(self, sheet_name, columns=None):
+        if self.sidecar_dir is not None:
+            table = pq.read_table(os.path.join(self.sidecar_dir, f"{sheet_name}.parquet"), columns=columns)
+            # Dates come back as timestamps, as they do from the workbook
+            df = table.to_pandas(date_as_object=False)
+            # Blank text is NaN when read from the workbook, so nulls and any "" from older sidecars are too.
+            # Older sidecars also stored the static columns as dictionaries, which come back as categories.
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].astype(object)
+                if df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+                    df[col] = df[col].astype(object).where(df[col].notna() & df[col].ne(""))
+            return df
+        return pd.read_excel(self.file_path, sheet_name=sheet_name, usecols=columns, engine=self._excel_engine())
+
+    def _sheet_columns(self, sheet_name):
+        """Returns the names of every column in a sheet, without reading its rows."""
+        if self.sidecar_dir is not None:
+            return pq.read_schema(os.path.join(self.sidecar_dir, f"{sheet_name}.parquet")).names
+        return pd.read_excel(self.file_path, sheet_name=sheet_name, nrows=0, engine=self._excel_engine()).columns.tolist()
+
+    @staticmethod
+    def _excel_engine():
+        return 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+    def _load_excel_file(self, tasks=None):
+        """Loads the sheets and columns the tasks need into DataFrames."""
         self.logger.info(
-            "Loading Excel file: %s",
-            self.file_path
+            "Loading Excel file: %s (from %s)",
+            self.file_path,
+            "its Parquet sidecar" if self.sidecar_dir else "the workbook"
         )
-        excel_file = pd.ExcelFile(self.file_path)
-        self.summary_df = pd.read_excel(excel_file, sheet_name='Summary')
-        self.transactions_df = pd.read_excel(excel_file, sheet_name='Transactions')
+        for sheet_name, columns in self.required_columns(tasks).items():
+            setattr(self, self.sheet_attributes[sheet_name], self._read_sheet(sheet_name, columns))
+            self.loaded_columns[sheet_name] = columns
+
+    def _complete_sheet(self, sheet_name):
+        """
+        Returns a sheet with every column, reading what was not loaded. Columns a task added stay
+        after the column they followed in the task's output.
+        """
+        if sheet_name not in self.loaded_columns:
+            return self._read_sheet(sheet_name)
+        df = getattr(self, self.sheet_attributes[sheet_name])
+        loaded = self.loaded_columns[sheet_name]
+        if loaded is None:
+            return df
+
+        all_columns = self._sheet_columns(sheet_name)
+        rest = [col for col in all_columns if col not in loaded]
+        if not rest:
+            return df
+        rest_df = self._read_sheet(sheet_name, rest)
+        if len(rest_df) != len(df):
+            raise ValueError(f"A task changed the number of rows in {sheet_name}, so its other columns cannot be restored.")
+
+        follows = {}
+        previous = None
+        for col in df.columns:
+            if col in all_columns:
+                previous = col
+            else:
+                follows.setdefault(previous, []).append(col)
+        order = list(follows.get(None, []))
+        for col in all_columns:
+            if col in df.columns or col in rest:
+                order.append(col)
+            order.extend(follows.get(col, []))
+        combined = pd.concat([df.reset_index(drop=True), rest_df.reset_index(drop=True)], axis=1)
+        return combined[order]
 
     def save(self, output_file):
         """Saves the DataFrames back to an Excel file."""
@@ -54,13 +194,15 @@ class ExcelHandler:
             "Saving to: %s",
             output_file
         )
+        summary_df = self._complete_sheet('Summary')
+        transactions_df = self._complete_sheet('Transactions')
         with pd.ExcelWriter(output_file, 
                             engine='xlsxwriter',
                             datetime_format="DD/MM/YYYY",
                             date_format="DD/MM/YYYY",
                             ) as writer:
-            self.summary_df.to_excel(writer, sheet_name='summary', index=False)
-            self.transactions_df.to_excel(writer, sheet_name='transactions', index=False)
+            summary_df.to_excel(writer, sheet_name='summary', index=False)
+            transactions_df.to_excel(writer, sheet_name='transactions', index=False)
 
     @staticmethod
     def fill_missing_dates(transactions_df, **kwargs):
@@ -379,7 +521,7 @@ class PDFPostProcessor:
             str: A string of the date in form YYYYMMDD. E.g., 20230130
         """
         # Dateutil's parser is designed to capture most date formats. If it fails, adjust to a try statement, with the except section parsing the atypical format.
-        parsed_date = dateutil.parser.parse(date_str)
+        parsed_date = dateutil_parser.parse(date_str)
 
         str = parsed_date.strftime("%Y%m%d")
         return str
@@ -5,6 +5,8 @@ import argparse
 from prep_env import EnvironmentPrep
 from pdf_processor import PDFProcessor
 from count_pdfs import PDFCounter
+from metrics import metrics
+from resource_governor import ResourceGovernor
 from utils import Logger
 
 def main():
@@ -42,8 +44,31 @@ def main():
         required=True,
         help='Type of file to process. See YAML for options.'
     )
+
+    parser.add_argument(
+        '--metrics',
+        type=str,
+        help='Write per-stage and per-document timings to this file at the end of the run (Prometheus textfile format if it ends in .prom, otherwise JSON).'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='Maximum number of PDFs split at once. 0 (the default) sizes the pool from the available CPUs and memory; 1 splits serially.'
+    )
+
+    parser.add_argument(
+        '--memory-per-worker',
+        type=int,
+        default=512,
+        help='Memory in MB to allow for each PDF being split, used to size the pool.'
+    )
     
     args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
     
     input_dir = args.input
     output_folder = input_dir # Output folder for preprocessed PDFs will be created inside the given input folder
@@ -80,11 +105,16 @@ def main():
     
     # Process PDFs
     pdf_processor = PDFProcessor()
+    governor = None
+    if args.workers != 1:
+        # Pins tesseract to one thread and adapts the number of PDFs split at once to the CPU and memory headroom
+        governor = ResourceGovernor(max_workers=args.workers or None, memory_per_worker_mb=args.memory_per_worker)
     pdf_processor.process_all_pdfs(
         input_dir,
         ready_for_analysis,
         manual_splitting_folder,
         type_name,
+        governor=governor,
     )
     
     # Count processed PDFs
@@ -109,5 +139,9 @@ def main():
         detailed_data_after, summary_data_after, statement_set_path, "post-split-counts.xlsx"
     )
 
+    if args.metrics:
+        metrics.write(args.metrics)
+        logger.info("Stage timings written to %s.", args.metrics)
+
 if __name__ == "__main__":
     main()
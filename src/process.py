@@ -5,9 +5,18 @@ import argparse
 from dotenv import load_dotenv
 from prep_env import EnvironmentPrep
 from doc_ai_utils import DocAIUtils
+from pdf_processor import PDFProcessor
+from result_cache import AnalysisResultCache
 from csv_utils import CSVUtils
-from utils import Logger
-import pandas as pd
+from metrics import metrics
+from row_accumulator import ColumnarAccumulator
+from dedup_utils import DuplicateDetector
+from scheduler import SubmissionScheduler
+from type_resolver import SPLIT_MANIFEST_FILENAME, StatementTypeResolver
+from upload_optimiser import UploadOptimiser
+from utils import Logger, type_slug
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 import time
 
 def main():
@@ -16,19 +25,19 @@ def main():
     # Load environment variables
     load_dotenv()
 
-    # Set up logger
-    logger = Logger.get_logger("Processor", log_to_file=True)
-
     # Parse command-line arguments
     parser = argparse.ArgumentParser(
         description='''
         PDF Processing Script
                                      
         This script takes a preprocessed folder of PDFs each containing individual statements and extracts the information into an excel file.
-        The --input requires the user to specify what --type of statement is being accessed. The available types can be found in the type_models.yaml.
+        The --type of statement being accessed applies to every file. The available types can be found in the type_models.yaml.
+        Without --type, the folder may hold several types: each file's type is read from the split manifest written by
+        preprocess.py (or detected with --detect), each model gets its own pool of workers, and one output is written per type.
         The --config argument is pre-defined but can be changed if required.''',
         formatter_class=argparse.RawDescriptionHelpFormatter, 
-        epilog = '''Example: python src/process.py -i PATH/TO/PDFS -t "AMEX - Card Statement"'''
+        epilog = '''Example: python src/process.py -i PATH/TO/PDFS -t "AMEX - Card Statement"
+         python src/process.py -i PATH/TO/MIXED/PDFS --detect "AMEX - Card Statement" "Suncorp - Bank Statement"'''
         )
     
     parser.add_argument(
@@ -48,26 +57,194 @@ def main():
     parser.add_argument(
         '-t', '--type', 
         type=str, 
-        required=True, 
-        help='Name of the statement type to use'
+        help='Name of the statement type of every file. Without it, each file\'s type is taken from the split manifest (or detected with --detect) and one output is written per type.'
+    )
+
+    parser.add_argument(
+        '--manifest',
+        type=str,
+        help='Split manifest to take file types from. Defaults to split-manifest.csv in the input folder.'
+    )
+
+    parser.add_argument(
+        '--detect',
+        type=str,
+        nargs='*',
+        metavar='TYPE',
+        help='Detect the type of files not in the manifest from the detect_pattern of each statement type. '
+             'Optionally list the statement types the folder can hold; each of them needs a detect_pattern.'
+    )
+
+    parser.add_argument(
+        '-f', '--format',
+        type=str,
+        default='excel',
+        choices=['excel', *CSVUtils.output_registry],
+        help='Output format. "excel" writes extracted-data.xlsx; the other formats write a columnar store to the extracted-data folder.'
+    )
+
+    parser.add_argument(
+        '--excel',
+        action='store_true',
+        help='When writing a columnar store, also export extracted-data.xlsx from it.'
+    )
+
+    parser.add_argument(
+        '--metrics',
+        type=str,
+        help='Write per-stage and per-document timings to this file at the end of the run (Prometheus textfile format if it ends in .prom, otherwise JSON).'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of documents analysed at once. Documents are submitted longest first.'
+    )
+
+    parser.add_argument(
+        '--plan-only',
+        action='store_true',
+        help='Log the submission order, projected completion time and cost, then exit without analysing.'
+    )
+
+    parser.add_argument(
+        '--tables',
+        action='store_true',
+        help='Also write the tables the model finds, to a Tables sheet or the tables table of the columnar store.'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help='Store each full analysis result as JSON in this folder, so outputs can be rebuilt later with reextract.py without analysing again.'
+    )
+
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help='Skip analysing exact and near-duplicate documents, reusing the extraction of the first copy, and write duplicates-report.csv.'
+    )
+
+    parser.add_argument(
+        '--dedup-threshold',
+        type=float,
+        default=0.9,
+        help='Estimated text similarity (0-1) at which two documents with the same page count are near duplicates.'
+    )
+
+    parser.add_argument(
+        '--dedup-ocr',
+        action='store_true',
+        help='OCR pages without a text layer when fingerprinting, so re-scanned copies are matched too.'
+    )
+
+    parser.add_argument(
+        '--optimise-uploads',
+        action='store_true',
+        help='Downsample embedded images and strip metadata and unused objects before sending each document. The original files are kept.'
+    )
+
+    parser.add_argument(
+        '--upload-dpi',
+        type=int,
+        default=150,
+        help='Resolution images are downsampled to with --optimise-uploads.'
+    )
+
+    parser.add_argument(
+        '--jpeg-quality',
+        type=int,
+        default=75,
+        help='JPEG quality (1-100) of downsampled images with --optimise-uploads.'
+    )
+
+    parser.add_argument(
+        '--upload-mbps',
+        type=float,
+        default=20.0,
+        help='Upload bandwidth in Mbit/s, used to report the upload time --optimise-uploads saves.'
+    )
+
+    parser.add_argument(
+        '--seconds-per-page',
+        type=float,
+        default=1.5,
+        help='Estimated analysis latency per page, used to schedule submissions.'
+    )
+
+    parser.add_argument(
+        '--price-per-page',
+        type=float,
+        default=0.05,
+        help='Price of analysing one page with the custom model, used for the projected cost.'
     )
     
     args = parser.parse_args()
 
+    if args.metrics:
+        metrics.enable()
+
+    # Set up logger
+    logger = Logger.get_logger("Processor", log_to_file=True)
+
     input_dir = args.input
     output_folder = args.input #Output folder for processed PDFs will be created inside the initial input folder
     config_type = args.config_type
-    type = args.type
+    output_format = args.format
 
     # Load configuration
     env_prep = EnvironmentPrep()
     config = env_prep.load_statement_config(config_type)
 
-    # Select statement type
-    statement_type, selected_env_var = env_prep.select_statement_type(type)
+    files_to_process = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
+
+    # Only the first copy of each duplicate group is sent for analysis
+    files_to_submit = files_to_process
+    duplicates = {}
+    if args.dedup:
+        detector = DuplicateDetector(
+            pdf_processor=PDFProcessor() if args.dedup_ocr else None,
+            use_ocr=args.dedup_ocr,
+            threshold=args.dedup_threshold
+        )
+        files_to_submit, duplicates = detector.find_duplicates(sorted(files_to_process))
+        detector.write_report(duplicates, os.path.join(output_folder, "duplicates-report.csv"))
+
+    # Select the statement type of each file: the --type for all of them, or from the split manifest and detection
+    if args.type:
+        files_by_type = {args.type: files_to_submit}
+    else:
+        detect = args.detect is not None
+        resolver = StatementTypeResolver(
+            config["statement_types"],
+            pdf_processor=PDFProcessor() if detect else None,
+            detect_types=args.detect
+        )
+        files_by_type, _ = resolver.resolve(
+            files_to_submit,
+            manifest_path=args.manifest or os.path.join(input_dir, SPLIT_MANIFEST_FILENAME),
+            detect=detect
+        )
+    statement_types = {type_name: env_prep.select_statement_type(type_name) for type_name in files_by_type}
+
+    # Types whose model IDs share an environment variable share a model, and so a pool of workers
+    files_by_model = {}
+    type_of_file = {}
+    for type_name, paths in files_by_type.items():
+        files_by_model.setdefault(statement_types[type_name][1], []).extend(paths)
+        type_of_file.update((path, type_name) for path in paths)
 
-    # Set model_id using the environment variable from .env
-    model_id = env_prep.set_model_id(selected_env_var)
+    # Order the submissions longest first, so a long statement does not start last and set the end of the run
+    scheduler = SubmissionScheduler(seconds_per_page=args.seconds_per_page, price_per_page=args.price_per_page)
+    plans = {}
+    for env_var, paths in files_by_model.items():
+        plans[env_var] = scheduler.plan(paths, args.workers)
+        if len(files_by_model) > 1:
+            logger.info("Submission plan for %s:", env_var)
+        scheduler.log_plan(plans[env_var])
+    if args.plan_only:
+        return
 
     # Read model endpoint and API key from environment variables
     model_endpoint = os.getenv("MODEL_ENDPOINT")
@@ -77,96 +254,179 @@ def main():
         logger.error("Error: MODEL_ENDPOINT and MODEL_API_KEY must be set in the .env file.")
         exit(1)
 
-    # Initialize Document Analysis Client
+    # Initialize a Document Analysis Client per model, using the model IDs from .env
     doc_ai_utils = DocAIUtils()
-    doc_ai_client = doc_ai_utils.initialise_analysis_client(
-        model_endpoint, model_api_key, model_id
-    )
+    models = {}
+    for env_var in files_by_model:
+        model_id = env_prep.set_model_id(env_var)
+        models[env_var] = (model_id, doc_ai_utils.initialise_analysis_client(model_endpoint, model_api_key, model_id))
 
-    # Process PDFs
+    # Process PDFs, collecting the results of each statement type separately
     csv_utils = CSVUtils()
-    all_transactions = []
-    all_summaries = []
-    all_table_data = []
+    outputs = {
+        type_name: {"transactions": ColumnarAccumulator(), "summaries": [], "tables": [], "static_info": {}}
+        for type_name in files_by_type
+    }
 
-    files_to_process = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
     files_to_go = len(files_to_process)
 
+    result_cache = AnalysisResultCache(args.cache_dir) if args.cache_dir else None
+
+    optimiser = None
+    if args.optimise_uploads:
+        optimiser = UploadOptimiser(dpi=args.upload_dpi, jpeg_quality=args.jpeg_quality, upload_mbps=args.upload_mbps)
+
     # Create the analysed-files folder under output_folder
     analysed_files_folder = os.path.join(output_folder, "analysed-files")
     os.makedirs(analysed_files_folder, exist_ok=True)
 
-    #debug issue with no files
-    static_info = {}  # default if no files or all files fail
+    def extract(field_index, document_name, statement_type):
+        return (
+            csv_utils.extract_static_info(field_index, document_name, statement_type),
+            csv_utils.extract_and_process_summary_info(field_index, document_name, statement_type),
+            # Amounts are converted in bulk when the output is written
+            csv_utils.process_transaction_columns(field_index, statement_type, convert_amounts=False),
+            field_index.tables,
+        )
 
-    for document_path in files_to_process:
-        # Analyze the document
+    def analyse_and_extract(document_path, statement_type, model_id, doc_ai_client):
         original_document_name = os.path.basename(document_path)
-
-        # Analyze document and extract static info, summary, transactions
-        results = doc_ai_utils.analyse_document(doc_ai_client, model_id, document_path)
-        logger.info("Processing extracted data...\n")
-        if not results:
-            logger.error(
-                "Error: No results found for %s.",
-                original_document_name
+        with metrics.document(original_document_name):
+            # Analyze the document, keeping only the fields the statement type references.
+            # The projected index is shared between the extractors.
+            document_bytes = optimiser.optimise(document_path) if optimiser else None
+            field_index = doc_ai_utils.analyse_and_project(
+                doc_ai_client, model_id, document_path, statement_type,
+                document_bytes=document_bytes, include_tables=args.tables, result_cache=result_cache
             )
-            continue
+            logger.info("Processing extracted data...\n")
+            if field_index is None:
+                return None
 
-        static_info = csv_utils.extract_static_info(results, original_document_name, statement_type)
-        summary_info = csv_utils.extract_and_process_summary_info(results, original_document_name, statement_type)
-        transactions = csv_utils.process_transactions(results, statement_type)
+            # Duplicates reuse this analysis, extracted under their own file names
+            document_paths = [document_path, *(duplicate for duplicate, _, _ in duplicates.get(document_path, ()))]
+            return [(path, extract(field_index, os.path.basename(path), statement_type)) for path in document_paths]
 
-        # Add static info to each transaction
-        updated_transactions = []
-        for transaction in transactions:
-            combined_transaction = {**static_info, **transaction}
-            updated_transactions.append(combined_transaction)
+    with ExitStack() as stack:
+        # Each model has its own pool, which starts jobs in the plan's longest-first order as workers free up
+        futures = {}
+        for env_var, plan in plans.items():
+            if not plan.jobs:
+                continue
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=plan.slots))
+            model_id, doc_ai_client = models[env_var]
+            for job in plan.jobs:
+                statement_type = statement_types[type_of_file[job.path]][0]
+                futures[executor.submit(analyse_and_extract, job.path, statement_type, model_id, doc_ai_client)] = job.path
 
-        # Aggregate transactions and summaries
-        all_transactions.extend(updated_transactions)
-        all_summaries.append(summary_info)
+        for future in as_completed(futures):
+            original_document_name = os.path.basename(futures[future])
+            output = outputs[type_of_file[futures[future]]]
+            try:
+                extracted_documents = future.result()
+            except Exception as e:
+                logger.error("Error extracting %s: %s", original_document_name, e)
+                continue
+            if extracted_documents is None:
+                logger.error(
+                    "Error: No results found for %s.",
+                    original_document_name
+                )
+                continue
 
-        logger.info(
-            "Data aggregated for: \n%s.\n",
-            os.path.basename(document_path)
-        )
+            for document_path, extracted in extracted_documents:
+                original_document_name = os.path.basename(document_path)
 
-        # Move the analysed file to the analysed-files folder
-        env_prep.move_analysed_file(document_path, analysed_files_folder)
+                # Aggregate transactions and summaries. Static info is stored once per document.
+                static_info, summary_info, transaction_columns, tables = extracted
+                output["static_info"] = static_info
+                output["transactions"].add_document(static_info, transaction_columns)
+                output["summaries"].append(summary_info)
+                if tables:
+                    output["tables"].append((original_document_name, tables))
+
+                logger.info(
+                    "Data aggregated for: \n%s.\n",
+                    original_document_name
+                )
+
+                # Move the analysed file to the analysed-files folder
+                env_prep.move_analysed_file(document_path, analysed_files_folder)
+
+                files_to_go -= 1
+                logger.info(
+                    "Number of files remaining: %s.\n",
+                    files_to_go
+                )
+
+    if optimiser:
+        optimiser.log_summary()
+
+    for type_name, output in outputs.items():
+        statement_type = statement_types[type_name][0]
+        all_transactions = output["transactions"]
+        all_summaries = output["summaries"]
+        all_table_data = output["tables"]
+        # A single --type keeps the original output names; mixed runs write one output per type
+        output_name = "extracted-data" if args.type else f"extracted-data-{type_slug(type_name)}"
 
-        files_to_go -= 1
         logger.info(
-            "Number of files remaining: %s.\n",
-            files_to_go
+            "%s: total transactions extracted: %s",
+            type_name,
+            len(all_transactions)
         )
+        logger.info(
+            "%s: total summaries extracted: %s",
+            type_name,
+            len(all_summaries)
+        )
+        if not args.type and not all_summaries:
+            continue
 
-    logger.info(
-        "Total transactions extracted: %s",
-        len(all_transactions)
-    )
-    logger.info(
-        "Total summaries extracted: %s",
-        len(all_summaries)
-    )
+        transactions_df = all_transactions.to_frame()
 
-    # Write extracted data to Excel
-    csv_utils.write_transactions_and_summaries_to_excel(
-        all_transactions,
-        all_summaries,
-        output_folder,
-        "extracted-data.xlsx",
-        table_data=all_table_data,
-        statement_type=statement_type,  # Pass statement_type here #TODO: Check if this is needed, might have been related to date processing.
-        static_info=static_info
-    )
+        if output_format == 'excel':
+            # Write extracted data to Excel
+            csv_utils.write_transactions_and_summaries_to_excel(
+                transactions_df,
+                all_summaries,
+                output_folder,
+                f"{output_name}.xlsx",
+                table_data=all_table_data,
+                statement_type=statement_type,  # Pass statement_type here #TODO: Check if this is needed, might have been related to date processing.
+                static_info=output["static_info"]
+            )
+        else:
+            # Write extracted data to the columnar store, optionally exporting Excel from it
+            store_dir = csv_utils.write_transactions_and_summaries(
+                transactions_df,
+                all_summaries,
+                output_folder,
+                output_name,
+                output_format,
+                statement_type=statement_type
+            )
+            if all_table_data:
+                csv_utils.write_tables_to_store(all_table_data, output_folder, output_name, output_format)
+            if args.excel:
+                csv_utils.export_store_to_excel(
+                    store_dir,
+                    output_format,
+                    output_folder,
+                    f"{output_name}.xlsx",
+                    statement_type=statement_type
+                )
     # end time
     end_time = time.time()
     # Calculate time taken and print as hh:mm:ss
     logger.info(
         "Time taken: %s",
         time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))
-    ) 
+    )
+
+    if args.metrics:
+        metrics.write(args.metrics)
+        logger.info("Stage timings written to %s.", args.metrics)
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,8 +6,12 @@ from dotenv import load_dotenv
 from prep_env import EnvironmentPrep
 from doc_ai_utils import DocAIUtils
 from csv_utils import CSVUtils
+from metrics import metrics
+from pdf_processor import PDFProcessor
+from raw_writer import RawTextWriter
+from statement_packer import StatementPack, StatementPacker
+from text_router import TextRouter
 from utils import Logger
-import pandas as pd
 import time
 
 def main():
@@ -21,9 +25,10 @@ def main():
         description='''\
         PDF Processing Script
                                      
-        This script takes a preprocessed folder of PDFs each containing individual statements and extracts the RAW DATA into an excel file.
-        It creates a folder within the --input folder and saves the excel into that folder.
-        The excel is saved as "extracted-data.xlsx"''',        
+        This script takes a preprocessed folder of PDFs each containing individual statements and extracts the RAW DATA.
+        Each document's text is appended to extracted-text.jsonl in the --input folder as soon as it is analysed, and the
+        document is then moved to analysed-files. The excel view "extracted-data.xlsx" (or a columnar store with --format)
+        is derived from the JSONL at the end of the run.''',        
         formatter_class=argparse.RawDescriptionHelpFormatter,                                     
         epilog = '''Example: python src/raw_process.py -i PATH/TO/PDFS'''
         )
@@ -34,13 +39,73 @@ def main():
         required=True, 
         help='Path to the input folder containing preprocessed PDFs'
     )
+
+    parser.add_argument(
+        '-f', '--format',
+        type=str,
+        default='excel',
+        choices=['excel', 'jsonl', *CSVUtils.output_registry],
+        help='Output format. extracted-text.jsonl is always written; "excel" also derives extracted-data.xlsx from it, and the columnar formats derive a store in the extracted-data folder.'
+    )
+
+    parser.add_argument(
+        '--per-page',
+        action='store_true',
+        help='Also write one record per page to extracted-pages.jsonl (and the extracted_pages table of a columnar store).'
+    )
+
+    parser.add_argument(
+        '--metrics',
+        type=str,
+        help='Write per-stage and per-document timings to this file at the end of the run (Prometheus textfile format if it ends in .prom, otherwise JSON).'
+    )
+
+    submission = parser.add_mutually_exclusive_group()
+
+    submission.add_argument(
+        '--route',
+        action='store_true',
+        help='Read pages with a text layer locally and only send scanned pages for analysis.'
+    )
+
+    submission.add_argument(
+        '--pack',
+        action='store_true',
+        help='Send small statements several to a submission and split the results back by page.'
+    )
+
+    parser.add_argument(
+        '--pack-max-pages',
+        type=int,
+        default=50,
+        help='Most pages in one packed submission. Keep this within the service\'s page limit.'
+    )
+
+    parser.add_argument(
+        '--pack-small-pages',
+        type=int,
+        default=2,
+        help='Statements with up to this many pages are packed; longer ones are sent on their own.'
+    )
+
+    parser.add_argument(
+        '--verify-packing',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Also analyse the statements of the first N packs one by one and compare their text. Packing stops for the rest of the run if any differ. Defaults to 1; 0 trusts packing without checking.'
+    )
     
     args = parser.parse_args()
 
+    if args.metrics:
+        metrics.enable()
+
     input_dir = args.input
     output_folder = args.input #Output folder for processed PDFs will be created inside the initial input folder
     config_type = "config/type_models.yaml"
     type = "Raw-extract"
+    output_format = args.format
 
     # Set up logger
     logger = Logger.get_logger("RawProcessor", log_to_file=True)
@@ -72,54 +137,134 @@ def main():
 
     # Process PDFs
     csv_utils = CSVUtils()
-    all_text = []
+    text_router = None
+    if args.route:
+        text_router = TextRouter(PDFProcessor(), doc_ai_utils, doc_ai_client, model_id, statement_type)
 
     files_to_process = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
     files_to_go = len(files_to_process)
 
+    # Without packing each document is a pack of one
+    packer = None
+    if args.pack:
+        packer = StatementPacker(max_pages=args.pack_max_pages, small_pages=args.pack_small_pages)
+        packs = packer.plan(files_to_process)
+        packs_to_verify = args.verify_packing
+    else:
+        packs = [StatementPack(number, [(document_path, 1, 0)]) for number, document_path in enumerate(files_to_process, start=1)]
+        packs_to_verify = 0
+
     # Create the analysed-files folder under output_folder
     analysed_files_folder = os.path.join(output_folder, "analysed-files")
     os.makedirs(analysed_files_folder, exist_ok=True)
 
-    for document_path in files_to_process:
-        # Analyze the document
-        original_document_name = os.path.basename(document_path)
-
-        # Analyze document and extract static info, summary, transactions
-        results = doc_ai_utils.analyse_document(doc_ai_client, model_id, document_path)
-        logger.info("Processing extracted data...\n")
-        if not results:
-            logger.error(
-                "Error: No results found for %s.",
-                original_document_name
-            )
-            continue
+    def analyse(document_path, document_bytes=None):
+        if text_router:
+            return text_router.extract(document_path)
+        return doc_ai_utils.analyse_and_project(
+            doc_ai_client, model_id, document_path, statement_type, include_text=True, document_bytes=document_bytes
+        )
 
-        # Extract table data from the results
-        extracted_text = doc_ai_utils.extract_all_text(results)
-        all_text.append({
-            "Document Name": original_document_name,
-            "Extracted Text": extracted_text    
-        })
+    def analyse_pack(pack):
+        """
+        Analyses a pack and returns (path, results) per statement. Statements are analysed one by one
+        instead if the pack cannot be analysed or split, or fails verification.
+        """
+        nonlocal packer, packs_to_verify
+        results = None
+        document_bytes = packer.build(pack) if packer else None
+        if document_bytes is not None:
+            results = analyse(pack.name, document_bytes)
+        if results is None:
+            return [(document_path, analyse(document_path)) for document_path, _, _ in pack.members]
 
-    # Move the analysed file to the analysed-files folder
-    env_prep.move_analysed_file(document_path, analysed_files_folder)
+        try:
+            statements = packer.split(pack, results)
+        except ValueError as e:
+            logger.error("Error splitting %s, packing is switched off: %s", pack.name, e)
+            packer = None
+            return [(document_path, analyse(document_path)) for document_path, _, _ in pack.members]
 
-    files_to_go -= 1
-    logger.info(
-        "Number of files remaining: %s.\n",
-        files_to_go
-    )
+        if packs_to_verify > 0:
+            packs_to_verify -= 1
+            singles = [(document_path, analyse(document_path)) for document_path, _ in statements]
+            mismatched = False
+            for (document_path, packed), (_, single) in zip(statements, singles):
+                differences = packer.compare(packed, single) if single else ["not analysed alone"]
+                if differences:
+                    mismatched = True
+                    logger.error(
+                        "Packed result of %s differs from its own: %s.",
+                        os.path.basename(document_path), "; ".join(differences)
+                    )
+            if mismatched:
+                logger.error("Packed results do not match, packing is switched off.")
+                packer = None
+                return singles
+            logger.info("%s verified against per-document results.", pack.name)
+        return statements
+
+    # Each document is written as soon as it is analysed, so memory does not grow with the number of documents
+    with RawTextWriter(output_folder, per_page=args.per_page) as raw_writer:
+        for pack in packs:
+            with metrics.document(pack.name):
+                analysed = analyse_pack(pack)
+
+            for document_path, results in analysed:
+                original_document_name = os.path.basename(document_path)
+                logger.info("Processing extracted data...\n")
+                if not results:
+                    logger.error(
+                        "Error: No results found for %s.",
+                        original_document_name
+                    )
+                    continue
+
+                raw_writer.write(original_document_name, results)
+
+                # Move the analysed file to the analysed-files folder
+                env_prep.move_analysed_file(document_path, analysed_files_folder)
 
-    # Write extracted data to Excel
-    if all_text:
-        csv_utils.write_raw_data_to_excel(
-            all_text,
+                files_to_go -= 1
+                logger.info(
+                    "Number of files remaining: %s.\n",
+                    files_to_go
+                )
+
+    if raw_writer.count == 0:
+        logger.info("No data extracted from the documents.")
+
+    # Derive the Excel view or the columnar store from the JSONL, which also holds the records of earlier runs
+    has_records = os.path.getsize(raw_writer.documents_path) > 0
+    if has_records and output_format == 'excel':
+        csv_utils.write_raw_jsonl_to_excel(
+            raw_writer.documents_path,
             output_folder,
             "extracted-data.xlsx"
         )
-    else:
-        logger.info("No data extracted from the documents.")
+    elif has_records and output_format != 'jsonl':
+        csv_utils.write_raw_jsonl_to_store(
+            raw_writer.documents_path,
+            output_folder,
+            "extracted-data",
+            output_format
+        )
+        if raw_writer.pages_path:
+            csv_utils.write_raw_jsonl_to_store(
+                raw_writer.pages_path,
+                output_folder,
+                "extracted-data",
+                output_format,
+                table_name='extracted_pages'
+            )
+
+    if text_router:
+        logger.info(
+            "Pages read locally: %s. Pages sent for analysis: %s, from %s documents.",
+            text_router.counts["local_pages"],
+            text_router.counts["service_pages"],
+            text_router.counts["service_documents"]
+        )
 
     # end time
     end_time = time.time()
@@ -129,5 +274,9 @@ def main():
         time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))
     )
 
+    if args.metrics:
+        metrics.write(args.metrics)
+        logger.info("Stage timings written to %s.", args.metrics)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,78 @@
+# src/raw_writer.py
+
+import json
+import os
+from metrics import metrics
+from utils import Logger
+
+DOCUMENTS_FILENAME = "extracted-text.jsonl"
+PAGES_FILENAME = "extracted-pages.jsonl"
+
+
+def iter_jsonl(path):
+    """
+    Yields the records of a JSONL file one at a time.
+
+    Args:
+        path (str): The path to the JSONL file.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RawTextWriter:
+    """
+    Streams raw_process.py results to JSONL as each document is analysed.
+
+    Each document becomes one line of extracted-text.jsonl holding its name, page count and text, and
+    with per_page, each page becomes one line of extracted-pages.jsonl. Lines are flushed as they are
+    written, so nothing is held in memory between documents and an interrupted run keeps every record
+    written so far. The files are appended to, so a rerun over the files left in the input folder adds
+    to the same output. Excel and columnar outputs are derived from the JSONL afterwards (see
+    CSVUtils.write_raw_jsonl_to_excel() and CSVUtils.write_raw_jsonl_to_store()).
+    """
+    def __init__(self, output_dir, per_page=False):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.documents_path = os.path.join(output_dir, DOCUMENTS_FILENAME)
+        self.pages_path = os.path.join(output_dir, PAGES_FILENAME) if per_page else None
+        self.documents_file = None
+        self.pages_file = None
+        self.count = 0
+
+    def __enter__(self):
+        self.documents_file = open(self.documents_path, "a", encoding="utf-8")
+        if self.pages_path:
+            self.pages_file = open(self.pages_path, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info):
+        for file in (self.documents_file, self.pages_file):
+            if file is not None:
+                file.close()
+        return False
+
+    @metrics.timed("raw_write")
+    def write(self, document_name, results):
+        """
+        Writes the records of one document.
+
+        Args:
+            document_name (str): The name of the document.
+            results (FieldIndex): The projection holding the text lines of each page.
+        """
+        record = {
+            "Document Name": document_name,
+            "Pages": len(results.pages),
+            "Extracted Text": results.all_text(),
+        }
+        self.documents_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.documents_file.flush()
+
+        if self.pages_file is not None:
+            for page_number, lines in results.pages:
+                page_record = {"Document Name": document_name, "Page": page_number, "Extracted Text": "\n".join(lines)}
+                self.pages_file.write(json.dumps(page_record, ensure_ascii=False) + "\n")
+            self.pages_file.flush()
+        self.count += 1
@@ -0,0 +1,247 @@
+# reextract.py
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from prep_env import EnvironmentPrep
+from csv_utils import CSVUtils
+from field_index import FieldIndex
+from metrics import metrics
+from result_cache import AnalysisResultCache, load_cached_result
+from row_accumulator import ColumnarAccumulator
+from utils import Logger, type_slug
+import time
+
+# Set in each worker process by _init_worker()
+_worker_state = {}
+
+
+def _init_worker(statement_types, include_tables):
+    _worker_state["statement_types"] = statement_types
+    _worker_state["include_tables"] = include_tables
+    _worker_state["csv_utils"] = CSVUtils()
+
+
+def reextract_one(cache_path, type_name=None):
+    """
+    Rebuilds the extracted data of one cached result with the current statement type configuration.
+    Runs in a worker process.
+
+    Args:
+        cache_path (str): The path to the cached result.
+        type_name (str): The statement type to extract as. Defaults to the type the document was analysed as.
+
+    Returns:
+        tuple: The statement type name, the document name and its (static info, summary info, transaction
+            columns, tables), or an error message in place of the extracted data if it could not be extracted.
+    """
+    document_name = os.path.basename(cache_path)
+    try:
+        entry, result = load_cached_result(cache_path)
+        document_name = entry["document_name"]
+        type_name = type_name or entry["type_name"]
+        statement_type = _worker_state["statement_types"].get(type_name)
+        if statement_type is None:
+            return type_name, document_name, f"statement type '{type_name}' is not in the configuration"
+
+        csv_utils = _worker_state["csv_utils"]
+        field_index = FieldIndex.project(result, statement_type, include_tables=_worker_state["include_tables"])
+        del result
+        return type_name, document_name, (
+            csv_utils.extract_static_info(field_index, document_name, statement_type),
+            csv_utils.extract_and_process_summary_info(field_index, document_name, statement_type),
+            # Amounts are converted in bulk when the output is written
+            csv_utils.process_transaction_columns(field_index, statement_type, convert_amounts=False),
+            field_index.tables,
+        )
+    except Exception as e:
+        # Reported by the parent, so one bad file does not stop the others
+        return type_name, document_name, str(e)
+
+
+def main():
+    # Start time
+    start_time = time.time()
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description='''
+        Offline Re-extraction Script
+
+        This script rebuilds the outputs of process.py from the analysis results it stored with --cache-dir, using the
+        current type_models.yaml. Nothing is sent for analysis, so a new or renamed field can be picked up for
+        thousands of documents in seconds. Results are re-extracted in parallel, and one output is written per
+        statement type (or to extracted-data when --type is given).''',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog = '''Example: python src/reextract.py -i PATH/TO/CACHE -o PATH/TO/OUTPUT'''
+        )
+
+    parser.add_argument(
+        '-i', '--input',
+        type=str,
+        required=True,
+        help='Path to the cache folder written by process.py --cache-dir'
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        help='Folder to write the outputs to. Defaults to the cache folder.'
+    )
+
+    parser.add_argument(
+        '-c', '--config_type',
+        type=str,
+        default='config/type_models.yaml',
+        help='Path to the statement types configuration YAML file'
+    )
+
+    parser.add_argument(
+        '-t', '--type',
+        type=str,
+        help='Extract every cached result as this statement type, instead of the type it was analysed as.'
+    )
+
+    parser.add_argument(
+        '-f', '--format',
+        type=str,
+        default='excel',
+        choices=['excel', *CSVUtils.output_registry],
+        help='Output format, as for process.py.'
+    )
+
+    parser.add_argument(
+        '--excel',
+        action='store_true',
+        help='When writing a columnar store, also export an Excel workbook from it.'
+    )
+
+    parser.add_argument(
+        '--tables',
+        action='store_true',
+        help='Also write the tables the model found.'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of processes re-extracting results. Defaults to the number of CPUs.'
+    )
+
+    parser.add_argument(
+        '--metrics',
+        type=str,
+        help='Write stage timings to this file at the end of the run (Prometheus textfile format if it ends in .prom, otherwise JSON).'
+    )
+
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+
+    # Set up logger
+    logger = Logger.get_logger("Reextractor", log_to_file=True)
+
+    output_folder = args.output or args.input
+    os.makedirs(output_folder, exist_ok=True)
+    output_format = args.format
+
+    # Load configuration
+    env_prep = EnvironmentPrep()
+    config = env_prep.load_statement_config(args.config_type)
+    if args.type:
+        # Fails early on an unknown statement type
+        env_prep.select_statement_type(args.type)
+    statement_types = {stype["type_name"]: stype for stype in config["statement_types"]}
+
+    cache_paths = AnalysisResultCache(args.input).paths()
+    logger.info("Re-extracting %s cached results with %s processes.", len(cache_paths), args.workers)
+
+    csv_utils = CSVUtils()
+    outputs = {}
+    failed = 0
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(statement_types, args.tables)
+    ) as executor:
+        # Small chunks keep every process busy without a round trip per document
+        chunksize = max(1, min(64, len(cache_paths) // (args.workers * 4)))
+        results = executor.map(reextract_one, cache_paths, [args.type] * len(cache_paths), chunksize=chunksize)
+        for type_name, document_name, extracted in results:
+            if isinstance(extracted, str):
+                logger.error("Error re-extracting %s: %s", document_name, extracted)
+                failed += 1
+                continue
+
+            output = outputs.setdefault(
+                type_name,
+                {"transactions": ColumnarAccumulator(), "summaries": [], "tables": [], "static_info": {}}
+            )
+            static_info, summary_info, transaction_columns, tables = extracted
+            output["static_info"] = static_info
+            output["transactions"].add_document(static_info, transaction_columns)
+            output["summaries"].append(summary_info)
+            if tables:
+                output["tables"].append((document_name, tables))
+
+    for type_name, output in outputs.items():
+        statement_type = statement_types[type_name]
+        output_name = "extracted-data" if args.type else f"extracted-data-{type_slug(type_name)}"
+        logger.info(
+            "%s: %s documents, %s transactions re-extracted.",
+            type_name,
+            len(output["summaries"]),
+            len(output["transactions"])
+        )
+
+        transactions_df = output["transactions"].to_frame()
+        if output_format == 'excel':
+            csv_utils.write_transactions_and_summaries_to_excel(
+                transactions_df,
+                output["summaries"],
+                output_folder,
+                f"{output_name}.xlsx",
+                table_data=output["tables"],
+                statement_type=statement_type,
+                static_info=output["static_info"]
+            )
+        else:
+            store_dir = csv_utils.write_transactions_and_summaries(
+                transactions_df,
+                output["summaries"],
+                output_folder,
+                output_name,
+                output_format,
+                statement_type=statement_type
+            )
+            if output["tables"]:
+                csv_utils.write_tables_to_store(output["tables"], output_folder, output_name, output_format)
+            if args.excel:
+                csv_utils.export_store_to_excel(
+                    store_dir,
+                    output_format,
+                    output_folder,
+                    f"{output_name}.xlsx",
+                    statement_type=statement_type
+                )
+
+    if failed:
+        logger.warning("%s cached results could not be re-extracted.", failed)
+
+    # end time
+    end_time = time.time()
+    # Calculate time taken and print as hh:mm:ss
+    logger.info(
+        "Time taken: %s",
+        time.strftime('%H:%M:%S', time.gmtime(end_time - start_time))
+    )
+
+    if args.metrics:
+        metrics.write(args.metrics)
+        logger.info("Stage timings written to %s.", args.metrics)
+
+if __name__ == "__main__":
+    main()
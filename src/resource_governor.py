@@ -0,0 +1,254 @@
+# src/resource_governor.py
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils import Logger, format_megabytes
+
+# Tesseract's OpenMP thread limit. Each tesseract process otherwise starts a thread per core, so
+# several of them in parallel oversubscribe the machine.
+OCR_THREAD_LIMIT_ENV = "OMP_THREAD_LIMIT"
+
+
+def pin_ocr_threads(threads=1):
+    """
+    Limits the OpenMP threads of every tesseract process started from now on, unless the limit is already set.
+
+    Args:
+        threads (int): The threads per tesseract process.
+
+    Returns:
+        str: The limit in effect.
+    """
+    return os.environ.setdefault(OCR_THREAD_LIMIT_ENV, str(threads))
+
+
+def _read_first_line(path):
+    try:
+        with open(path) as file:
+            return file.readline().strip()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """
+    Returns the number of CPUs this process may use: its CPU affinity, capped by a cgroup v2 CPU quota.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if quota and not quota.startswith("max"):
+        limit, period = quota.split()
+        cpus = min(cpus, max(1, int(int(limit) / int(period))))
+    return cpus
+
+
+def available_memory():
+    """
+    Returns the memory available to new work in bytes: MemAvailable, capped by the headroom under a
+    cgroup v2 memory limit. None where neither is reported.
+    """
+    available = None
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+
+    limit = _read_first_line("/sys/fs/cgroup/memory.max")
+    current = _read_first_line("/sys/fs/cgroup/memory.current")
+    if limit and current and limit != "max":
+        headroom = max(int(limit) - int(current), 0)
+        available = headroom if available is None else min(available, headroom)
+    return available
+
+
+def swapped_pages():
+    """
+    Returns the pages swapped in and out since boot, from /proc/vmstat, or None where it is not reported.
+    """
+    pages = None
+    try:
+        with open("/proc/vmstat") as vmstat:
+            for line in vmstat:
+                name, _, value = line.partition(" ")
+                if name in ("pswpin", "pswpout"):
+                    pages = (pages or 0) + int(value)
+    except (OSError, ValueError):
+        pass
+    return pages
+
+
+class CpuSampler:
+    """
+    Measures how busy the machine's CPUs have been since the previous sample, from /proc/stat, falling
+    back to the one-minute load average per CPU where /proc/stat is not available.
+    """
+    def __init__(self, cpus):
+        self.cpus = cpus
+        self.previous = self._read()
+
+    def _read(self):
+        line = _read_first_line("/proc/stat")
+        if not line or not line.startswith("cpu "):
+            return None
+        values = [int(value) for value in line.split()[1:]]
+        # idle + iowait
+        return values[3] + values[4], sum(values)
+
+    def sample(self):
+        """
+        Returns:
+            float: The fraction of CPU time that was busy, from 0 to 1.
+        """
+        current = self._read()
+        if current is None or self.previous is None:
+            if hasattr(os, "getloadavg"):
+                return min(os.getloadavg()[0] / self.cpus, 1.0)
+            return 0.0
+        idle = current[0] - self.previous[0]
+        total = current[1] - self.previous[1]
+        self.previous = current
+        return 1.0 - idle / total if total > 0 else 0.0
+
+    def load(self):
+        """
+        Returns:
+            float: The one-minute load average per CPU, or None where it is not reported. Above 1, more
+                threads are runnable than there are CPUs to run them.
+        """
+        if hasattr(os, "getloadavg"):
+            return os.getloadavg()[0] / self.cpus
+        return None
+
+
+class ResourceGovernor:
+    """
+    Sizes and adapts the number of PDFs split and OCR'd at once.
+
+    The starting concurrency is the number of available CPUs, capped by the available memory divided
+    by memory_per_worker, and by max_workers if given. Tesseract is pinned to ocr_threads OpenMP
+    threads, so each worker uses about one core. While the pool runs, adjust() samples the CPU and
+    memory every interval seconds: it removes a worker when free memory drops below min_free_memory,
+    the machine starts swapping, or the load per CPU exceeds max_load, and adds one back when the CPUs
+    are less than target_cpu * 0.75 busy, the load is below 1 per CPU and memory has headroom. A fully busy machine running one
+    worker per CPU has a load of about 1 per CPU, so it is left alone rather than shrunk and regrown.
+    Every change is recorded in decisions and logged.
+    """
+    def __init__(self, max_workers=None, memory_per_worker_mb=512, min_free_memory_mb=1024,
+                 target_cpu=0.9, max_load=1.25, interval=5.0, ocr_threads=1):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.ocr_thread_limit = pin_ocr_threads(ocr_threads)
+        self.cpus = available_cpus()
+        self.memory_per_worker = memory_per_worker_mb * 1024 * 1024
+        self.min_free_memory = min_free_memory_mb * 1024 * 1024
+        self.target_cpu = target_cpu
+        self.max_load = max_load
+        self.interval = interval
+        self.cpu_sampler = CpuSampler(self.cpus)
+        self.swapped = swapped_pages()
+        self.last_adjusted = time.monotonic()
+        self.decisions = []
+
+        self.ceiling = max(1, min(self.cpus, max_workers or self.cpus))
+        workers = self.ceiling
+        memory = available_memory()
+        if memory is not None:
+            workers = max(1, min(workers, int((memory - self.min_free_memory) // self.memory_per_worker)))
+        self.workers = workers
+        self._record(
+            workers,
+            f"{self.cpus} CPUs, {format_megabytes(memory)} MB available, {memory_per_worker_mb} MB per worker, "
+            f"{OCR_THREAD_LIMIT_ENV}={self.ocr_thread_limit}"
+        )
+
+    def _record(self, workers, reason):
+        self.decisions.append({"time": time.time(), "workers": workers, "reason": reason})
+        self.logger.info("Workers: %s (%s).", workers, reason)
+
+    def adjust(self):
+        """
+        Re-evaluates the concurrency, at most once per interval.
+
+        Returns:
+            int: The number of workers to run.
+        """
+        now = time.monotonic()
+        if now - self.last_adjusted < self.interval:
+            return self.workers
+        self.last_adjusted = now
+
+        busy = self.cpu_sampler.sample()
+        load = self.cpu_sampler.load()
+        memory = available_memory()
+        swapped = swapped_pages()
+        swapping = swapped - self.swapped if swapped is not None and self.swapped is not None else 0
+        self.swapped = swapped
+        workers = self.workers
+        if memory is not None and memory < self.min_free_memory and workers > 1:
+            workers -= 1
+            reason = f"{format_megabytes(memory)} MB available is below the {format_megabytes(self.min_free_memory)} MB floor"
+        elif swapping > 0 and workers > 1:
+            workers -= 1
+            reason = f"{swapping} pages swapped"
+        elif load is not None and load > self.max_load and workers > 1:
+            workers -= 1
+            reason = f"load {load:.2f} per CPU"
+        elif (
+            busy < self.target_cpu * 0.75
+            and (load is None or load < 1.0)
+            and workers < self.ceiling
+            and (memory is None or memory > self.min_free_memory + self.memory_per_worker)
+        ):
+            workers += 1
+            reason = f"CPU {busy:.0%} busy with {format_megabytes(memory)} MB available"
+        else:
+            return workers
+
+        self.workers = workers
+        self._record(workers, reason)
+        return workers
+
+    def map(self, func, items):
+        """
+        Runs func on each item with at most the governed number of calls in flight, adjusting the
+        number as calls complete.
+
+        Args:
+            func (callable): Called with one item.
+            items (iterable): The items to process.
+
+        Yields:
+            tuple: Each item and the Future holding its result, in the order they complete.
+        """
+        pending = iter(items)
+        in_flight = {}
+        exhausted = False
+        with ThreadPoolExecutor(max_workers=self.ceiling, thread_name_prefix="governed") as executor:
+            while True:
+                while not exhausted and len(in_flight) < self.workers:
+                    item = next(pending, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    in_flight[executor.submit(func, item)] = item
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, timeout=self.interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future
+                self.adjust()
+
+    def log_summary(self):
+        """
+        Logs the decisions made during the run.
+        """
+        counts = [decision["workers"] for decision in self.decisions]
+        self.logger.info(
+            "Resource governor made %s concurrency changes; workers ranged from %s to %s.",
+            len(self.decisions) - 1, min(counts), max(counts)
+        )
@@ -0,0 +1,79 @@
+# src/result_cache.py
+
+import os
+from datetime import datetime
+from job_queue import dumps, loads
+from utils import Logger, lazy_import
+
+formrecognizer = lazy_import("azure.ai.formrecognizer")
+
+# Suffix of every cached result
+CACHE_SUFFIX = ".analysis.json"
+
+
+class AnalysisResultCache:
+    """
+    A folder of serialised AnalysisResult objects, one JSON file per analysed document.
+
+    process.py --cache-dir stores each full result before it is projected, with the model and statement
+    type it was analysed for. reextract.py rebuilds outputs from the folder with the current
+    type_models.yaml, so a new or renamed field can be picked up without analysing anything again.
+    Dates in field values are tagged in the JSON (see job_queue.dumps()), so they come back as dates.
+    """
+    def __init__(self, cache_dir):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, document_name):
+        return os.path.join(self.cache_dir, os.path.splitext(document_name)[0] + CACHE_SUFFIX)
+
+    def store(self, document_name, result, model_id, type_name):
+        """
+        Writes one document's result, replacing any earlier result for the same document name.
+
+        Args:
+            document_name (str): The file name of the analysed document.
+            result (AnalysisResult): The full analysis result.
+            model_id (str): The model the document was analysed with.
+            type_name (str): The statement type the document was analysed as.
+        """
+        entry = {
+            "document_name": document_name,
+            "model_id": model_id,
+            "type_name": type_name,
+            "analysed_at": datetime.now().isoformat(timespec="seconds"),
+            "result": result.to_dict(),
+        }
+        path = self.path_for(document_name)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(dumps(entry))
+        # Readers never see a partly written file
+        os.replace(temporary_path, path)
+
+    def paths(self):
+        """
+        Returns the paths of the cached results, sorted by file name.
+        """
+        return sorted(
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(CACHE_SUFFIX)
+        )
+
+
+def load_cached_result(path):
+    """
+    Reads a cached result.
+
+    Args:
+        path (str): The path to a file written by AnalysisResultCache.store().
+
+    Returns:
+        tuple: The entry's metadata (document_name, model_id, type_name, analysed_at) and the AnalysisResult.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        entry = loads(file.read())
+    result = formrecognizer.AnalyzeResult.from_dict(entry.pop("result"))
+    return entry, result
@@ -0,0 +1,82 @@
+# src/row_accumulator.py
+
+from utils import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+class ColumnarAccumulator:
+    """
+    Accumulates extracted transactions as columns across many documents.
+
+    Transaction values are appended to one list per column, and each document's static info is
+    stored once alongside its row count. The static fields are only expanded to one value per row
+    when the DataFrame is built, as categorical columns, so a run never holds a merged dictionary
+    per transaction.
+    """
+    def __init__(self):
+        self.static_rows = []
+        self.row_counts = []
+        self.columns = {}
+        self.total_rows = 0
+
+    def __len__(self):
+        return self.total_rows
+
+    def add_document(self, static_info, transaction_columns):
+        """
+        Adds one document's transactions.
+
+        Args:
+            static_info (dict): The document's static info from CSVUtils.extract_static_info().
+            transaction_columns (dict): The document's transactions from CSVUtils.process_transaction_columns().
+        """
+        row_count = max((len(values) for values in transaction_columns.values()), default=0)
+        if row_count == 0:
+            return
+
+        for name, values in transaction_columns.items():
+            column = self.columns.get(name)
+            if column is None:
+                # Pad a column first seen part way through the run
+                column = self.columns[name] = [None] * self.total_rows
+            column.extend(values)
+
+        self.total_rows += row_count
+        self.static_rows.append(static_info)
+        self.row_counts.append(row_count)
+
+        # Pad columns this document did not provide
+        for column in self.columns.values():
+            if len(column) < self.total_rows:
+                column.extend([None] * (self.total_rows - len(column)))
+
+    def to_frame(self):
+        """
+        Builds the transactions DataFrame, with the static info columns first as in
+        {**static_info, **transaction}.
+
+        Returns:
+            pd.DataFrame: One row per transaction.
+        """
+        # Index of the owning document for every row
+        document_rows = np.repeat(np.arange(len(self.row_counts)), np.asarray(self.row_counts, dtype=np.int64))
+
+        static_names = []
+        for static_info in self.static_rows:
+            for name in static_info:
+                if name not in static_names and name not in self.columns:
+                    static_names.append(name)
+
+        data = {}
+        for name in static_names:
+            codes, categories = pd.factorize(
+                pd.Series([static_info.get(name) for static_info in self.static_rows], dtype=object)
+            )
+            data[name] = pd.Categorical.from_codes(codes[document_rows], categories=categories)
+
+        for name, values in self.columns.items():
+            data[name] = values
+
+        return pd.DataFrame(data)
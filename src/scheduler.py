@@ -0,0 +1,143 @@
+# src/scheduler.py
+
+import heapq
+import os
+import time
+from count_pdfs import PDFCounter
+from utils import Logger
+
+
+class SubmissionJob:
+    """
+    One document to submit for analysis, with its estimated latency and cost.
+    """
+    __slots__ = ('path', 'pages', 'size_bytes', 'estimated_seconds', 'estimated_cost', 'slot', 'projected_start')
+
+    def __init__(self, path, pages, size_bytes, estimated_seconds, estimated_cost):
+        self.path = path
+        self.pages = pages
+        self.size_bytes = size_bytes
+        self.estimated_seconds = estimated_seconds
+        self.estimated_cost = estimated_cost
+        self.slot = None
+        self.projected_start = None
+
+
+class SchedulePlan:
+    """
+    The submission order for a run, with its projected makespan and cost.
+
+    Attributes:
+        jobs (list): The jobs in submission order.
+        slots (int): The number of submissions in flight at once.
+        makespan_seconds (float): The projected time until the last job finishes.
+        serial_seconds (float): The projected time if the jobs ran one at a time.
+        total_pages (int): The pages submitted, which the service bills by.
+        total_cost (float): The projected cost of the run.
+    """
+    def __init__(self, jobs, slots, makespan_seconds):
+        self.jobs = jobs
+        self.slots = slots
+        self.makespan_seconds = makespan_seconds
+        self.serial_seconds = sum(job.estimated_seconds for job in jobs)
+        self.total_pages = sum(job.pages for job in jobs)
+        self.total_cost = sum(job.estimated_cost for job in jobs)
+
+    def projected_completion(self, start_time=None):
+        """
+        Returns the projected wall-clock completion time as a Unix timestamp.
+        """
+        return (start_time if start_time is not None else time.time()) + self.makespan_seconds
+
+
+class SubmissionScheduler:
+    """
+    Orders analysis submissions to minimise the makespan of a run.
+
+    The latency of each document is estimated from its page count and file size as
+    overhead_seconds + pages * seconds_per_page + megabytes * seconds_per_mb, and its cost as
+    pages * price_per_page. Documents are submitted longest first (LPT): with a fixed number of
+    submissions in flight, each slot takes the next job as it frees up, so a long statement starts
+    early instead of setting the end of the run. The projected makespan is the finish time of the
+    busiest slot under that assignment, which LPT keeps within 4/3 of the optimum.
+    """
+    def __init__(self, seconds_per_page=1.5, seconds_per_mb=0.5, overhead_seconds=3.0, price_per_page=0.05):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.seconds_per_page = seconds_per_page
+        self.seconds_per_mb = seconds_per_mb
+        self.overhead_seconds = overhead_seconds
+        self.price_per_page = price_per_page
+        self.pdf_counter = PDFCounter()
+
+    def estimate(self, pdf_path):
+        """
+        Estimates the latency and cost of analysing one document.
+
+        Args:
+            pdf_path (str): The path to the PDF document.
+
+        Returns:
+            SubmissionJob: The job, with its page count, size and estimates.
+        """
+        # PDFCounter returns 0 for unreadable files; they are still submitted, and billed as one page
+        pages = max(self.pdf_counter.count_pdf_pages(pdf_path), 1)
+        size_bytes = os.path.getsize(pdf_path)
+        estimated_seconds = (
+            self.overhead_seconds
+            + pages * self.seconds_per_page
+            + size_bytes / (1024 * 1024) * self.seconds_per_mb
+        )
+        return SubmissionJob(pdf_path, pages, size_bytes, estimated_seconds, pages * self.price_per_page)
+
+    def plan(self, pdf_paths, slots):
+        """
+        Estimates every document and orders them longest first across the slots.
+
+        Args:
+            pdf_paths (list): The paths of the documents to submit.
+            slots (int): The number of submissions in flight at once.
+
+        Returns:
+            SchedulePlan: The jobs in submission order, with their projected slot and start time.
+        """
+        jobs = sorted(
+            (self.estimate(pdf_path) for pdf_path in pdf_paths),
+            key=lambda job: (-job.estimated_seconds, job.path)
+        )
+        slots = max(1, slots)
+        # (time the slot frees up, slot number)
+        free_at = [(0.0, slot) for slot in range(slots)]
+        makespan = 0.0
+        for job in jobs:
+            start, slot = heapq.heappop(free_at)
+            job.slot = slot
+            job.projected_start = start
+            finish = start + job.estimated_seconds
+            makespan = max(makespan, finish)
+            heapq.heappush(free_at, (finish, slot))
+        return SchedulePlan(jobs, slots, makespan)
+
+    def log_plan(self, plan, start_time=None):
+        """
+        Logs the projected makespan, completion time and cost of a plan, and its longest jobs.
+        """
+        self.logger.info(
+            "Schedule: %s documents, %s pages across %s slots. Projected makespan %s (serially %s), "
+            "completion at %s. Projected cost: %.2f.",
+            len(plan.jobs),
+            plan.total_pages,
+            plan.slots,
+            time.strftime('%H:%M:%S', time.gmtime(plan.makespan_seconds)),
+            time.strftime('%H:%M:%S', time.gmtime(plan.serial_seconds)),
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(plan.projected_completion(start_time))),
+            plan.total_cost
+        )
+        for job in plan.jobs[:5]:
+            self.logger.info(
+                "  %s: %s pages, %.1f MB, ~%.0f s, slot %s.",
+                os.path.basename(job.path),
+                job.pages,
+                job.size_bytes / (1024 * 1024),
+                job.estimated_seconds,
+                job.slot + 1
+            )
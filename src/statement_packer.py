@@ -0,0 +1,177 @@
+# src/statement_packer.py
+
+import os
+from field_index import FieldIndex
+from metrics import metrics
+from utils import Logger, lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+
+class StatementPack:
+    """
+    Statements sent for analysis as one PDF.
+
+    Attributes:
+        number (int): The pack's position in the plan, from 1.
+        members (list): (path, first page, page count) per statement, with pages numbered in the packed PDF.
+    """
+    __slots__ = ('number', 'members')
+
+    def __init__(self, number, members):
+        self.number = number
+        self.members = members
+
+    @property
+    def pages(self):
+        return sum(page_count for _, _, page_count in self.members)
+
+    @property
+    def name(self):
+        """
+        The name the pack is analysed under, or the statement's own file name for a pack of one.
+        """
+        if len(self.members) == 1:
+            return os.path.basename(self.members[0][0])
+        return f"pack-{self.number} ({len(self.members)} statements, {self.pages} pages)"
+
+
+class StatementPacker:
+    """
+    Combines small statements into one submission to save the fixed request and polling latency of
+    each, and splits the result back into one result per statement.
+
+    Statements of up to small_pages pages are packed in order until a pack reaches max_pages pages or
+    max_documents statements; longer statements are sent on their own. The projection of a packed
+    result is split by page number: each statement gets the lines and tables of its own pages,
+    renumbered from 1, exactly as if it had been analysed alone.
+
+    Only page content can be split this way, so packing is for models that return pages without
+    fields, such as the layout model used by raw_process.py. A custom model returns one set of
+    fields per submission, which cannot be divided between statements.
+    """
+    def __init__(self, max_pages=50, max_documents=25, small_pages=2):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.max_pages = max_pages
+        self.max_documents = max_documents
+        self.small_pages = small_pages
+
+    def page_count(self, pdf_path):
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+
+    def plan(self, pdf_paths):
+        """
+        Groups PDFs into packs.
+
+        Args:
+            pdf_paths (list): The PDFs, in the order they should be analysed.
+
+        Returns:
+            list: The StatementPack objects. Statements that cannot be packed are in packs of one.
+        """
+        packs = []
+        current = []
+        current_pages = 0
+
+        def close():
+            if current:
+                packs.append(StatementPack(len(packs) + 1, list(current)))
+                current.clear()
+
+        for pdf_path in pdf_paths:
+            try:
+                page_count = self.page_count(pdf_path)
+            except Exception as e:
+                # Sent on its own, so the analysis reports its error against the right file
+                self.logger.error("Error reading %s, it will not be packed: %s", os.path.basename(pdf_path), e)
+                page_count = None
+
+            if page_count is None or page_count > self.small_pages:
+                packs.append(StatementPack(len(packs) + 1, [(pdf_path, 1, page_count or 0)]))
+                continue
+            if current_pages + page_count > self.max_pages or len(current) >= self.max_documents:
+                close()
+                current_pages = 0
+            current.append((pdf_path, current_pages + 1, page_count))
+            current_pages += page_count
+        close()
+
+        packed = sum(len(pack.members) for pack in packs if len(pack.members) > 1)
+        self.logger.info(
+            "%s documents planned as %s submissions (%s statements packed).",
+            len(pdf_paths), len(packs), packed
+        )
+        return packs
+
+    def build(self, pack):
+        """
+        Builds the packed PDF in memory.
+
+        Returns:
+            bytes: The statements' pages in pack order, or None for a pack of one, which is sent from its file.
+        """
+        if len(pack.members) == 1:
+            return None
+        with metrics.stage("pack_build"):
+            packed = fitz.open()
+            try:
+                for pdf_path, _, _ in pack.members:
+                    with fitz.open(pdf_path) as doc:
+                        packed.insert_pdf(doc)
+                return packed.tobytes(garbage=1, deflate=True)
+            finally:
+                packed.close()
+
+    def split(self, pack, results):
+        """
+        Splits the projection of a packed result into one projection per statement.
+
+        Args:
+            pack (StatementPack): The pack that was analysed.
+            results (FieldIndex): The projection of the packed result, with pages (and optionally tables).
+
+        Returns:
+            list: (path, FieldIndex) per statement, in pack order.
+
+        Raises:
+            ValueError: If the result holds fields, which cannot be divided between statements.
+        """
+        if len(pack.members) == 1:
+            return [(pack.members[0][0], results)]
+        if results.fields:
+            raise ValueError("a packed result with fields cannot be split into statements")
+
+        split = []
+        for pdf_path, first_page, page_count in pack.members:
+            last_page = first_page + page_count - 1
+            offset = first_page - 1
+            pages = tuple(
+                (page_number - offset, lines)
+                for page_number, lines in results.pages
+                if first_page <= page_number <= last_page
+            )
+            tables = []
+            for table in results.tables:
+                if table.pages and first_page <= table.pages[0] <= last_page:
+                    table.pages = [page_number - offset for page_number in table.pages]
+                    tables.append(table)
+            split.append((pdf_path, FieldIndex(pages=pages, tables=tuple(tables))))
+        return split
+
+    def compare(self, packed, single):
+        """
+        Compares a statement's projection from a packed result with its projection analysed alone.
+
+        Returns:
+            list: One message per difference; empty if the page text matches.
+        """
+        differences = []
+        if len(packed.pages) != len(single.pages):
+            differences.append(f"{len(packed.pages)} pages packed, {len(single.pages)} alone")
+        for (page_number, packed_lines), (_, single_lines) in zip(packed.pages, single.pages):
+            if packed_lines != single_lines:
+                changed = sum(1 for a, b in zip(packed_lines, single_lines) if a != b)
+                changed += abs(len(packed_lines) - len(single_lines))
+                differences.append(f"page {page_number}: {changed} lines differ")
+        return differences
@@ -0,0 +1,256 @@
+# src/synthetic_results.py
+
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+# REST API version spoken by azure-ai-formrecognizer 3.3 (DocumentAnalysisClient)
+API_VERSION = "2023-07-31"
+
+# A4 page in inches, as reported by the service for PDFs
+PAGE_WIDTH = 8.2639
+PAGE_HEIGHT = 11.6806
+LINE_HEIGHT = 0.18
+LINES_PER_PAGE = 55
+
+# Key holding the typed value of a REST field, by field type
+VALUE_KEYS = {
+    "string": "valueString",
+    "number": "valueNumber",
+    "integer": "valueInteger",
+    "date": "valueDate",
+    "time": "valueTime",
+    "phoneNumber": "valuePhoneNumber",
+    "currency": "valueCurrency",
+    "selectionMark": "valueSelectionMark",
+    "countryRegion": "valueCountryRegion",
+    "signature": "valueSignature",
+    "address": "valueAddress",
+    "boolean": "valueBoolean",
+}
+
+
+class SyntheticResultBuilder:
+    """
+    Builds AnalyzeResult payloads, in the REST format returned by the Document Intelligence
+    service, for a statement type from type_models.yaml.
+
+    Static and summary fields, and a transaction list of any size, are generated from the
+    field configuration: is_amount fields get amounts such as "1,234.56" or "45.10-", and is_date
+    fields get dates in their date_format. The text of every field is also laid out as page lines,
+    so the same payload serves process.py (documents) and raw_process.py (pages).
+    """
+    def __init__(self, statement_type, model_id, seed=None):
+        self.statement_type = statement_type
+        self.model_id = model_id
+        self.random = random.Random(seed)
+
+    def build(self, transactions=50, pages=None, page_lines=None):
+        """
+        Builds one AnalyzeResult payload.
+
+        Args:
+            transactions (int): The number of transactions to generate.
+            pages (int): The number of pages to spread the lines over. Defaults to as many as the lines need.
+            page_lines (list): The text lines of each page, e.g. read from the submitted PDF, used instead of
+                generated lines by read and layout models. Sets the number of pages.
+
+        Returns:
+            dict: The analyzeResult payload.
+        """
+        self._lines = []
+        self._fields = []
+        statement_date = date(2023, 1, 1) + timedelta(days=self.random.randrange(365))
+
+        fields = {}
+        for section in ('transaction_static_fields', 'summary_fields'):
+            for field in self.statement_type.get(section) or []:
+                fields[field['field_name']] = self._build_field(field, statement_date)
+
+        dynamic_fields = self.statement_type.get('transaction_dynamic_fields') or []
+        if dynamic_fields:
+            list_field = self.statement_type.get('transaction_list_field') or 'Transactions'
+            items = []
+            for i in range(transactions):
+                transaction_date = statement_date - timedelta(days=self.random.randrange(28))
+                value_object = {
+                    field['field_name']: self._build_field(field, transaction_date, index=i)
+                    for field in dynamic_fields
+                }
+                items.append({"type": "object", "valueObject": value_object, "confidence": 0.9})
+            fields[list_field] = {"type": "array", "valueArray": items}
+        elif page_lines is not None and not fields:
+            # Read and layout models return the document's own text
+            for lines in page_lines:
+                self._lines.extend(lines)
+        else:
+            # Read and layout models have no fields, so generate plain text lines instead
+            self._lines.extend(f"Synthetic line {i + 1} {self.random.randrange(100000, 999999)}" for i in range(transactions))
+
+        if page_lines is not None and not dynamic_fields and not fields:
+            content, page_payloads = self._layout_pages(len(page_lines), [len(lines) for lines in page_lines])
+        else:
+            page_count = max(pages or 1, -(-len(self._lines) // LINES_PER_PAGE))
+            content, page_payloads = self._layout_pages(page_count)
+
+        return {
+            "apiVersion": API_VERSION,
+            "modelId": self.model_id,
+            "stringIndexType": "utf16CodeUnit",
+            "content": content,
+            "pages": page_payloads,
+            "tables": [],
+            "styles": [],
+            "documents": [{
+                "docType": self.model_id,
+                "boundingRegions": [
+                    {"pageNumber": page["pageNumber"], "polygon": [0, 0, PAGE_WIDTH, 0, PAGE_WIDTH, PAGE_HEIGHT, 0, PAGE_HEIGHT]}
+                    for page in page_payloads
+                ],
+                "fields": fields,
+                "confidence": 0.95,
+                "spans": [{"offset": 0, "length": len(content)}],
+            }],
+        }
+
+    def _build_field(self, field_config, value_date, index=None):
+        """
+        Builds one string field, recording its text as a line so it can be placed on a page.
+        """
+        field_name = field_config['field_name']
+        if field_config.get('is_amount'):
+            amount = self.random.uniform(0, 5000)
+            text = f"{amount:,.2f}"
+            if self.random.random() < 0.2:
+                text += "-"
+        elif field_config.get('is_date'):
+            text = value_date.strftime(field_config.get('date_format') or "%d/%m/%Y")
+        elif index is not None:
+            text = f"{field_name} {index + 1}"
+        else:
+            text = f"{field_name} {self.random.randrange(100000, 999999)}"
+
+        line_number = len(self._lines)
+        self._lines.append(text)
+        field = {
+            "type": "string",
+            "valueString": text,
+            "content": text,
+            "confidence": round(self.random.uniform(0.8, 1.0), 3),
+            # Placeholders; page number, polygon and offset are set once the lines are laid out
+            "boundingRegions": [{"pageNumber": 1, "polygon": [], "_line": line_number}],
+            "spans": [{"offset": 0, "length": len(text), "_line": line_number}],
+        }
+        self._fields.append(field)
+        return field
+
+    def _layout_pages(self, page_count, page_sizes=None):
+        """
+        Places the recorded lines on pages and resolves the placeholders on every field.
+        The lines are spread evenly over the pages unless page_sizes gives the number of lines on each.
+        """
+        if page_sizes is None:
+            lines_per_page = max(1, -(-len(self._lines) // page_count))
+            page_sizes = [lines_per_page] * page_count
+        content_parts = []
+        offset = 0
+        placements = []
+        pages = []
+        first_line = 0
+
+        for page_index in range(page_count):
+            page_lines = []
+            page_offset = offset
+            page_text = self._lines[first_line:first_line + page_sizes[page_index]]
+            first_line += page_sizes[page_index]
+            for row, text in enumerate(page_text):
+                top = 0.5 + row * LINE_HEIGHT
+                polygon = [0.5, top, 0.5 + 0.08 * len(text), top, 0.5 + 0.08 * len(text), top + LINE_HEIGHT, 0.5, top + LINE_HEIGHT]
+                page_lines.append({"content": text, "polygon": polygon, "spans": [{"offset": offset, "length": len(text)}]})
+                placements.append((page_index + 1, polygon, offset))
+                content_parts.append(text)
+                offset += len(text) + 1
+            pages.append({
+                "pageNumber": page_index + 1,
+                "angle": 0,
+                "width": PAGE_WIDTH,
+                "height": PAGE_HEIGHT,
+                "unit": "inch",
+                "words": [],
+                "lines": page_lines,
+                "spans": [{"offset": page_offset, "length": max(offset - page_offset - 1, 0)}],
+            })
+
+        self._resolve_placeholders(placements)
+        return "\n".join(content_parts), pages
+
+    def _resolve_placeholders(self, placements):
+        """
+        Sets the page number, polygon and offset of every field from the line it was placed on.
+        """
+        for field in self._fields:
+            region = field["boundingRegions"][0]
+            span = field["spans"][0]
+            page_number, polygon, offset = placements[region.pop("_line")]
+            del span["_line"]
+            region["pageNumber"] = page_number
+            region["polygon"] = polygon
+            span["offset"] = offset
+
+
+def to_analysis_result(payload):
+    """
+    Wraps an analyzeResult payload in lightweight objects shaped like the SDK's AnalysisResult.
+
+    Only the attributes read by this project are provided (documents, fields, pages and lines),
+    so extraction can be benchmarked or replayed without the Azure SDK.
+
+    Args:
+        payload (dict): The analyzeResult payload, e.g. from SyntheticResultBuilder.build().
+
+    Returns:
+        SimpleNamespace: An object with the same attribute names as AnalysisResult.
+    """
+    def region(data):
+        return SimpleNamespace(page_number=data.get("pageNumber"), polygon=data.get("polygon"))
+
+    def field(data):
+        value_type = data.get("type")
+        if value_type == "array":
+            value = [field(item) for item in data.get("valueArray") or []]
+        elif value_type == "object":
+            value = {name: field(item) for name, item in (data.get("valueObject") or {}).items()}
+        else:
+            value = data.get(VALUE_KEYS.get(value_type, "valueString"))
+        return SimpleNamespace(
+            value_type=value_type,
+            value=value,
+            content=data.get("content"),
+            confidence=data.get("confidence"),
+            bounding_regions=[region(item) for item in data.get("boundingRegions") or []],
+        )
+
+    return SimpleNamespace(
+        model_id=payload.get("modelId"),
+        content=payload.get("content"),
+        pages=[
+            SimpleNamespace(
+                page_number=page.get("pageNumber"),
+                width=page.get("width"),
+                height=page.get("height"),
+                unit=page.get("unit"),
+                lines=[SimpleNamespace(content=line.get("content"), polygon=line.get("polygon")) for line in page.get("lines") or []],
+            )
+            for page in payload.get("pages") or []
+        ],
+        documents=[
+            SimpleNamespace(
+                doc_type=document.get("docType"),
+                confidence=document.get("confidence"),
+                bounding_regions=[region(item) for item in document.get("boundingRegions") or []],
+                fields={name: field(item) for name, item in (document.get("fields") or {}).items()},
+            )
+            for document in payload.get("documents") or []
+        ],
+        tables=[],
+    )
@@ -0,0 +1,171 @@
+# src/table_utils.py
+
+from utils import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Cell kind the analysis service gives to column header cells
+COLUMN_HEADER_KIND = "columnHeader"
+
+
+class MaterialisedTable:
+    """
+    A table from an analysis result as a dense grid, with tables that continue across pages stitched
+    into one.
+
+    Attributes:
+        index (int): The position of the table's first part in results.tables.
+        pages (list): The page numbers the table spans.
+        header (list): One name per column, from the column header rows.
+        rows (np.ndarray): The body cells as a (rows, columns) array of strings. Missing cells are empty.
+    """
+    __slots__ = ('index', 'pages', 'header', 'rows')
+
+    def __init__(self, index, pages, header, rows):
+        self.index = index
+        self.pages = pages
+        self.header = header
+        self.rows = rows
+
+    @property
+    def page_label(self):
+        """
+        The page or page range of the table, e.g. '3' or '3-5'.
+        """
+        if not self.pages:
+            return ""
+        first, last = self.pages[0], self.pages[-1]
+        return str(first) if first == last else f"{first}-{last}"
+
+    def to_frame(self):
+        """
+        Returns:
+            pd.DataFrame: The table body with the header as column names.
+        """
+        return pd.DataFrame(self.rows, columns=self.header)
+
+
+class TableMaterialiser:
+    """
+    Turns the tables of an analysis result into dense grids.
+
+    Each cell is placed by its row_index and column_index with one array assignment, instead of
+    sorting the cells and building ragged rows. A cell spanning several rows or columns fills every
+    grid position it covers, and positions no cell covers are left empty, so every row has one value
+    per column. Rows at the top of a table made of column header cells become the column names.
+    A table that starts on the page after the previous table ends, with the same number of columns
+    and either the same header or none, is treated as its continuation and stitched onto it.
+    """
+    def to_grid(self, table):
+        """
+        Builds the dense grid of one table.
+
+        Args:
+            table (DocumentTable): A table from AnalysisResult.tables.
+
+        Returns:
+            tuple: The (row_count, column_count) array of cell contents, and the number of header rows.
+        """
+        cells = table.cells or []
+        count = len(cells)
+        rows = np.fromiter((cell.row_index for cell in cells), dtype=np.int64, count=count)
+        columns = np.fromiter((cell.column_index for cell in cells), dtype=np.int64, count=count)
+        row_spans = np.fromiter((cell.row_span or 1 for cell in cells), dtype=np.int64, count=count)
+        column_spans = np.fromiter((cell.column_span or 1 for cell in cells), dtype=np.int64, count=count)
+        contents = np.array([cell.content or "" for cell in cells], dtype=object)
+        is_header = np.fromiter((cell.kind == COLUMN_HEADER_KIND for cell in cells), dtype=bool, count=count)
+
+        row_count = max(table.row_count or 0, int((rows + row_spans).max()) if count else 0)
+        column_count = max(table.column_count or 0, int((columns + column_spans).max()) if count else 0)
+        grid = np.full((row_count, column_count), "", dtype=object)
+        grid[rows, columns] = contents
+
+        # Only the few spanning cells need filling one by one
+        for i in np.flatnonzero((row_spans > 1) | (column_spans > 1)):
+            grid[rows[i]:rows[i] + row_spans[i], columns[i]:columns[i] + column_spans[i]] = contents[i]
+
+        header_rows = 0
+        if is_header.any():
+            # Header rows are the rows from the top down to the last row a header cell covers
+            header_rows = int((rows[is_header] + row_spans[is_header]).max())
+        return grid, header_rows
+
+    def column_names(self, grid, header_rows):
+        """
+        Names each column by joining its distinct header cells from the top, e.g. "Amount Debit" under a
+        spanning "Amount" header. Columns without a header are named "Column <n>", and repeated names
+        are numbered.
+        """
+        names = []
+        seen = {}
+        for column in range(grid.shape[1]):
+            parts = []
+            for value in grid[:header_rows, column]:
+                if value and value not in parts:
+                    parts.append(value)
+            name = " ".join(parts) or f"Column {column + 1}"
+            seen[name] = seen.get(name, 0) + 1
+            names.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+        return names
+
+    def materialise(self, results):
+        """
+        Builds every table of an analysis result, stitching tables that continue across pages.
+
+        Args:
+            results (AnalysisResult): The analysis result, from the layout model or a custom model.
+
+        Returns:
+            list: The MaterialisedTable objects, in document order.
+        """
+        tables = []
+        for index, table in enumerate(results.tables or []):
+            grid, header_rows = self.to_grid(table)
+            pages = sorted({region.page_number for region in table.bounding_regions or []})
+            header = self.column_names(grid, header_rows)
+            body = grid[header_rows:]
+
+            previous = tables[-1] if tables else None
+            if (
+                previous is not None
+                and pages and previous.pages
+                and pages[0] == previous.pages[-1] + 1
+                and len(header) == len(previous.header)
+                and (header_rows == 0 or header == previous.header)
+            ):
+                previous.rows = np.concatenate([previous.rows, body])
+                previous.pages.extend(pages)
+                continue
+
+            tables.append(MaterialisedTable(index, pages, header, body))
+        return tables
+
+    def to_long_frame(self, document_tables):
+        """
+        Flattens the tables of many documents into one frame with a row per cell, so tables with
+        different columns can be written together to one columnar table.
+
+        Args:
+            document_tables (iterable): (document name, list of MaterialisedTable) pairs.
+
+        Returns:
+            pd.DataFrame: The columns Document Name, Table, Pages, Row, Column and Value.
+        """
+        parts = {name: [] for name in ("Document Name", "Table", "Pages", "Row", "Column", "Value")}
+        for document_name, tables in document_tables:
+            for number, table in enumerate(tables, start=1):
+                row_count, column_count = table.rows.shape
+                size = row_count * column_count
+                if size == 0:
+                    continue
+                parts["Document Name"].append(np.full(size, document_name, dtype=object))
+                parts["Table"].append(np.full(size, number, dtype=np.int64))
+                parts["Pages"].append(np.full(size, table.page_label, dtype=object))
+                parts["Row"].append(np.repeat(np.arange(1, row_count + 1), column_count))
+                parts["Column"].append(np.tile(np.asarray(table.header, dtype=object), row_count))
+                parts["Value"].append(table.rows.ravel())
+
+        if not parts["Value"]:
+            return pd.DataFrame(columns=list(parts))
+        return pd.DataFrame({name: np.concatenate(arrays) for name, arrays in parts.items()})
@@ -0,0 +1,68 @@
+# src/text_router.py
+
+import os
+from field_index import FieldIndex
+from utils import Logger
+
+
+class TextRouter:
+    """
+    Extracts the text of a document locally where it can, and from the analysis service where it must.
+
+    Pages whose text layer passes the machine-readable check of PDFProcessor are read with PyMuPDF.
+    The scanned pages alone are copied into a smaller PDF and sent to the service, and its pages are
+    mapped back to their original page numbers, so the combined text keeps the document's page and
+    line order. A document with no scanned pages is never sent, and one with only scanned pages is
+    sent unchanged.
+    """
+    def __init__(self, pdf_processor, doc_ai_utils, client, model_id, statement_type, min_chars=20):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.pdf_processor = pdf_processor
+        self.doc_ai_utils = doc_ai_utils
+        self.client = client
+        self.model_id = model_id
+        self.statement_type = statement_type
+        self.min_chars = min_chars
+        self.counts = {"local_pages": 0, "service_pages": 0, "service_documents": 0}
+
+    def extract(self, document_path):
+        """
+        Extracts the text of every page of a document.
+
+        Args:
+            document_path (str): The path to the PDF.
+
+        Returns:
+            FieldIndex: A projection holding the text lines of each page, as analyse_and_project() returns
+                with include_text=True, or None if the scanned pages could not be analysed.
+        """
+        pages = self.pdf_processor.read_text_layer(document_path, min_chars=self.min_chars)
+        scanned = [page_number for page_number, lines in pages if lines is None]
+
+        service_lines = {}
+        if scanned:
+            document_bytes = None
+            if len(scanned) < len(pages):
+                document_bytes = self.pdf_processor.extract_pages(document_path, scanned)
+            projection = self.doc_ai_utils.analyse_and_project(
+                self.client, self.model_id, document_path, self.statement_type,
+                include_text=True, document_bytes=document_bytes
+            )
+            if projection is None:
+                return None
+            # The service numbers the pages of the PDF it was sent from 1
+            service_lines = {scanned[page_number - 1]: lines for page_number, lines in projection.pages}
+            self.counts["service_documents"] += 1
+
+        self.counts["local_pages"] += len(pages) - len(scanned)
+        self.counts["service_pages"] += len(scanned)
+        self.logger.info(
+            "%s: %s pages read locally, %s sent for analysis.",
+            os.path.basename(document_path),
+            len(pages) - len(scanned),
+            len(scanned)
+        )
+        return FieldIndex(pages=tuple(
+            (page_number, tuple(lines) if lines is not None else service_lines.get(page_number, ()))
+            for page_number, lines in pages
+        ))
@@ -0,0 +1,153 @@
+# src/type_resolver.py
+
+import csv
+import os
+import re
+from utils import Logger, lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+# Written by preprocess.py to the split-files folder, one row per split document
+SPLIT_MANIFEST_FILENAME = "split-manifest.csv"
+SPLIT_MANIFEST_COLUMNS = ["File Name", "Statement Type", "Source File"]
+
+
+class StatementTypeResolver:
+    """
+    Works out the statement type of each PDF in a folder of mixed statements.
+
+    A file's type is taken from the split manifest preprocess.py writes next to the split documents.
+    Files not in the manifest can be detected from the header and footer of their first page, where
+    statements print the issuer's name, legal entity and ABN: each candidate statement type's
+    detect_pattern in type_models.yaml is tried, and the file is given the type only if exactly one
+    pattern matches. A candidate without a detect_pattern could be any file, so while there is one, no
+    match is conclusive. Files whose type is still unknown are left for a later run with -t.
+    """
+    def __init__(self, statement_types, pdf_processor=None, detect_types=None):
+        """
+        Args:
+            statement_types (list): The statement types from type_models.yaml.
+            pdf_processor (PDFProcessor): Used to read the first page, with OCR if it has no text layer.
+            detect_types (list): The statement types the folder can hold. Defaults to every type with
+                summary or transaction fields.
+        """
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.statement_types = {stype["type_name"]: stype for stype in statement_types}
+        self.pdf_processor = pdf_processor
+
+        if detect_types:
+            unknown = [type_name for type_name in detect_types if type_name not in self.statement_types]
+            if unknown:
+                raise ValueError(f"Statement types not found in configuration: {', '.join(unknown)}.")
+            candidates = [self.statement_types[type_name] for type_name in detect_types]
+        else:
+            candidates = [
+                stype for stype in statement_types
+                if stype.get("summary_fields") or stype.get("transaction_dynamic_fields")
+            ]
+        self.detect_patterns = [
+            (stype["type_name"], re.compile(stype["detect_pattern"], flags=re.IGNORECASE | re.UNICODE))
+            for stype in candidates
+            if stype.get("detect_pattern")
+        ]
+        self.undetectable = [stype["type_name"] for stype in candidates if not stype.get("detect_pattern")]
+
+    def read_manifest(self, manifest_path):
+        """
+        Reads a split manifest.
+
+        Args:
+            manifest_path (str): The path to split-manifest.csv.
+
+        Returns:
+            dict: The statement type name of each file name in the manifest. Empty if there is no manifest.
+        """
+        if not os.path.isfile(manifest_path):
+            return {}
+        with open(manifest_path, "r", newline="") as file:
+            return {row["File Name"]: row["Statement Type"] for row in csv.DictReader(file)}
+
+    def issuer_text(self, pdf_path):
+        """
+        Returns the header and footer text of a PDF's first page (see PDFProcessor.extract_issuer_text()).
+        """
+        if self.pdf_processor is None:
+            from pdf_processor import PDFProcessor
+            self.pdf_processor = PDFProcessor()
+        with fitz.open(pdf_path) as doc:
+            if doc.page_count == 0:
+                return ""
+            return self.pdf_processor.extract_issuer_text(doc.load_page(0))
+
+    def detect(self, pdf_path):
+        """
+        Detects a PDF's statement type from the header and footer of its first page.
+
+        Returns:
+            str: The statement type name, or None if no pattern matches, more than one matches, or a
+                candidate type has no detect_pattern and so cannot be ruled out.
+        """
+        text = self.issuer_text(pdf_path)
+        matches = [type_name for type_name, pattern in self.detect_patterns if pattern.search(text)]
+        if len(matches) == 1 and not self.undetectable:
+            return matches[0]
+        if len(matches) > 1:
+            self.logger.warning(
+                "%s matches several statement types (%s) and was not assigned one.",
+                os.path.basename(pdf_path), ", ".join(matches)
+            )
+        elif matches:
+            # resolve() has already warned about the types without a detect_pattern
+            self.logger.debug(
+                "%s matches %s, but was not assigned it as types without a detect_pattern cannot be ruled out.",
+                os.path.basename(pdf_path), matches[0]
+            )
+        return None
+
+    def resolve(self, pdf_paths, manifest_path=None, detect=False):
+        """
+        Assigns a statement type to each PDF.
+
+        Args:
+            pdf_paths (list): The PDFs.
+            manifest_path (str): The split manifest to read types from, if any.
+            detect (bool): Whether to detect the type of files not in the manifest.
+
+        Returns:
+            tuple: A dictionary from each statement type name to its PDFs, and the list of PDFs without a type.
+        """
+        manifest = self.read_manifest(manifest_path) if manifest_path else {}
+        if detect and self.undetectable:
+            self.logger.warning(
+                "No file will be detected while these statement types have no detect_pattern: %s. "
+                "Add one to each, or limit detection to the types the folder holds.",
+                ", ".join(self.undetectable)
+            )
+        by_type = {}
+        unresolved = []
+        for pdf_path in pdf_paths:
+            type_name = manifest.get(os.path.basename(pdf_path))
+            if type_name is None and detect:
+                try:
+                    type_name = self.detect(pdf_path)
+                except Exception as e:
+                    self.logger.error("Error detecting the type of %s: %s", os.path.basename(pdf_path), e)
+            if type_name is not None and type_name not in self.statement_types:
+                self.logger.error(
+                    "%s has statement type '%s', which is not in the configuration.",
+                    os.path.basename(pdf_path), type_name
+                )
+                type_name = None
+            if type_name is None:
+                unresolved.append(pdf_path)
+            else:
+                by_type.setdefault(type_name, []).append(pdf_path)
+
+        for type_name, paths in by_type.items():
+            self.logger.info("%s: %s documents.", type_name, len(paths))
+        if unresolved:
+            self.logger.warning(
+                "%s documents have no statement type and will be left in the input folder.",
+                len(unresolved)
+            )
+        return by_type, unresolved
@@ -0,0 +1,153 @@
+# src/upload_optimiser.py
+
+import os
+import threading
+from metrics import metrics
+from utils import Logger, format_megabytes, lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+
+class UploadOptimiser:
+    """
+    Shrinks PDFs in memory before they are sent for analysis.
+
+    Embedded images displayed at more than dpi are downsampled to dpi and re-encoded as JPEG at
+    jpeg_quality. Bilevel images, which scanners already store compactly, and images with a
+    transparency mask are left alone, as is any image the re-encoding would not make smaller. The
+    document metadata is removed, and the PDF is rewritten without unused or duplicate objects.
+
+    The optimised PDF is only used if its page count matches the original and it is at least
+    min_saving smaller; otherwise the original is sent. The original file is never modified, so it
+    is still moved to analysed-files for audit. PyMuPDF is not thread safe, so documents are
+    optimised one at a time when analysis runs in parallel.
+    """
+    def __init__(self, dpi=150, jpeg_quality=75, min_saving=0.1, upload_mbps=20.0):
+        self.logger = Logger.get_logger(self.__class__.__name__, log_to_file=True)
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.min_saving = min_saving
+        self.upload_mbps = upload_mbps
+        self.lock = threading.Lock()
+        self.totals = {"documents": 0, "optimised": 0, "images": 0, "original_bytes": 0, "upload_bytes": 0}
+
+    def display_dpi(self, page, xref, width):
+        """
+        Returns the lowest resolution at which an image is drawn on a page, or None if it is not drawn.
+        """
+        rects = [rect for rect in page.get_image_rects(xref) if rect.width > 0]
+        if not rects:
+            return None
+        # The largest placement needs the most pixels, so it sets the resolution to keep
+        return width / (max(rect.width for rect in rects) / 72)
+
+    def downsample_image(self, doc, page, image):
+        """
+        Replaces one image with a downsampled JPEG if that makes it smaller.
+
+        Args:
+            doc (fitz.Document): The open document.
+            page (fitz.Page): A page the image is drawn on.
+            image (tuple): The image's entry from page.get_images(full=True).
+
+        Returns:
+            bool: True if the image was replaced.
+        """
+        xref, smask, width, height, bits_per_component = image[:5]
+        if smask or bits_per_component == 1:
+            return False
+        dpi = self.display_dpi(page, xref, width)
+        if dpi is None or dpi <= self.dpi:
+            return False
+
+        scale = self.dpi / dpi
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.n > 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        pix = fitz.Pixmap(pix, max(1, round(width * scale)), max(1, round(height * scale)), None)
+        stream = pix.tobytes("jpeg", jpg_quality=self.jpeg_quality)
+
+        if len(stream) >= len(doc.xref_stream_raw(xref)):
+            return False
+        page.replace_image(xref, stream=stream)
+        return True
+
+    @metrics.timed("upload_optimise")
+    def optimise(self, pdf_path):
+        """
+        Builds the optimised upload of one PDF.
+
+        Args:
+            pdf_path (str): The path to the PDF.
+
+        Returns:
+            bytes: The optimised PDF, or None if the original should be sent.
+        """
+        original_bytes = os.path.getsize(pdf_path)
+        with self.lock:
+            try:
+                with fitz.open(pdf_path) as doc:
+                    page_count = doc.page_count
+                    replaced = set()
+                    for page in doc:
+                        for image in page.get_images(full=True):
+                            if image[0] not in replaced and self.downsample_image(doc, page, image):
+                                replaced.add(image[0])
+                    doc.set_metadata({})
+                    doc.del_xml_metadata()
+                    document_bytes = doc.tobytes(garbage=4, deflate=True, clean=True)
+
+                with fitz.open(stream=document_bytes, filetype="pdf") as optimised:
+                    if optimised.page_count != page_count:
+                        raise ValueError(f"optimised copy has {optimised.page_count} pages, expected {page_count}")
+            except Exception as e:
+                self.logger.error("Error optimising %s, sending the original: %s", os.path.basename(pdf_path), e)
+                document_bytes = None
+                replaced = ()
+
+            if document_bytes is not None and len(document_bytes) > original_bytes * (1 - self.min_saving):
+                document_bytes = None
+
+            upload_bytes = original_bytes if document_bytes is None else len(document_bytes)
+            self.totals["documents"] += 1
+            self.totals["original_bytes"] += original_bytes
+            self.totals["upload_bytes"] += upload_bytes
+            if document_bytes is not None:
+                self.totals["optimised"] += 1
+                self.totals["images"] += len(replaced)
+
+        self.logger.info(
+            "%s: %s MB uploaded of %s MB (%s images downsampled).",
+            os.path.basename(pdf_path),
+            format_megabytes(upload_bytes),
+            format_megabytes(original_bytes),
+            len(replaced) if document_bytes is not None else 0
+        )
+        return document_bytes
+
+    def transfer_seconds(self, num_bytes):
+        """
+        Returns the time to upload num_bytes at upload_mbps megabits per second.
+        """
+        return num_bytes * 8 / (self.upload_mbps * 1_000_000)
+
+    def log_summary(self):
+        """
+        Logs the bytes saved over the run and the upload time they save at upload_mbps.
+        """
+        totals = self.totals
+        saved = totals["original_bytes"] - totals["upload_bytes"]
+        self.logger.info(
+            "Upload optimisation: %s of %s documents optimised, %s images downsampled. "
+            "%s MB uploaded of %s MB (%.0f%% saved), about %.1f s less upload time at %s Mbit/s.",
+            totals["optimised"],
+            totals["documents"],
+            totals["images"],
+            format_megabytes(totals["upload_bytes"]),
+            format_megabytes(totals["original_bytes"]),
+            100 * saved / totals["original_bytes"] if totals["original_bytes"] else 0,
+            self.transfer_seconds(saved),
+            self.upload_mbps
+        )
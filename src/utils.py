@@ -1,52 +1,234 @@
 # src/utils.py
+import atexit
+import importlib
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import sys
+import threading
 from datetime import datetime
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
 
+# Level used when get_logger() is not given one, e.g. LOG_LEVEL=DEBUG
+LOG_LEVEL_ENV = "LOG_LEVEL"
+# Set to "json" to write the run log as JSON lines
+LOG_FORMAT_ENV = "LOG_FORMAT"
+# Folder of the run logs, e.g. LOG_DIR=/var/log/pdf-processor. Defaults to logs/ in the repository root,
+# wherever the script is run from
+LOG_DIR_ENV = "LOG_DIR"
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is used, then imports it.
+
+    Heavy dependencies (pandas, PyMuPDF, pyarrow, the Azure SDK) are bound with lazy_import() so that
+    importing a module of this project, or running a script with -h, does not pay for them.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Returns a stand-in for a module that is imported on first use.
+
+    Args:
+        name (str): The module name, e.g. 'pandas' or 'pyarrow.parquet'.
+
+    Returns:
+        LazyModule: The stand-in for the module.
+    """
+    return LazyModule(name)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line.
+    """
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
 
 
 class Logger:
+    """
+    Hands out loggers that share one background writer.
+
+    Every logger puts its records on a queue through a QueueHandler, so logging never blocks on console or
+    file I/O. A QueueListener thread writes them to the console and, once any logger asks for log_to_file,
+    to a single timestamped run log under logs/. Messages below a logger's level are dropped before they
+    are formatted, so debug messages cost a level check when LOG_LEVEL is INFO or higher.
+    """
+    _lock = threading.Lock()
+    # Shared by every logger for the life of the process, so the listener can be restarted
+    _queue = queue.SimpleQueue()
+    _listener = None
+    _run_log = None
+
     @staticmethod
-    def get_logger(name, level=logging.DEBUG, log_to_file=False, log_file=None):
+    def get_logger(name, level=None, log_to_file=False, log_file=None):
         """
         Returns a logger instance for the specified name.
         
         :param name: Name for the logger (typically the class name)
-        :param level: Logging level (default: DEBUG)
-        :param log_to_file: If True, log messages will also be saved to a file (default: False)
-        :param log_file: File to log messages if log_to_file is True (default: 'app.log')
+        :param level: Logging level (default: the LOG_LEVEL environment variable, or INFO)
+        :param log_to_file: If True, log messages will also be saved to the run log (default: False)
+        :param log_file: Path of the run log, if it has not been opened yet (default: '<LOG_DIR>/<timestamp>.log')
         :return: Configured logger
         """
+        if level is None:
+            level = os.getenv(LOG_LEVEL_ENV, "INFO").upper()
+
         logger = logging.getLogger(name)
         logger.setLevel(level)
 
-        if not logger.hasHandlers():
-            # Create console handler
-            ch = logging.StreamHandler()
-            ch.setLevel(level)
+        with Logger._lock:
+            Logger._start_listener()
+            if log_to_file:
+                Logger._open_run_log(log_file)
+            if not logger.handlers:
+                logger.addHandler(logging.handlers.QueueHandler(Logger._queue))
+                # Records are written by the listener, not by ancestor handlers
+                logger.propagate = False
 
-            # Create a formatter with time, name, level, and message
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            ch.setFormatter(formatter)
-            logger.addHandler(ch)
+        return logger
 
-            # Optional: log to file if log_to_file is True
-            if log_to_file:
-                # Create a timestamped log file name if not provided
-                if log_file is None:
-                    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-                    log_file = f"logs/{timestamp}.log"
+    @staticmethod
+    def _start_listener():
+        if Logger._listener is not None:
+            return
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(TEXT_FORMAT))
+        Logger._listener = logging.handlers.QueueListener(Logger._queue, console, respect_handler_level=True)
+        Logger._listener.start()
+        # Flush the queue before the interpreter exits
+        atexit.register(Logger.shutdown)
 
-                # Ensure logs directory exists
-                os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    @staticmethod
+    def _open_run_log(log_file=None):
+        if Logger._run_log is not None:
+            return
+        if log_file is None:
+            # Create a timestamped log file name if not provided
+            timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            log_file = os.path.join(os.getenv(LOG_DIR_ENV) or DEFAULT_LOG_DIR, f"{timestamp}.log")
 
-                fh = logging.FileHandler(log_file)
-                fh.setLevel(level)
-                fh.setFormatter(formatter)
-                logger.addHandler(fh)
+        # Ensure logs directory exists
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
 
-        return logger
+        fh = logging.FileHandler(log_file)
+        if os.getenv(LOG_FORMAT_ENV, "").lower() == "json":
+            fh.setFormatter(JsonLineFormatter())
+        else:
+            fh.setFormatter(logging.Formatter(TEXT_FORMAT))
+        Logger._listener.handlers = Logger._listener.handlers + (fh,)
+        Logger._run_log = log_file
+
+    @staticmethod
+    def shutdown():
+        """
+        Writes any queued records and stops the background writer. Called automatically at exit.
+        """
+        with Logger._lock:
+            if Logger._listener is None:
+                return
+            Logger._listener.stop()
+            for handler in Logger._listener.handlers:
+                handler.close()
+            Logger._listener = None
+            Logger._run_log = None
+
+    @staticmethod
+    def _restart_after_fork():
+        # The listener thread does not survive fork(), so worker processes start their own
+        # with the inherited console and run log handlers
+        Logger._lock = threading.Lock()
+        if Logger._listener is not None:
+            # Records still queued belong to the parent, which writes them itself
+            while not Logger._queue.empty():
+                Logger._queue.get_nowait()
+            handlers = Logger._listener.handlers
+            Logger._listener = logging.handlers.QueueListener(Logger._queue, *handlers, respect_handler_level=True)
+            Logger._listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Logger._restart_after_fork)
     
+def get_memory_usage():
+    """
+    Returns the current and peak resident set size (RSS) of this process.
+
+    Returns:
+        tuple: The current RSS and the peak RSS in bytes. Either is None where the platform does not report it.
+    """
+    current_rss = None
+    peak_rss = None
+    try:
+        with open("/proc/self/statm") as statm:
+            current_rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        if sys.platform != "darwin":
+            peak_rss *= 1024
+    return current_rss, peak_rss
+
+def format_megabytes(num_bytes):
+    """
+    Formats a byte count as megabytes for log messages.
+
+    Args:
+        num_bytes (int): The number of bytes, or None.
+
+    Returns:
+        str: The size in MB to one decimal place, or 'n/a'.
+    """
+    if num_bytes is None:
+        return 'n/a'
+    return f"{num_bytes / (1024 * 1024):.1f}"
+
+def type_slug(type_name):
+    """
+    Turns a statement type name into a lower-case name safe for files, e.g. 'amex-card-statement'.
+
+    Args:
+        type_name (str): The statement type name.
+
+    Returns:
+        str: The name's letters and digits, with each run of other characters replaced by a hyphen.
+    """
+    return re.sub(r"[^a-z0-9]+", "-", type_name.lower()).strip("-")
+
 def ask_user_to_continue():
     """
     Asks the user if they want to continue or stop.